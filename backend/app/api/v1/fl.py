@@ -7,11 +7,20 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
 from app.core.config import get_settings
-from app.ml.model import load_global_model, save_global_model, get_shared_state, set_shared_state
+from app.ml.model import (
+    get_global_model_holder,
+    load_global_model,
+    save_global_model,
+    get_shared_state,
+    set_shared_state,
+)
 from app.ml.features import get_input_dim
 from app.ml.pfl_train import fed_avg
+from app.ml.precompute import get_precompute_scheduler
 from app.services.deps import require_admin  # or a special "aggregator" auth if you want
 
+settings = get_settings
+
 router = APIRouter(prefix="/fl", tags=["federated"])
 
 # In-memory storage of pending client updates for the current round
@@ -29,9 +38,10 @@ def get_global_model():
     Aggregator endpoint:
     Return the current global SHARED model weights only.
     No database access, only model file.
+    Always the checkpoint's float weights, whatever GLOBAL_MODEL_ARTIFACT serves.
     """
     input_dim = get_input_dim()
-    model = load_global_model(input_dim)
+    model = get_global_model_holder().get(input_dim).eager
     shared_state = get_shared_state(model)
 
     # Convert tensors to plain Python lists for JSON
@@ -76,6 +86,8 @@ def aggregate():
     new_shared = fed_avg(state_dicts)
     set_shared_state(model, new_shared)
     save_global_model(model)
+    if settings.PRECOMPUTE_AFTER_FL:
+        get_precompute_scheduler().trigger()
 
     PENDING_UPDATES.clear()
     return {"detail": "Global model updated via FedAvg", "num_clients": len(state_dicts)}
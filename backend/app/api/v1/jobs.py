@@ -9,6 +9,10 @@ from sqlalchemy.orm import Session
 from app.schemas.schemas import JobCreate, JobOut, JobUpdate
 from app.models.models import Job, User
 from app.services.deps import get_db, get_current_user
+from app.ml.job_embeddings import try_index_job
+from app.ml.ann import get_job_ann_index
+from app.services.rec_cache import get_rec_cache
+from app.services.skills import sync_job_skills
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
@@ -50,8 +54,15 @@ def create_job(
     )
 
     db.add(job)
+    db.flush()
+    sync_job_skills(db, job.id, job.required_skills)
     db.commit()
     db.refresh(job)
+
+    # precompute the job's embedding so /recs never encodes it per request
+    vec = try_index_job(db, job)
+    get_job_ann_index().apply_job(job, vec)
+    get_rec_cache().clear()
     return job
 
 
@@ -95,11 +106,20 @@ def update_job(
             detail="Job not found",
         )
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    changes = payload.model_dump(exclude_unset=True)
+    for field, value in changes.items():
         setattr(job, field, value)
+    if "required_skills" in changes:
+        sync_job_skills(db, job.id, job.required_skills)
 
     db.commit()
     db.refresh(job)
+
+    # re-encodes only if the job text actually changed (content hash);
+    # deactivated jobs drop out of the ANN index
+    vec = try_index_job(db, job)
+    get_job_ann_index().apply_job(job, vec)
+    get_rec_cache().clear()
     return job
 
 
@@ -120,6 +140,10 @@ def delete_job(
             detail="Job not found",
         )
 
+    job_id = job.id
     db.delete(job)
     db.commit()
+
+    get_job_ann_index().drop_job(job_id)
+    get_rec_cache().clear()
     return None
@@ -1,25 +1,131 @@
 # app/api/v1/ml.py
 
-from fastapi import APIRouter, Depends, status
+from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel, Field
+
+from app.core.config import get_settings
 from app.services.deps import require_admin
-from app.ml.pfl_train import run_federated_round
+from app.ml.fl_jobs import get_fl_job_runner
+from app.ml.embeddings import get_embedding_cache, get_encode_batcher, get_model_registry
+from app.ml.inference import get_pfl_registry
+from app.ml.scoring import get_score_batcher
+
+settings = get_settings
 
 router = APIRouter(prefix="/ml", tags=["ml"])
 
 
+class FLRoundRequest(BaseModel):
+    rounds: int = Field(1, ge=1, le=50)
+    min_feedback: int = Field(3, ge=1)
+
+
+class EmbeddingModelSwap(BaseModel):
+    model_name: str
+    unload_previous: bool = False
+
+
 @router.post(
     "/run-fl-round",
     status_code=status.HTTP_202_ACCEPTED,
 )
 def run_fl_round(
+    payload: Optional[FLRoundRequest] = None,
+    _: str = Depends(require_admin),
+):
+    """
+    Queue a federated learning job (PFL/FL): `rounds` rounds, default one.
+
+    - ADMIN only.
+    - Returns at once with the job; poll GET /ml/fl-jobs/{id} for status,
+      progress and per-round metrics (clients trained, loss, duration).
+    - Jobs run one round at a time; the recommendation precompute reruns
+      after every round that updated the global model (PRECOMPUTE_AFTER_FL).
+    """
+    payload = payload or FLRoundRequest()
+    return get_fl_job_runner().submit(rounds=payload.rounds, min_feedback=payload.min_feedback)
+
+
+@router.get("/fl-jobs")
+def list_fl_jobs(
+    limit: int = Query(20, ge=1, le=200),
+    _: str = Depends(require_admin),
+):
+    """Most recent FL jobs first."""
+    return get_fl_job_runner().list(limit=limit)
+
+
+@router.get("/fl-jobs/{job_id}")
+def get_fl_job(
+    job_id: str,
+    _: str = Depends(require_admin),
+):
+    job = get_fl_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="FL job not found")
+    return job
+
+
+@router.post("/fl-jobs/{job_id}/cancel")
+def cancel_fl_job(
+    job_id: str,
+    _: str = Depends(require_admin),
+):
+    """
+    Cancel a queued or running FL job. A running round stops at its next
+    checkpoint without saving; rounds already completed stay applied.
+    """
+    runner = get_fl_job_runner()
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="FL job not found")
+    if job["status"] not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"FL job already {job['status']}")
+    return runner.cancel(job_id)
+
+
+@router.get("/embedding-models")
+def embedding_model_stats(
+    _: str = Depends(require_admin),
+):
+    """
+    Embedding models loaded in this worker process, with load time and memory,
+    the embedding cache's hit rate and size, and the encode / global-model
+    scoring micro-batchers' queue depth and batch-size histograms.
+    """
+    return {
+        **get_model_registry().stats(),
+        "cache": get_embedding_cache().stats(),
+        "micro_batching": {
+            "encode": get_encode_batcher().stats(),
+            "score": get_score_batcher().stats(),
+        },
+    }
+
+
+@router.post("/embedding-models/swap")
+def swap_embedding_model(
+    payload: EmbeddingModelSwap,
     _: str = Depends(require_admin),
 ):
     """
-    Trigger a single federated learning round (PFL/FL).
+    Load `model_name` and make it the active embedding model for this worker.
 
     - ADMIN only.
-    - Runs synchronously for now (the request will block until the round finishes).
+    - Requests already running keep the model they started with.
+    """
+    registry = get_model_registry()
+    previous = registry.swap(payload.model_name, unload_previous=payload.unload_previous)
+    return {"detail": "Embedding model swapped", "previous": previous, **registry.stats()}
+
+
+@router.get("/pfl-registry")
+def pfl_registry_stats(
+    _: str = Depends(require_admin),
+):
+    """
+    Client-head cache and load-latency metrics of the 9-feature PFL model (this worker).
     """
-    run_federated_round()
-    return {"detail": "Federated learning round completed"}
+    return get_pfl_registry().stats()
@@ -1,16 +1,29 @@
 # backend/app/api/v1/recs.py
 
+from datetime import datetime, timezone
 from typing import List
 
-import numpy as np
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.schemas.schemas import RecommendIn, RecommendationResponse, RecItem
-from app.models.models import Student, Job, Recommendation, User
-from app.services.deps import get_db, get_current_user
-from app.ml.features import build_pair_features, get_input_dim
-from app.ml.model import load_global_model
+from app.schemas.schemas import (
+    BatchRecommendIn,
+    BatchRecommendationResponse,
+    RecommendIn,
+    RecommendationResponse,
+    RecItem,
+)
+from app.models.models import Student, Job, User
+from app.services.deps import get_db, get_current_user, require_admin
+from app.ml.model import global_model_version
+from app.ml.precompute import get_precompute_scheduler
+from app.services.rec_cache import cache_key, catalog_version, get_rec_cache
+from app.services.semantic_recommendation import (
+    materialized_top_k,
+    rank_jobs_for_student,
+    recommend_batch as recommend_batch_for_students,
+    save_recommendations,
+)
 
 router = APIRouter(prefix="/recs", tags=["recs"])
 
@@ -34,6 +47,18 @@ def _require_torch():
         )
 
 
+def _rec_item(job: Job, score: float) -> RecItem:
+    return RecItem(
+        job_uid=job.job_uid,
+        role=job.role,
+        company=job.company,
+        score=float(score),
+        required_skills=job.required_skills or "",
+        salary_min=job.salary_min,
+        salary_max=job.salary_max,
+    )
+
+
 @router.post("/recommend", response_model=RecommendationResponse)
 def recommend(
     payload: RecommendIn,
@@ -56,7 +81,6 @@ def recommend(
 
     # Ensure ML deps exist before any torch usage
     _require_torch()
-    import torch  # local import after check (keeps server start clean)
 
     # Fetch student
     student = db.query(Student).filter(Student.student_uid == payload.student_uid).first()
@@ -70,52 +94,122 @@ def recommend(
             detail="Not authorized to get recommendations for this student",
         )
 
-    # Fetch active jobs
-    jobs: List[Job] = db.query(Job).filter(Job.is_active == True).all()  # noqa: E712
-    if not jobs:
-        raise HTTPException(status_code=404, detail="No active jobs found")
+    student_id, student_uid = student.id, student.student_uid
+
+    # Same student profile, model and catalog as a recent call: reuse its ranking
+    # (it was persisted when it was computed)
+    rec_cache = get_rec_cache()
+    key = cache_key(
+        student_id,
+        student.updated_at,
+        payload.top_k,
+        global_model_version(),
+        catalog_version(db),
+        payload.score_threshold,
+    )
+    cached = rec_cache.get(key)
+    if cached is not None:
+        return RecommendationResponse(
+            student_uid=student_uid,
+            items=[RecItem(**item) for item in cached["items"]],
+            model_version=cached["model_version"],
+            computed_at=cached["computed_at"],
+        )
 
-    # Load model
-    input_dim = get_input_dim()
-    model = load_global_model(input_dim)
-    model.eval()
+    # Fresh precomputed set: one indexed query, no model work
+    served = materialized_top_k(db, student, payload.top_k, payload.score_threshold)
+    if served is not None:
+        top, model_version, computed_at = served
+    else:
+        # Stale/new student: two-stage ranking online (ANN candidates -> PFL scores)
+        model_version, computed_at = global_model_version(), datetime.now(timezone.utc)
+        top = rank_jobs_for_student(db, student, payload.top_k, payload.score_threshold)
+        if not top and payload.score_threshold is None:
+            raise HTTPException(status_code=404, detail="No active jobs found")
 
-    # Build features for each (student, job) pair
-    X_list = []
-    job_refs: List[Job] = []
+    # Persist + return response
+    save_recommendations(db, student_id, top)
+    rec_items: List[RecItem] = [_rec_item(job, score) for job, score in top]
 
-    for job in jobs:
-        x = build_pair_features(student, job)
-        X_list.append(x)
-        job_refs.append(job)
+    db.commit()
+    rec_cache.put(
+        key,
+        student_id,
+        {
+            "items": [item.model_dump() for item in rec_items],
+            "model_version": model_version,
+            "computed_at": computed_at.isoformat(),
+        },
+    )
+    return RecommendationResponse(
+        student_uid=student_uid,
+        items=rec_items,
+        model_version=model_version,
+        computed_at=computed_at,
+    )
+
+
+@router.post("/recommend/batch", response_model=BatchRecommendationResponse)
+def recommend_batch(
+    payload: BatchRecommendIn,
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+):
+    """
+    Recommend jobs for many students in one call (e.g. a whole cohort).
 
-    X = np.stack(X_list).astype(np.float32)
-    X_tensor = torch.from_numpy(X)
+    - ADMIN only.
+    - Jobs, job embeddings and the model are loaded once; students are encoded
+      in one batch and scored with batched matmuls.
+    - Top-K per student is persisted unless `persist` is false.
+    """
+    _require_torch()
 
-    # Predict scores
-    with torch.no_grad():
-        scores = model(X_tensor).squeeze().cpu().numpy()
+    out = recommend_batch_for_students(
+        db,
+        payload.student_uids,
+        top_k=payload.top_k,
+        persist=payload.persist,
+        score_threshold=payload.score_threshold,
+    )
+
+    results = [
+        RecommendationResponse(
+            student_uid=uid,
+            items=[_rec_item(job, score) for job, score in ranked],
+            model_version=out["model_version"],
+            computed_at=out["computed_at"],
+        )
+        for uid, ranked in out["results"].items()
+    ]
+    return BatchRecommendationResponse(
+        results=results,
+        missing_student_uids=out["missing"],
+        timings_ms=out["timings_ms"],
+    )
+
+
+@router.post("/precompute", status_code=status.HTTP_202_ACCEPTED)
+def trigger_precompute(
+    _: User = Depends(require_admin),
+):
+    """
+    Recompute materialized top-K for every student in the background.
 
-    # Rank and select top K
-    ranked = sorted(zip(job_refs, scores), key=lambda x: x[1], reverse=True)
-    top = ranked[: payload.top_k]
+    - ADMIN only.
+    - Runs are also triggered after global model updates (PRECOMPUTE_AFTER_FL)
+      and every PRECOMPUTE_INTERVAL_SECONDS when configured.
+    """
+    scheduler = get_precompute_scheduler()
+    scheduler.trigger()
+    return {"detail": "Precompute scheduled", "last_result": scheduler.last_result}
 
-    # Persist + return response
-    rec_items: List[RecItem] = []
-    for job, score in top:
-        db.add(Recommendation(student_id=student.id, job_id=job.id, score=float(score)))
-
-        rec_items.append(
-            RecItem(
-                job_uid=job.job_uid,
-                role=job.role,
-                company=job.company,
-                score=float(score),
-                required_skills=job.required_skills or "",
-                salary_min=job.salary_min,
-                salary_max=job.salary_max,
-            )
-        )
 
-    db.commit()
-    return RecommendationResponse(student_uid=student.student_uid, items=rec_items)
+@router.get("/cache/stats")
+def rec_cache_stats(
+    _: User = Depends(require_admin),
+):
+    """
+    Result cache backend, size and hit/miss counters (this worker).
+    """
+    return get_rec_cache().stats()
@@ -295,13 +295,18 @@
 
 # app/api/v1/students.py
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
 
-from app.models.models import Student, User
-from app.schemas.schemas import StudentProfileIn, StudentOut
+from app.models.models import Job, Student, User
+from app.schemas.schemas import JobOut, StudentProfileIn, StudentOut
 from app.services.deps import get_db, require_student
 from app.services.cv_parser import extract_text_from_pdf, parse_cv_text
+from app.services.rec_cache import get_rec_cache
+from app.services.skills import get_skill_job_index, student_skill_ids, sync_student_skills
 
 router = APIRouter(prefix="/students", tags=["students"])
 
@@ -321,6 +326,32 @@ def get_my_profile(
     return student
 
 
+@router.get("/me/skill-matches", response_model=List[JobOut])
+def get_my_skill_matches(
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_student),
+):
+    """
+    Active jobs sharing at least one skill with my profile, most shared skills
+    first (served from the in-memory skill -> jobs inverted index).
+    """
+    student = db.query(Student).filter(Student.user_id == current_user.id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student profile not created yet")
+
+    index = get_skill_job_index()
+    index.sync(db)
+    job_ids, counts = index.overlap_counts(student_skill_ids(db, student.id))
+    # most shared skills first, ties by job id
+    order = np.lexsort((job_ids, -counts))[:limit]
+    top_ids = job_ids[order].tolist()
+    if not top_ids:
+        return []
+    by_id = {job.id: job for job in db.query(Job).filter(Job.id.in_(top_ids)).all()}
+    return [by_id[job_id] for job_id in top_ids if job_id in by_id]
+
+
 @router.post("/me", response_model=StudentOut)
 def create_or_update_my_profile(
     payload: StudentProfileIn,
@@ -351,8 +382,11 @@ def create_or_update_my_profile(
         student.skills = payload.skills
         student.preferred_locations = payload.preferred_locations
 
+    db.flush()
+    sync_student_skills(db, student.id, student.skills_raw)
     db.commit()
     db.refresh(student)
+    get_rec_cache().invalidate_student(student.id)
     return student
 
 
@@ -407,6 +441,9 @@ async def upload_cv_and_autofill_profile(
         if parsed.get("preferred_locations"):
             student.preferred_locations = parsed["preferred_locations"]
 
+    db.flush()
+    sync_student_skills(db, student.id, student.skills_raw)
     db.commit()
     db.refresh(student)
+    get_rec_cache().invalidate_student(student.id)
     return student
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +14,72 @@ class Settings(BaseSettings):
     APP_NAME: str = "Smart Internship Backend"
     FRONTEND_ORIGIN: str = "http://localhost:3000"
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Load + warm the embedding model at startup instead of on the first /recs call
+    EMBEDDING_WARMUP_ON_STARTUP: bool = False
+    # content-hash embedding cache: memory LRU over an on-disk store shared by workers and CLIs
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "models/embedding_cache"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 50000
+    # micro-batching of concurrent small encode / global-model scoring calls
+    EMBEDDING_MICROBATCH_ENABLED: bool = True
+    EMBEDDING_MICROBATCH_MAX_TEXTS: int = 256
+    EMBEDDING_MICROBATCH_WAIT_MS: float = 2.0
+    GLOBAL_MICROBATCH_ENABLED: bool = True
+    GLOBAL_MICROBATCH_MAX_STUDENTS: int = 32
+    GLOBAL_MICROBATCH_WAIT_MS: float = 2.0
+
+    # Two-stage recommendations: ANN candidate retrieval before PFL scoring
+    ANN_ENABLED: bool = True
+    ANN_MIN_CATALOG: int = 2000   # below this many active jobs, score everything
+    ANN_CANDIDATES: int = 300
+    ANN_NPROBE: int = 8
+
+    # Memory-mapped job embedding matrix, mapped read-only by every worker
+    JOB_MATRIX_ENABLED: bool = True
+    JOB_MATRIX_DIR: str = "models/job_matrix"
+    JOB_MATRIX_DTYPE: str = "float32"   # "float32" | "float16" (half the memory, converted per block)
+
+    # Offline top-K precompute (materialized_recommendations)
+    PRECOMPUTE_TOP_K: int = 50
+    PRECOMPUTE_INTERVAL_SECONDS: int = 0   # 0 = no periodic run
+    PRECOMPUTE_AFTER_FL: bool = True       # rerun after every global model save via the API
+    PRECOMPUTE_MAX_AGE_SECONDS: int = 86400
+
+    # /recs/recommend result cache: "memory" (per worker), "sqlite" (shared by workers) or "off"
+    REC_CACHE_BACKEND: str = "memory"
+    REC_CACHE_MAX_ENTRIES: int = 10000
+    REC_CACHE_TTL_SECONDS: int = 600
+    REC_CACHE_PATH: str = "models/rec_cache.sqlite3"
+
+    # 9-feature PFL model (app/ml/inference.py): shared backbone, one head per client
+    BACKBONE_PATH: str = "./ml/models/backbone.pt"
+    HEADS_DIR: str = "./ml/models/heads"
+    PREPROCESSOR_PATH: str = "./ml/preprocessors/preprocessor.pkl"
+    PFL_HEAD_CACHE_SIZE: int = 256
+    # scaler folded into the backbone (python -m app.ml.fused_backbone); used when present and current
+    PFL_FUSED_BACKBONE_PATH: str = "./ml/models/backbone_fused.npz"
+    # concurrent predict calls are merged for up to this many rows / milliseconds
+    PFL_MICROBATCH_MAX_ROWS: int = 65536
+    PFL_MICROBATCH_WAIT_MS: float = 2.0
+
+    # Federated rounds: parallel local training (app/ml/parallel_train.py)
+    FL_TRAIN_WORKERS: int = 0             # 0 = one process per CPU
+    FL_TRAIN_THREADS_PER_WORKER: int = 0  # 0 = CPUs / workers
+    FL_PARALLEL_MIN_CLIENTS: int = 4      # smaller rounds train serially
+    FL_PARALLEL_MIN_ROWS: int = 2000
+    FL_TRAIN_SEED: Optional[int] = None   # set for reproducible rounds
+    # Incremental rounds (fl_client_watermarks)
+    FL_SKIP_UNCHANGED_CLIENTS: bool = True
+    FL_CACHE_CLIENT_UPDATES: bool = True  # keep each client's last update for reuse
+    # Local training: streaming mini-batches (app/ml/streaming_train.py)
+    FL_BATCH_SIZE: int = 256              # 0 = one full batch per epoch
+    FL_SHUFFLE: bool = True
+    FL_SHUFFLE_WINDOW_ROWS: int = 65536   # rows shuffled together; 0 = the whole client
+
+    # Exported inference artifacts (python -m app.ml.export) and which variant serves
+    ARTIFACTS_DIR: str = "models/artifacts"
+    GLOBAL_MODEL_ARTIFACT: str = "eager"      # eager (factorized) | torchscript | int8 (runs the export)
+    EMBEDDING_MODEL_ARTIFACT: str = "eager"   # eager | torchscript | int8
 
     # Security (for later, JWT etc.)
     SECRET_KEY: str = "supersecret-change-me"
@@ -1,5 +1,6 @@
 from app.db.session import engine, SessionLocal
 from app.db.base import Base
+from app.db.upgrade import upgrade_schema
 from app.models.models import User
 from app.core.security import get_password_hash
 
@@ -7,6 +8,9 @@ from app.core.security import get_password_hash
 def init_db():
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    # columns / constraints that create_all() doesn't add to existing tables
+    for step in upgrade_schema(engine):
+        print(f"✅ Schema upgrade applied: {step}")
 
     db = SessionLocal()
 
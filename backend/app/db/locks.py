@@ -0,0 +1,35 @@
+"""Postgres session-level advisory locks, one run at a time across workers.
+
+Each caller owns its key (app/ml/precompute.py, app/ml/fl_jobs.py). Other
+databases (sqlite in local scripts) have no advisory locks: the lock is
+always granted there.
+"""
+
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+
+def try_advisory_lock(db: Session, key: int) -> Optional[Connection]:
+    """
+    Take advisory lock `key` on a dedicated connection (session-level
+    advisory locks belong to a connection, and the Session hands its
+    connection back to the pool on every commit). Returns that connection,
+    to pass to advisory_unlock(), or None if someone else holds the lock.
+    """
+    conn = db.get_bind().connect()
+    if conn.dialect.name != "postgresql":
+        return conn
+    if conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar():
+        return conn
+    conn.close()
+    return None
+
+
+def advisory_unlock(conn: Connection, key: int):
+    """Release a lock taken by try_advisory_lock() and close its connection."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+    conn.close()
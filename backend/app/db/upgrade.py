@@ -0,0 +1,121 @@
+"""In-place schema upgrades for existing databases.
+
+create_all() (app/db/init_db.py) creates missing tables but never alters
+existing ones, so columns / constraints added to existing models are
+applied here. Every step checks the live schema first: running this on a
+fresh or already-upgraded database changes nothing.
+
+    python -m app.db.upgrade        (also run by python -m app.db.init_db)
+"""
+
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _timestamp_type(conn: Connection) -> str:
+    # sqlite (local scripts) can't ADD COLUMN with a non-constant default
+    if conn.dialect.name == "postgresql":
+        return "TIMESTAMP WITH TIME ZONE DEFAULT now()"
+    return "TIMESTAMP"
+
+
+def _add_updated_at(conn: Connection, table: str, index: bool = False) -> bool:
+    """
+    `updated_at` for a table created before the column existed, back-filled
+    from created_at (the ORM's onupdate keeps it current from then on).
+    """
+    if not inspect(conn).has_table(table) or _has_column(conn, table, "updated_at"):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at {_timestamp_type(conn)}"))
+    conn.execute(
+        text(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL")
+    )
+    if index:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"))
+    return True
+
+
+def _unique_recommendations(conn: Connection) -> bool:
+    """
+    UNIQUE (student_id, job_id) on recommendations, which the bulk upsert's
+    ON CONFLICT (student_id, job_id) needs as its arbiter. Duplicate rows
+    from before the constraint are collapsed first: the newest row (highest
+    id, the last write) is kept and feedback pointing at a dropped duplicate
+    is re-pointed to it.
+    """
+    insp = inspect(conn)
+    if not insp.has_table("recommendations"):
+        return False
+    pair = {"student_id", "job_id"}
+    if any(set(uc["column_names"]) == pair for uc in insp.get_unique_constraints("recommendations")):
+        return False
+    if any(ix["unique"] and set(ix["column_names"]) == pair for ix in insp.get_indexes("recommendations")):
+        return False
+
+    if insp.has_table("feedback"):
+        conn.execute(
+            text(
+                """
+                UPDATE feedback SET recommendation_id = (
+                    SELECT MAX(keep.id) FROM recommendations AS r
+                    JOIN recommendations AS keep
+                      ON keep.student_id = r.student_id AND keep.job_id = r.job_id
+                    WHERE r.id = feedback.recommendation_id
+                )
+                WHERE recommendation_id IS NOT NULL
+                """
+            )
+        )
+    conn.execute(
+        text(
+            "DELETE FROM recommendations WHERE id NOT IN "
+            "(SELECT MAX(id) FROM recommendations GROUP BY student_id, job_id)"
+        )
+    )
+    if conn.dialect.name == "postgresql":
+        # the name create_all() gives UniqueConstraint("student_id", "job_id")
+        conn.execute(
+            text(
+                "ALTER TABLE recommendations ADD CONSTRAINT recommendations_student_id_job_id_key "
+                "UNIQUE (student_id, job_id)"
+            )
+        )
+    else:
+        conn.execute(
+            text("CREATE UNIQUE INDEX uq_recommendations_student_job ON recommendations (student_id, job_id)")
+        )
+    return True
+
+
+# (name, step): a step returns True if it changed the schema
+_STEPS: List[Tuple[str, Callable[[Connection], bool]]] = [
+    # ANN index / job matrix / catalog versions sync incrementally from it
+    ("jobs.updated_at", lambda conn: _add_updated_at(conn, "jobs", index=True)),
+    # precomputed recommendations older than a profile edit are stale
+    ("students.updated_at", lambda conn: _add_updated_at(conn, "students")),
+    # bulk upsert of ranked results: ON CONFLICT (student_id, job_id)
+    ("recommendations.student_job_unique", _unique_recommendations),
+]
+
+
+def upgrade_schema(bind: Engine) -> List[str]:
+    """Apply every pending step, each in its own transaction; returns the applied step names."""
+    applied = []
+    for name, step in _STEPS:
+        with bind.begin() as conn:
+            if step(conn):
+                applied.append(name)
+    return applied
+
+
+if __name__ == "__main__":
+    from app.db.session import engine
+
+    applied = upgrade_schema(engine)
+    print(f"✅ Schema upgraded: {', '.join(applied)}" if applied else "ℹ️ Schema already up to date.")
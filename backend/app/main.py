@@ -1,7 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.config import get_settings
+from app.ml.embeddings import get_model_registry
+from app.ml.fl_jobs import get_fl_job_runner
+from app.ml.precompute import get_precompute_scheduler
 from app.api.v1 import auth, students, jobs, recs, feedback, ml, fl, interactions
 
 settings = get_settings  # ✅ CALL IT
@@ -16,6 +20,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def warm_embedding_model():
+    if not settings.EMBEDDING_WARMUP_ON_STARTUP:
+        return
+    try:
+        get_model_registry().warm()
+    except HTTPException:
+        # ML deps missing: keep the API up, /recs will report 503
+        pass
+
+@app.on_event("startup")
+def start_precompute_scheduler():
+    # no-op unless PRECOMPUTE_INTERVAL_SECONDS > 0
+    get_precompute_scheduler().start()
+
+@app.on_event("startup")
+def recover_fl_jobs():
+    # jobs this host's previous processes left queued / running are marked failed
+    try:
+        get_fl_job_runner().start()
+    except SQLAlchemyError:
+        # fl_jobs table missing / DB down: the job endpoints will report it
+        pass
+
 @app.get("/health")
 def health():
     return {"status": "Backend is up and running!"}
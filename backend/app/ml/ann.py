@@ -0,0 +1,395 @@
+# app/ml/ann.py
+
+import argparse
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.models import Job
+
+
+# Re-read this much history on each incremental sync: now() is the transaction
+# start time, so a slow writer can commit a timestamp just below the watermark.
+_SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _spherical_kmeans(X: np.ndarray, k: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    k-means on unit vectors using cosine similarity. X must be normalized.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(X.shape[0], size=k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(X @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty clusters on random points
+            sums[empty] = X[rng.choice(X.shape[0], size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class _InvertedList:
+    """
+    Growable (ids, vectors) arrays for one IVF cell. Removal swaps in the last row.
+    """
+
+    def __init__(self, dim: int):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vecs = np.empty((0, dim), dtype=np.float32)
+        self.size = 0
+
+    def add(self, job_id: int, vec: np.ndarray) -> int:
+        if self.size == self.ids.shape[0]:
+            cap = max(8, 2 * self.size)
+            ids = np.empty(cap, dtype=np.int64)
+            vecs = np.empty((cap, self.vecs.shape[1]), dtype=np.float32)
+            ids[: self.size] = self.ids[: self.size]
+            vecs[: self.size] = self.vecs[: self.size]
+            self.ids, self.vecs = ids, vecs
+        pos = self.size
+        self.ids[pos] = job_id
+        self.vecs[pos] = vec
+        self.size += 1
+        return pos
+
+    def remove(self, pos: int) -> Optional[int]:
+        """Remove row `pos`; returns the job id that moved into `pos`, if any."""
+        last = self.size - 1
+        moved = None
+        if pos != last:
+            self.ids[pos] = self.ids[last]
+            self.vecs[pos] = self.vecs[last]
+            moved = int(self.ids[pos])
+        self.size -= 1
+        return moved
+
+
+class IVFIndex:
+    """
+    Pure-NumPy inverted-file (IVF) index over unit-normalized job embeddings.
+
+    - build(): spherical k-means into ~sqrt(N) cells, then bucket every vector.
+    - upsert()/remove(): O(D * n_lists) incremental updates, no rebuild.
+    - search(): score the `nprobe` closest cells exhaustively, return top-k
+      job ids by cosine similarity.
+
+    Until trained (or for tiny catalogs) everything lives in a single cell, so
+    search degrades to an exact scan.
+    """
+
+    def __init__(self, dim: int, n_lists: Optional[int] = None):
+        self.dim = dim
+        self.n_lists_hint = n_lists
+        self.centroids = np.zeros((1, dim), dtype=np.float32)
+        self.lists: List[_InvertedList] = [_InvertedList(dim)]
+        self.where: Dict[int, Tuple[int, int]] = {}  # job_id -> (cell, pos)
+        self.trained_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def build(self, ids: np.ndarray, vecs: np.ndarray, seed: int = 0):
+        X = _normalize(vecs)
+        n = X.shape[0]
+        n_lists = self.n_lists_hint or int(np.clip(np.sqrt(n), 1, 1024))
+        n_lists = max(1, min(n_lists, n))
+
+        if n_lists > 1:
+            sample = X
+            if n > 50_000:
+                rng = np.random.default_rng(seed)
+                sample = X[rng.choice(n, size=50_000, replace=False)]
+            centroids = _spherical_kmeans(sample, n_lists, seed=seed)
+        else:
+            centroids = np.zeros((1, self.dim), dtype=np.float32)
+
+        lists = [_InvertedList(self.dim) for _ in range(centroids.shape[0])]
+        where: Dict[int, Tuple[int, int]] = {}
+        assign = np.argmax(X @ centroids.T, axis=1) if n else np.empty(0, dtype=np.int64)
+        for job_id, cell, vec in zip(ids.tolist(), assign.tolist(), X):
+            where[job_id] = (cell, lists[cell].add(job_id, vec))
+
+        with self._lock:
+            self.centroids, self.lists, self.where = centroids, lists, where
+            self.trained_size = n
+
+    def needs_retrain(self) -> bool:
+        """Cells drift as the catalog grows; retrain after it has doubled."""
+        return len(self.where) > max(2 * self.trained_size, 1000)
+
+    def remove(self, job_id: int):
+        with self._lock:
+            loc = self.where.pop(job_id, None)
+            if loc is None:
+                return
+            cell, pos = loc
+            moved = self.lists[cell].remove(pos)
+            if moved is not None:
+                self.where[moved] = (cell, pos)
+
+    def upsert(self, job_id: int, vec: np.ndarray):
+        v = _normalize(vec)
+        with self._lock:
+            self.remove(job_id)
+            cell = int(np.argmax(self.centroids @ v))
+            self.where[job_id] = (cell, self.lists[cell].add(job_id, v))
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (job_ids, cosine similarities), best first, at most k of each.
+        """
+        q = _normalize(query)
+        with self._lock:
+            n_cells = len(self.lists)
+            probe = min(nprobe, n_cells)
+            if probe < n_cells:
+                cells = np.argpartition(-(self.centroids @ q), probe - 1)[:probe]
+            else:
+                cells = np.arange(n_cells)
+
+            ids = np.concatenate([self.lists[c].ids[: self.lists[c].size] for c in cells])
+            vecs = np.concatenate([self.lists[c].vecs[: self.lists[c].size] for c in cells])
+
+        if ids.shape[0] == 0:
+            return ids, np.empty(0, dtype=np.float32)
+
+        sims = vecs @ q
+        k = min(k, sims.shape[0])
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return ids[top], sims[top]
+
+
+class JobANNIndex:
+    """
+    Process-wide IVF index over active jobs' stored embeddings.
+
+    sync() keeps it in step with the jobs table incrementally: it pulls only
+    jobs whose `updated_at` moved past the last watermark (creates, updates,
+    deactivations) and falls back to a full rebuild when rows were deleted,
+    when the catalog has doubled since training, or on first use. The /jobs
+    router also applies its own writes immediately via apply_job()/drop_job().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index: Optional[IVFIndex] = None
+        self._watermark = None
+        self._known_ids: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.index) if self.index is not None else 0
+
+    def _rebuild(self, db: Session):
+        from app.ml.job_embeddings import index_jobs
+
+        jobs = db.query(Job).all()
+        # read attributes before index_jobs() may commit and expire them
+        active = [job for job in jobs if job.is_active]
+        active_ids = [job.id for job in active]
+        known_ids = {job.id for job in jobs}
+        watermark = max((job.updated_at for job in jobs if job.updated_at), default=None)
+
+        vectors = index_jobs(db, active)
+
+        if active_ids:
+            vecs = np.stack([vectors[job_id] for job_id in active_ids])
+            index = IVFIndex(vecs.shape[1])
+            index.build(np.array(active_ids, dtype=np.int64), vecs)
+        else:
+            index = None
+
+        self.index = index
+        self._known_ids = known_ids
+        self._watermark = watermark
+
+    def _apply(self, db: Session, jobs: List[Job]):
+        from app.ml.job_embeddings import index_jobs
+
+        flags = [(job.id, bool(job.is_active)) for job in jobs]
+        vectors = index_jobs(db, [job for job in jobs if job.is_active])
+        for job_id, is_active in flags:
+            self._known_ids.add(job_id)
+            if is_active:
+                self._upsert(job_id, vectors[job_id])
+            elif self.index is not None:
+                self.index.remove(job_id)
+
+    def _upsert(self, job_id: int, vec: np.ndarray):
+        if self.index is None:
+            self.index = IVFIndex(vec.shape[0])
+        self.index.upsert(job_id, vec)
+
+    def sync(self, db: Session):
+        total, latest = db.query(func.count(Job.id), func.max(Job.updated_at)).one()
+        with self._lock:
+            if self._watermark is None and self.index is None:
+                self._rebuild(db)
+                return
+
+            if latest is not None and (self._watermark is None or latest > self._watermark):
+                q = db.query(Job)
+                if self._watermark is not None:
+                    q = q.filter(Job.updated_at >= self._watermark - _SYNC_OVERLAP)
+                changed = q.all()
+                self._apply(db, changed)
+                self._watermark = latest
+
+            if total != len(self._known_ids) or (self.index is not None and self.index.needs_retrain()):
+                self._rebuild(db)
+
+    def apply_job(self, job: Job, vec: Optional[np.ndarray]):
+        """Apply a create/update/deactivate from this process right away."""
+        with self._lock:
+            if self._watermark is None and self.index is None:
+                return  # not built yet; the first sync() will include this job
+            self._known_ids.add(job.id)
+            if job.is_active and vec is not None:
+                self._upsert(job.id, vec)
+            elif self.index is not None:
+                self.index.remove(job.id)
+
+    def drop_job(self, job_id: int):
+        with self._lock:
+            self._known_ids.discard(job_id)
+            if self.index is not None:
+                self.index.remove(job_id)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8) -> np.ndarray:
+        if self.index is None:
+            return np.empty(0, dtype=np.int64)
+        ids, _ = self.index.search(query, k, nprobe=nprobe)
+        return ids
+
+
+_job_ann_index = JobANNIndex()
+
+
+def get_job_ann_index() -> JobANNIndex:
+    return _job_ann_index
+
+
+def _benchmark_data(from_db: bool, n_jobs: int, dim: int, queries: int, seed: int):
+    """
+    (job matrix, student query vectors, PFL model) for the benchmark: either
+    synthetic clustered embeddings with an untrained model, or the real
+    catalog, students and global checkpoint.
+    """
+    import torch
+
+    from app.ml.model import PFLRecommender
+
+    if not from_db:
+        rng = np.random.default_rng(seed)
+        torch.manual_seed(seed)
+        centers = rng.standard_normal((64, dim)).astype(np.float32)
+        noise = rng.standard_normal((n_jobs, dim)).astype(np.float32)
+        J = centers[rng.integers(0, 64, n_jobs)] + 0.5 * noise
+        S = centers[rng.integers(0, 64, queries)] + 0.5 * rng.standard_normal((queries, dim)).astype(np.float32)
+        return J, S, PFLRecommender(4 * dim).eval()
+
+    from app.db.session import SessionLocal
+    from app.models.models import Student
+    from app.ml.features import encode_student, get_input_dim
+    from app.ml.job_embeddings import get_job_embedding_matrix
+    from app.ml.model import load_global_model
+
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job).filter(Job.is_active == True).all()  # noqa: E712
+        J = get_job_embedding_matrix(db, jobs)
+        S = np.stack([encode_student(s) for s in db.query(Student).limit(queries).all()])
+    finally:
+        db.close()
+    return J, S, load_global_model(get_input_dim()).eval()
+
+
+def _benchmark(
+    from_db: bool,
+    n_jobs: int,
+    dim: int,
+    k: int,
+    candidates: int,
+    nprobe: int,
+    queries: int,
+    seed: int = 0,
+):
+    """
+    recall of two-stage retrieval against exhaustive scoring:
+    - ANN candidates vs exact cosine top-`candidates` (index quality)
+    - ANN candidates + PFL top-k vs PFL top-k over the full catalog (end-to-end;
+      only meaningful with a trained model, i.e. --from-db)
+    """
+    from app.ml.scoring import FactorizedScorer
+
+    J, S, model = _benchmark_data(from_db, n_jobs, dim, queries, seed)
+    ids = np.arange(J.shape[0], dtype=np.int64)
+
+    started = time.perf_counter()
+    index = IVFIndex(J.shape[1])
+    index.build(ids, J, seed=seed)
+    build_s = time.perf_counter() - started
+
+    scorer = FactorizedScorer(model)
+    Jn = _normalize(J)
+
+    cos_recall, e2e_recall, ann_ms, exact_ms = [], [], [], []
+    for s_vec in S:
+        started = time.perf_counter()
+        full = scorer.score(s_vec, J, catalog_key="bench")
+        exact_top = set(np.argsort(-full)[:k].tolist())
+        exact_ms.append((time.perf_counter() - started) * 1e3)
+
+        started = time.perf_counter()
+        cand, _ = index.search(s_vec, candidates, nprobe=nprobe)
+        cand_scores = scorer.score(s_vec, J[cand])
+        ann_top = set(cand[np.argsort(-cand_scores)[:k]].tolist())
+        ann_ms.append((time.perf_counter() - started) * 1e3)
+
+        cos_top = set(np.argsort(-(Jn @ _normalize(s_vec)))[:candidates].tolist())
+        cos_recall.append(len(cos_top & set(cand.tolist())) / max(1, len(cos_top)))
+        e2e_recall.append(len(exact_top & ann_top) / max(1, len(exact_top)))
+
+    print(f"jobs={J.shape[0]} dim={J.shape[1]} cells={len(index.lists)} nprobe={nprobe} candidates={candidates}")
+    print(f"  build                          : {build_s:.2f} s")
+    print(f"  recall@{candidates} vs exact cosine   : {np.mean(cos_recall):.3f}")
+    print(f"  recall@{k} vs exhaustive PFL     : {np.mean(e2e_recall):.3f}")
+    print(f"  latency exhaustive / two-stage : {np.median(exact_ms):.1f} ms / {np.median(ann_ms):.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ANN candidate retrieval recall")
+    parser.add_argument("--from-db", action="store_true", help="use real jobs, students and global model")
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=300)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    _benchmark(
+        args.from_db,
+        args.jobs,
+        args.dim,
+        args.k,
+        args.candidates,
+        args.nprobe,
+        args.queries,
+    )
@@ -0,0 +1,125 @@
+# app/ml/batching.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+
+class _Pending(NamedTuple):
+    payload: Any
+    size: int
+    future: Future
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent small calls into one batched call.
+
+    Callers submit(payload, size) and get a Future. A dedicated worker thread
+    takes the first waiting request, then keeps collecting until `max_items`
+    (sum of sizes) is reached or `max_wait_ms` has passed, and runs
+
+        batch_fn([payload, ...]) -> [result, ...]   (same length and order)
+
+    once for the whole group. An exception from batch_fn fails every future
+    of that batch.
+
+    stats() reports queue depth and power-of-two histograms of batch sizes
+    (requests per batch and items per batch).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_items: int = 256,
+        max_wait_ms: float = 2.0,
+        name: str = "micro-batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1e3
+        self.name = name
+
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests_hist: Dict[int, int] = {}
+        self._items_hist: Dict[int, int] = {}
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, payload: Any, size: int = 1) -> Future:
+        future: Future = Future()
+        self._queue.put(_Pending(payload, size, future))
+        self._ensure_thread()
+        return future
+
+    def __call__(self, payload: Any, size: int = 1) -> Any:
+        """Blocking submit()."""
+        return self.submit(payload, size).result()
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        items = batch[0].size
+        deadline = time.perf_counter() + self.max_wait
+        while items < self.max_items:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            items += pending.size
+        return batch
+
+    def _run(self):
+        while True:
+            # drop requests whose caller cancelled while queued
+            batch = [p for p in self._collect() if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self._record(batch)
+            try:
+                results = self.batch_fn([p.payload for p in batch])
+            except BaseException as exc:  # surface to callers; keep serving
+                for p in batch:
+                    p.future.set_exception(exc)
+                continue
+            for p, result in zip(batch, results):
+                p.future.set_result(result)
+
+    @staticmethod
+    def _bucket(n: int) -> int:
+        return 1 << max(0, (n - 1).bit_length())
+
+    def _record(self, batch: List[_Pending]):
+        requests = self._bucket(len(batch))
+        items = self._bucket(sum(p.size for p in batch))
+        with self._stats_lock:
+            self._batches += 1
+            self._requests_hist[requests] = self._requests_hist.get(requests, 0) + 1
+            self._items_hist[items] = self._items_hist.get(items, 0) + 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                # bucket upper bound (power of two) -> number of batches
+                "requests_per_batch": dict(sorted(self._requests_hist.items())),
+                "items_per_batch": dict(sorted(self._items_hist.items())),
+                "max_items": self.max_items,
+                "max_wait_ms": self.max_wait * 1e3,
+            }
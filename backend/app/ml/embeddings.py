@@ -1,8 +1,23 @@
 # backend/app/ml/embeddings.py
 
-from typing import List
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 from fastapi import HTTPException
 
+from app.core.config import get_settings
+from app.ml.batching import MicroBatcher
+
+settings = get_settings
+
 
 DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
@@ -21,26 +36,570 @@ def _require_sentence_transformers():
         )
 
 
-def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+def _model_memory_bytes(model) -> int:
+    """
+    Approximate resident size of a SentenceTransformer (parameters + buffers).
+    """
+    total = 0
+    for t in list(model.parameters()) + list(model.buffers()):
+        total += t.numel() * t.element_size()
+    return int(total)
+
+
+class TorchScriptSentenceEncoder:
+    """
+    encode()-compatible wrapper around a traced SentenceTransformer export
+    (app/ml/export.py): tokenizer -> traced (input_ids, attention_mask) ->
+    pooled sentence embedding.
+    """
+
+    def __init__(self, module, tokenizer, max_seq_length: int, dim: int):
+        self.module = module
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.dim = dim
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, batch_size: int = 32, **_):
+        import torch
+
+        out = []
+        for start in range(0, len(texts), batch_size):
+            features = self.tokenizer(
+                list(texts[start : start + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="pt",
+            )
+            with torch.no_grad():
+                out.append(self.module(features["input_ids"], features["attention_mask"]))
+        emb = torch.cat(out) if out else torch.empty((0, self.dim))
+        return emb.numpy() if convert_to_numpy else emb
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def parameters(self):
+        return self.module.parameters()
+
+    def buffers(self):
+        return self.module.buffers()
+
+
+def _load_scripted_encoder(model_name: str, artifact: str) -> Optional[TorchScriptSentenceEncoder]:
+    """
+    The exported encoder for `model_name`, or None if there is no export of it.
+    """
+    path = os.path.join(settings.ARTIFACTS_DIR, f"embedding{'.int8' if artifact == 'int8' else ''}.ts.pt")
+    tokenizer_dir = os.path.join(settings.ARTIFACTS_DIR, "embedding_tokenizer")
+    if not (os.path.exists(path) and os.path.isdir(tokenizer_dir)):
+        return None
+
+    import torch
+    from transformers import AutoTokenizer
+
+    extra = {"model_name": "", "max_seq_length": "", "dim": ""}
+    module = torch.jit.load(path, map_location="cpu", _extra_files=extra)
+    if extra["model_name"].decode() != model_name:
+        return None
+    return TorchScriptSentenceEncoder(
+        module.eval(),
+        AutoTokenizer.from_pretrained(tokenizer_dir),
+        max_seq_length=int(extra["max_seq_length"].decode()),
+        dim=int(extra["dim"].decode()),
+    )
+
+
+def _load_embedding_model(model_name: str) -> Tuple[object, str]:
     """
-    Lazy-load SentenceTransformer model.
-    This keeps backend startup clean if ML deps are not installed.
+    Load `model_name` as selected by EMBEDDING_MODEL_ARTIFACT:
+    - "eager":       SentenceTransformer
+    - "torchscript": traced export (falls back to eager if not exported)
+    - "int8":        int8 traced export, else the SentenceTransformer with its
+                     Linear layers dynamically quantized in-process
+    Returns (model, artifact actually used).
     """
-    _require_sentence_transformers()
+    artifact = settings.EMBEDDING_MODEL_ARTIFACT
+    if artifact in ("torchscript", "int8"):
+        encoder = _load_scripted_encoder(model_name, artifact)
+        if encoder is not None:
+            return encoder, artifact
+
     from sentence_transformers import SentenceTransformer
 
-    return SentenceTransformer(model_name)
+    model = SentenceTransformer(model_name)
+    if artifact == "int8":
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+
+        return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8), "int8"
+    return model, "eager"
 
 
-def encode_texts(texts: List[str], model_name: str = DEFAULT_EMBEDDING_MODEL):
+class EmbeddingModelRegistry:
     """
-    Encode a list of texts into embeddings (numpy array).
+    Process-wide cache of SentenceTransformer models keyed by model name.
+
+    - Each model is loaded from disk once per process; concurrent first calls
+      for the same name wait on a per-name lock instead of loading twice.
+    - `swap()` loads the new model fully before publishing it, so requests
+      already holding the old model object finish with it untouched.
+    - `stats()` reports load time and approximate memory per model.
+    """
+
+    def __init__(self, active_model: str = DEFAULT_EMBEDDING_MODEL):
+        self._models: Dict[str, object] = {}
+        self._stats: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._active_model = active_model
+
+    @property
+    def active_model(self) -> str:
+        return self._active_model
+
+    def _load_lock(self, model_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._load_locks.get(model_name)
+            if lock is None:
+                lock = threading.Lock()
+                self._load_locks[model_name] = lock
+            return lock
+
+    def get(self, model_name: Optional[str] = None):
+        """
+        Return the cached model, loading it on first use.
+        """
+        name = model_name or self._active_model
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        _require_sentence_transformers()
+        with self._load_lock(name):
+            # another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            started = time.perf_counter()
+            model, artifact = _load_embedding_model(name)
+            load_seconds = time.perf_counter() - started
+
+            with self._lock:
+                self._models[name] = model
+                self._stats[name] = {
+                    "load_seconds": round(load_seconds, 4),
+                    "memory_bytes": _model_memory_bytes(model),
+                    "embedding_dim": int(model.get_sentence_embedding_dimension()),
+                    "artifact": artifact,
+                }
+            return model
+
+    def warm(self, model_name: Optional[str] = None) -> Dict[str, object]:
+        """
+        Load a model and run one tiny encode so the first real request
+        does not pay for lazy initialisation.
+        """
+        name = model_name or self._active_model
+        model = self.get(name)
+        model.encode(["warmup"], convert_to_numpy=True)
+        return self._stats[name]
+
+    def swap(self, model_name: str, unload_previous: bool = False) -> str:
+        """
+        Make `model_name` the active model.
+
+        The new model is loaded before the active name changes, so callers
+        never observe a half-loaded model. Returns the previous model name.
+        """
+        self.get(model_name)
+        with self._lock:
+            previous = self._active_model
+            self._active_model = model_name
+            if unload_previous and previous != model_name:
+                # in-flight requests keep their own reference until they finish
+                self._models.pop(previous, None)
+                self._stats.pop(previous, None)
+        return previous
+
+    def unload(self, model_name: str):
+        with self._lock:
+            self._models.pop(model_name, None)
+            self._stats.pop(model_name, None)
+
+    def artifact(self, model_name: Optional[str] = None) -> str:
+        """
+        The artifact serving `model_name` ("eager", "torchscript" or "int8"),
+        or EMBEDDING_MODEL_ARTIFACT if it is not loaded yet.
+        """
+        name = model_name or self._active_model
+        with self._lock:
+            stats = self._stats.get(name)
+        return stats["artifact"] if stats else settings.EMBEDDING_MODEL_ARTIFACT
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "active_model": self._active_model,
+                "models": {name: dict(s) for name, s in self._stats.items()},
+            }
+
+
+# One registry per process (each uvicorn worker gets its own).
+_registry = EmbeddingModelRegistry()
+
+
+def get_model_registry() -> EmbeddingModelRegistry:
+    return _registry
+
+
+def get_embedding_model(model_name: Optional[str] = None):
+    """
+    Return the process-wide SentenceTransformer for `model_name`
+    (defaults to the registry's active model).
+
+    Loading stays lazy, so backend startup is clean if ML deps are not installed.
+    """
+    return _registry.get(model_name)
+
+
+class _DiskEmbeddingStore:
+    """
+    Append-only on-disk embeddings for one model, shared by every process:
+
+    - vectors.f32: float32 rows, memory-mapped; grown by doubling (ftruncate)
+    - index.sqlite3: key -> row (WAL), plus the next free row
+
+    A row is allocated inside a sqlite write transaction, so concurrent
+    writers never share one; its key is inserted only after the vector is
+    written, so readers never see an unwritten row.
+    """
+
+    _MIN_ROWS = 4096
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.index_path = os.path.join(directory, "index.sqlite3")
+        self._local = threading.local()
+        self._map: Optional[np.memmap] = None
+        self._map_lock = threading.Lock()
+        self.dim: Optional[int] = None
+
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS idx (key BLOB PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.dim = self._stored_dim(conn)
+
+    @staticmethod
+    def _stored_dim(conn: sqlite3.Connection) -> Optional[int]:
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        return row[0] if row else None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _mapped(self, min_rows: int) -> np.memmap:
+        """Memory map covering at least `min_rows` rows (remapped if another process grew the file)."""
+        with self._map_lock:
+            if self._map is None or self._map.shape[0] < min_rows:
+                rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+                self._map = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+            return self._map
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        if not keys:
+            return {}
+        conn = self._conn()
+        if self.dim is None:
+            # another process may have written the first vectors since __init__
+            self.dim = self._stored_dim(conn)
+            if self.dim is None:
+                return {}
+        found: Dict[bytes, int] = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(conn.execute(f"SELECT key, row FROM idx WHERE key IN ({placeholders})", chunk).fetchall())
+        if not found:
+            return {}
+        vectors = self._mapped(max(found.values()) + 1)
+        return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        if not keys:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.dim is None:
+                self.dim = self._stored_dim(conn) or int(vectors.shape[1])
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+            row = conn.execute("SELECT value FROM meta WHERE name = 'next_row'").fetchone()
+            first = row[0] if row else 0
+            end = first + len(keys)
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('next_row', ?)", (end,))
+
+            # grow the file (doubling) while holding the write lock
+            size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            if size < end * 4 * self.dim:
+                capacity = max(self._MIN_ROWS, size // (4 * self.dim))
+                while capacity < end:
+                    capacity *= 2
+                with open(self.vectors_path, "ab") as f:
+                    f.truncate(capacity * 4 * self.dim)
+
+            mapped = self._mapped(end)
+            mapped[first:end] = vectors
+            mapped.flush()
+            conn.executemany(
+                "INSERT OR IGNORE INTO idx (key, row) VALUES (?, ?)",
+                [(key, first + i) for i, key in enumerate(keys)],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM idx").fetchone()[0]
+
+    def disk_bytes(self) -> int:
+        return os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+
+
+class _CacheLookup(NamedTuple):
+    keys: List[bytes]
+    found: Dict[bytes, np.ndarray]
+    missing: Dict[bytes, str]  # key -> text, unique, in first-seen order
+    store: _DiskEmbeddingStore
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by hash(model_name, artifact, text):
+    the eager model and its TorchScript / int8 exports (EMBEDDING_MODEL_ARTIFACT)
+    produce slightly different vectors, so each variant has its own entries.
+
+    In-memory LRU (EMBEDDING_CACHE_MEMORY_ITEMS vectors) in front of a
+    per-model _DiskEmbeddingStore under EMBEDDING_CACHE_DIR, so vectors
+    survive restarts and are shared by all uvicorn workers and the
+    pfl_train / fl_client CLIs. Only texts missing from both are encoded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._stores: Dict[str, _DiskEmbeddingStore] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, text: str, artifact: str = "eager") -> bytes:
+        return hashlib.blake2b(f"{model_name}\0{artifact}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def _store(self, model_name: str) -> _DiskEmbeddingStore:
+        with self._lock:
+            store = self._stores.get(model_name)
+            if store is None:
+                safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+                store = _DiskEmbeddingStore(os.path.join(settings.EMBEDDING_CACHE_DIR, safe))
+                self._stores[model_name] = store
+            return store
+
+    def _remember(self, items: Dict[bytes, np.ndarray]):
+        with self._lock:
+            for key, vec in items.items():
+                self._memory[key] = vec
+                self._memory.move_to_end(key)
+            while len(self._memory) > settings.EMBEDDING_CACHE_MEMORY_ITEMS:
+                self._memory.popitem(last=False)
+
+    def lookup(self, texts: List[str], model_name: str, artifact: str = "eager") -> "_CacheLookup":
+        """
+        First half of encode(): memory, then disk. The returned lookup lists
+        the unique texts that still need encoding (`missing`).
+        """
+        keys = [self.key(model_name, t, artifact) for t in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+        memory_hits = len(found)
+
+        store = self._store(model_name)
+        wanted = list({k: None for k in keys if k not in found})
+        from_disk = store.get_many(wanted)
+        found.update(from_disk)
+        self._remember(from_disk)
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing)
+        return _CacheLookup(keys, found, missing, store)
+
+    def complete(self, pending: "_CacheLookup", new_vectors: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Second half of encode(): store the vectors computed for
+        `pending.missing` (same order) and assemble the (N, D) result.
+        """
+        found = pending.found
+        if pending.missing:
+            new_keys = list(pending.missing.keys())
+            new_vecs = np.asarray(new_vectors, dtype=np.float32)
+            pending.store.put_many(new_keys, new_vecs)
+            computed = dict(zip(new_keys, new_vecs))
+            found.update(computed)
+            self._remember(computed)
+
+        if not pending.keys:
+            return np.empty((0, pending.store.dim or 0), dtype=np.float32)
+        return np.stack([found[k] for k in pending.keys])
+
+    def encode(self, texts: List[str], model_name: str, encode_fn, artifact: str = "eager") -> np.ndarray:
+        """
+        Embeddings for `texts` (N, D); `encode_fn(missing_texts)` runs once for
+        the unique texts found in neither the memory nor the disk cache.
+        """
+        pending = self.lookup(texts, model_name, artifact)
+        new_vectors = encode_fn(list(pending.missing.values())) if pending.missing else None
+        return self.complete(pending, new_vectors)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            memory_bytes = sum(v.nbytes for v in self._memory.values())
+            stores = dict(self._stores)
+            out = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+                "memory_items": len(self._memory),
+                "memory_bytes": memory_bytes,
+            }
+        out["disk"] = {
+            name: {"items": store.count(), "bytes": store.disk_bytes()} for name, store in stores.items()
+        }
+        return out
+
+
+_embedding_cache = EmbeddingCache()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    return _embedding_cache
+
+
+def _encode_many(payloads: List[Tuple[object, List[str]]]) -> List[np.ndarray]:
+    """
+    MicroBatcher batch_fn: one model.encode() per distinct model over the
+    unique queued texts (concurrent misses often share a job text), split
+    back per request.
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(payloads)
+    groups: Dict[int, List[int]] = {}
+    for i, (model, _) in enumerate(payloads):
+        groups.setdefault(id(model), []).append(i)
+    for idxs in groups.values():
+        model = payloads[idxs[0]][0]
+        texts = [t for i in idxs for t in payloads[i][1]]
+        unique = {t: row for row, t in enumerate(dict.fromkeys(texts))}
+        encoded = np.asarray(model.encode(list(unique), convert_to_numpy=True), dtype=np.float32)
+        embs = encoded[[unique[t] for t in texts]]
+        bounds = np.cumsum([len(payloads[i][1]) for i in idxs])[:-1]
+        for i, part in zip(idxs, np.split(embs, bounds)):
+            results[i] = part
+    return results
+
+
+_encode_batcher = MicroBatcher(
+    _encode_many,
+    max_items=settings.EMBEDDING_MICROBATCH_MAX_TEXTS,
+    max_wait_ms=settings.EMBEDDING_MICROBATCH_WAIT_MS,
+    name="embedding-encode",
+)
+
+
+def get_encode_batcher() -> MicroBatcher:
+    return _encode_batcher
+
+
+def _submit_encode(model, texts: List[str]) -> Future:
+    """
+    model.encode(texts) as a Future. Small requests share the encode
+    micro-batcher's worker thread; requests that would fill a batch on their
+    own (backfills, batch recommend) run right away in the caller's thread.
+    """
+    if settings.EMBEDDING_MICROBATCH_ENABLED and len(texts) < settings.EMBEDDING_MICROBATCH_MAX_TEXTS:
+        return _encode_batcher.submit((model, texts), size=len(texts))
+
+    future: Future = Future()
+    try:
+        future.set_result(np.asarray(model.encode(texts, convert_to_numpy=True), dtype=np.float32))
+    except BaseException as exc:
+        future.set_exception(exc)
+    return future
+
+
+def encode_texts_async(texts: List[str], model_name: Optional[str] = None) -> Future:
+    """
+    Future of encode_texts(texts): cache hits are resolved right away, and
+    only the misses wait for the shared encode micro-batch.
     """
     model = get_embedding_model(model_name)
-    return model.encode(texts, convert_to_numpy=True)
+    texts = list(texts)
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return _submit_encode(model, texts)
+
+    cache = _embedding_cache
+    name = model_name or _registry.active_model
+    pending = cache.lookup(texts, name, _registry.artifact(name))
+    result: Future = Future()
+    if not pending.missing:
+        result.set_result(cache.complete(pending, None))
+        return result
+
+    def _done(encoded: Future):
+        try:
+            result.set_result(cache.complete(pending, encoded.result()))
+        except BaseException as exc:
+            result.set_exception(exc)
+
+    _submit_encode(model, list(pending.missing.values())).add_done_callback(_done)
+    return result
+
+
+def encode_texts(texts: List[str], model_name: Optional[str] = None):
+    """
+    Encode a list of texts into embeddings (numpy array).
+
+    Goes through the content-hash EmbeddingCache unless EMBEDDING_CACHE_ENABLED
+    is off; only texts not seen before (by this model and artifact) reach the model, and
+    concurrent small calls are coalesced by the encode micro-batcher.
+    """
+    return encode_texts_async(texts, model_name).result()
 
 
-def get_embedding_dim(model_name: str = DEFAULT_EMBEDDING_MODEL) -> int:
+def get_embedding_dim(model_name: Optional[str] = None) -> int:
     """
     Return embedding dimension for the configured model.
 
@@ -0,0 +1,273 @@
+# app/ml/export.py
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+
+from app.core.config import get_settings
+from app.ml.model import GLOBAL_ARTIFACT_FILES, global_checkpoint_digest, load_global_model
+from app.ml.ranking import top_k_indices
+
+settings = get_settings
+
+GLOBAL_TS = GLOBAL_ARTIFACT_FILES["torchscript"]
+GLOBAL_INT8_TS = GLOBAL_ARTIFACT_FILES["int8"]
+EMBEDDING_TS = "embedding.ts.pt"
+EMBEDDING_INT8_TS = "embedding.int8.ts.pt"
+EMBEDDING_TOKENIZER_DIR = "embedding_tokenizer"
+
+
+# ---------- export ----------
+
+def export_global_model(out_dir: str, formats: List[str], model: nn.Module, input_dim: int) -> Dict[str, str]:
+    """
+    Write the global PFLRecommender (loaded from the current checkpoint) as
+    TorchScript / int8 TorchScript, the files GLOBAL_MODEL_ARTIFACT serves.
+    They carry the checkpoint digest so serving can detect stale exports.
+    """
+    example = torch.randn(8, input_dim)
+    extra = {"source_digest": global_checkpoint_digest(), "input_dim": str(input_dim)}
+    written = {}
+
+    with torch.no_grad():
+        if "torchscript" in formats:
+            path = os.path.join(out_dir, GLOBAL_TS)
+            torch.jit.save(torch.jit.trace(model, example), path, _extra_files=extra)
+            written["torchscript"] = path
+        if "int8" in formats:
+            path = os.path.join(out_dir, GLOBAL_INT8_TS)
+            quantized = quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            torch.jit.save(torch.jit.trace(quantized, example), path, _extra_files=extra)
+            written["int8"] = path
+    return written
+
+
+class _EncoderForExport(nn.Module):
+    """SentenceTransformer as a tensors-in / tensor-out module (traceable)."""
+
+    def __init__(self, st_model):
+        super().__init__()
+        self.st = st_model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.st({"input_ids": input_ids, "attention_mask": attention_mask})["sentence_embedding"]
+
+
+def export_embedding_model(out_dir: str, formats: List[str], model_name: str) -> Dict[str, str]:
+    """
+    Write the sentence encoder as TorchScript / int8 TorchScript, plus
+    its tokenizer (app/ml/embeddings.py loads these when EMBEDDING_MODEL_ARTIFACT
+    selects them).
+    """
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name).eval()
+    encoder = _EncoderForExport(st_model).eval()
+    features = st_model.tokenize(
+        ["example internship posting used for tracing", "python, sql, docker"]
+    )
+    example = (features["input_ids"], features["attention_mask"])
+    extra = {
+        "model_name": model_name,
+        "max_seq_length": str(st_model.max_seq_length),
+        "dim": str(st_model.get_sentence_embedding_dimension()),
+    }
+    st_model.tokenizer.save_pretrained(os.path.join(out_dir, EMBEDDING_TOKENIZER_DIR))
+    written = {}
+
+    with torch.no_grad():
+        if "torchscript" in formats:
+            path = os.path.join(out_dir, EMBEDDING_TS)
+            torch.jit.save(torch.jit.trace(encoder, example, strict=False), path, _extra_files=extra)
+            written["torchscript"] = path
+        if "int8" in formats:
+            path = os.path.join(out_dir, EMBEDDING_INT8_TS)
+            quantized = quantize_dynamic(encoder, {nn.Linear}, dtype=torch.qint8)
+            torch.jit.save(torch.jit.trace(quantized, example, strict=False), path, _extra_files=extra)
+            written["int8"] = path
+    return written
+
+
+# ---------- parity ----------
+
+def _ranking_parity(ref: np.ndarray, got: np.ndarray, k: int) -> Dict[str, float]:
+    """
+    Max |score deviation| and overlap@k of the top-k sets, row by row
+    (each row is one query: a student, or a text).
+    """
+    overlaps = []
+    for r, g in zip(ref, got):
+        a = set(top_k_indices(r, k).tolist())
+        b = set(top_k_indices(g, k).tolist())
+        overlaps.append(len(a & b) / max(1, len(a)))
+    return {
+        "max_abs_deviation": float(np.max(np.abs(ref - got))),
+        "mean_overlap_at_k": round(float(np.mean(overlaps)), 4),
+        "min_overlap_at_k": round(float(np.min(overlaps)), 4),
+    }
+
+
+def _timed(fn, repeats: int = 3):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        out = fn()
+    return out, (time.perf_counter() - started) / repeats * 1e3
+
+
+def global_parity(
+    out_dir: str,
+    model: nn.Module,
+    input_dim: int,
+    n_students: int,
+    n_jobs: int,
+    k: int,
+    seed: int = 0,
+):
+    """
+    Scores of what each GLOBAL_MODEL_ARTIFACT serves (the factorized eager
+    scorer, the exported modules run by ModuleScorer) vs. the plain eager
+    forward pass on random unit-norm student/job embeddings.
+    """
+    from app.ml.features import build_pair_feature_matrix
+    from app.ml.scoring import FactorizedScorer, ModuleScorer
+
+    d = input_dim // 4
+    rng = np.random.default_rng(seed)
+    S = rng.standard_normal((n_students, d)).astype(np.float32)
+    J = rng.standard_normal((n_jobs, d)).astype(np.float32)
+    S /= np.linalg.norm(S, axis=1, keepdims=True)
+    J /= np.linalg.norm(J, axis=1, keepdims=True)
+
+    def forward_all(module):
+        rows = []
+        with torch.no_grad():
+            for s_vec in S:
+                X = torch.from_numpy(build_pair_feature_matrix(s_vec, J))
+                rows.append(module(X).reshape(-1).numpy())
+        return np.stack(rows)
+
+    ref, ref_ms = _timed(lambda: forward_all(model), repeats=1)
+    report = {"forward": {"ms": round(ref_ms, 1)}}
+
+    scorers = {"eager": FactorizedScorer(model)}
+    for name, filename in (("torchscript", GLOBAL_TS), ("int8", GLOBAL_INT8_TS)):
+        path = os.path.join(out_dir, filename)
+        if os.path.exists(path):
+            scorers[name] = ModuleScorer(torch.jit.load(path, map_location="cpu").eval())
+
+    for name, scorer in scorers.items():
+        got, ms = _timed(lambda: scorer.score_many(S, J, catalog_key="parity"))
+        report[name] = {**_ranking_parity(ref, got, k), "ms": round(ms, 1)}
+    return report
+
+
+def embedding_parity(out_dir: str, model_name: str, texts: List[str], k: int):
+    """
+    Embeddings of each exported encoder vs. the eager SentenceTransformer:
+    max |deviation| and overlap@k of cosine-similarity rankings.
+    """
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer
+
+    from app.ml.embeddings import TorchScriptSentenceEncoder
+
+    st_model = SentenceTransformer(model_name).eval()
+    ref, ref_ms = _timed(lambda: st_model.encode(texts, convert_to_numpy=True), repeats=1)
+    report = {"eager": {"ms": round(ref_ms, 1)}}
+
+    ref_n = ref / np.linalg.norm(ref, axis=1, keepdims=True)
+    tokenizer = AutoTokenizer.from_pretrained(os.path.join(out_dir, EMBEDDING_TOKENIZER_DIR))
+
+    for name, filename in (("torchscript", EMBEDDING_TS), ("int8", EMBEDDING_INT8_TS)):
+        path = os.path.join(out_dir, filename)
+        if not os.path.exists(path):
+            continue
+        encoder = TorchScriptSentenceEncoder(
+            torch.jit.load(path, map_location="cpu").eval(),
+            tokenizer,
+            max_seq_length=st_model.max_seq_length,
+            dim=st_model.get_sentence_embedding_dimension(),
+        )
+        got, ms = _timed(lambda: encoder.encode(texts), repeats=1)
+        got_n = got / np.linalg.norm(got, axis=1, keepdims=True)
+        parity = _ranking_parity(ref_n @ ref_n.T, got_n @ got_n.T, k)
+        parity["max_abs_deviation"] = float(np.max(np.abs(ref - got)))
+        report[name] = {**parity, "ms": round(ms, 1)}
+    return report
+
+
+def _sample_texts(from_db: bool, limit: int) -> List[str]:
+    if from_db:
+        from app.db.session import SessionLocal
+        from app.ml.features import _job_text
+        from app.models.models import Job
+
+        db = SessionLocal()
+        try:
+            return [_job_text(job) for job in db.query(Job).limit(limit).all()]
+        finally:
+            db.close()
+
+    rng = np.random.default_rng(0)
+    roles = ["Frontend Intern", "Backend Developer", "Data Analyst", "ML Engineer Intern", "QA Tester"]
+    skills = ["python", "sql", "react", "docker", "pandas", "java", "aws", "figma", "pytorch", "excel"]
+    return [
+        f"{roles[i % len(roles)]}. Skills: {', '.join(rng.choice(skills, size=4, replace=False))}."
+        for i in range(limit)
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Export TorchScript / int8 TorchScript inference artifacts and write a parity report"
+    )
+    parser.add_argument("--out-dir", default=settings.ARTIFACTS_DIR)
+    parser.add_argument(
+        "--formats", nargs="+", default=["torchscript", "int8"], choices=["torchscript", "int8"]
+    )
+    parser.add_argument("--models", nargs="+", default=["global", "embedding"], choices=["global", "embedding"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--students", type=int, default=32)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--from-db", action="store_true", help="use job texts from the database")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    report = {"k": args.k}
+
+    if "global" in args.models:
+        from app.ml.features import get_input_dim
+
+        input_dim = get_input_dim()
+        model = load_global_model(input_dim).eval()
+        report["global_artifacts"] = export_global_model(args.out_dir, args.formats, model, input_dim)
+        report["global_parity"] = global_parity(
+            args.out_dir, model, input_dim, args.students, args.jobs, args.k
+        )
+
+    if "embedding" in args.models:
+        from app.ml.embeddings import get_model_registry
+
+        model_name = get_model_registry().active_model
+        report["embedding_artifacts"] = export_embedding_model(args.out_dir, args.formats, model_name)
+        texts = _sample_texts(args.from_db, args.texts)
+        report["embedding_parity"] = embedding_parity(args.out_dir, model_name, texts, args.k)
+
+    path = os.path.join(args.out_dir, "parity_report.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"✅ Artifacts and parity report written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # app/ml/features.py
 
-from typing import Tuple
+import threading
+from typing import Optional, Tuple
 
 import numpy as np
 from sqlalchemy.orm import Session
@@ -65,6 +66,77 @@ def _job_text(job: Job) -> str:
     return " ; ".join(parts)
 
 
+def pair_features(s_vec: np.ndarray, j_vec: np.ndarray) -> np.ndarray:
+    """
+    Concatenate two embeddings as [s, j, |s-j|, s*j] (shape (4D,), float32).
+    """
+    diff = np.abs(s_vec - j_vec)
+    prod = s_vec * j_vec
+
+    pair = np.concatenate([s_vec, j_vec, diff, prod], axis=0)  # shape (4D,)
+    pair = pair.astype(np.float32)
+    return pair
+
+
+def build_pair_feature_matrix(
+    s_vec: np.ndarray,
+    J: np.ndarray,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Batched version of pair_features(): one student vs. N jobs.
+
+    s_vec: (D,) student embedding, or (N, D) one per row
+    J:     (N, D) job embedding matrix
+    out:   optional preallocated (N, 4D) float32 buffer to write into
+
+    Returns the (N, 4D) float32 matrix [s, j, |s-j|, s*j], built with a handful
+    of in-place NumPy ops (no per-row Python loop, no temporaries of size N*D).
+    """
+    s = np.asarray(s_vec, dtype=np.float32)
+    J = np.asarray(J, dtype=np.float32)
+    n, d = J.shape
+
+    if out is None:
+        out = np.empty((n, 4 * d), dtype=np.float32)
+    elif out.shape != (n, 4 * d) or out.dtype != np.float32:
+        raise ValueError(f"out must be float32 with shape {(n, 4 * d)}, got {out.dtype} {out.shape}")
+
+    out[:, :d] = s
+    out[:, d : 2 * d] = J
+    diff = out[:, 2 * d : 3 * d]
+    np.subtract(J, s, out=diff)
+    np.abs(diff, out=diff)
+    np.multiply(J, s, out=out[:, 3 * d :])
+    return out
+
+
+_pair_buffers = threading.local()
+
+
+def pair_feature_buffer(n: int, d: int) -> np.ndarray:
+    """
+    Reusable (n, 4D) float32 scratch buffer, one per thread.
+
+    The buffer only grows, so repeated requests over a large catalog reuse the
+    same allocation. The returned view is overwritten by the next call in the
+    same thread: use it for scoring, not for data you keep around.
+    """
+    buf = getattr(_pair_buffers, "buf", None)
+    if buf is None or buf.shape[1] != 4 * d or buf.shape[0] < n:
+        rows = n if buf is None or buf.shape[1] != 4 * d else max(n, 2 * buf.shape[0])
+        buf = np.empty((rows, 4 * d), dtype=np.float32)
+        _pair_buffers.buf = buf
+    return buf[:n]
+
+
+def encode_student(student: Student) -> np.ndarray:
+    """
+    Sentence embedding of the student's profile text, shape (D,).
+    """
+    return encode_texts([_student_text(student)])[0]
+
+
 def build_pair_features(student: Student, job: Job) -> np.ndarray:
     """
     Encode (student, job) as a semantic feature vector.
@@ -82,12 +154,7 @@ def build_pair_features(student: Student, job: Job) -> np.ndarray:
     s_vec = embs[0]  # (D,)
     j_vec = embs[1]  # (D,)
 
-    diff = np.abs(s_vec - j_vec)
-    prod = s_vec * j_vec
-
-    pair = np.concatenate([s_vec, j_vec, diff, prod], axis=0)  # shape (4D,)
-    pair = pair.astype(np.float32)
-    return pair
+    return pair_features(s_vec, j_vec)
 
 
 def get_input_dim() -> int:
@@ -116,14 +183,12 @@ def get_student_feedback_dataset(
     if not rows:
         return np.empty((0, 1), dtype=np.float32), np.empty((0,), dtype=np.float32)
 
-    X_list = []
-    y_list = []
+    # local import: job_embeddings imports this module for _job_text
+    from app.ml.job_embeddings import get_job_embedding_matrix
 
-    for fb, job in rows:
-        x = build_pair_features(student, job)
-        X_list.append(x)
-        y_list.append(1.0 if fb.liked else 0.0)
+    s_vec = encode_student(student)
+    J = get_job_embedding_matrix(db, [job for _, job in rows])
 
-    X = np.stack(X_list).astype(np.float32)
-    y = np.array(y_list, dtype=np.float32)
+    X = build_pair_feature_matrix(s_vec, J)
+    y = np.array([1.0 if fb.liked else 0.0 for fb, _ in rows], dtype=np.float32)
     return X, y
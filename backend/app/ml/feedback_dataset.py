@@ -0,0 +1,243 @@
+# app/ml/feedback_dataset.py
+
+import argparse
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.models import Feedback, Job, Student
+from app.ml.embeddings import encode_texts
+from app.ml.features import _student_text
+from app.ml.streaming_train import PairFeatures
+
+_CHUNK = 1000
+
+
+class FeedbackDatasets(NamedTuple):
+    """
+    Per-client (student) training data for a federated round, kept as the
+    shared embedding tables plus row indices; no client's (n, 4D) feature
+    matrix exists until it is asked for.
+
+    pairs:      every eligible feedback row, grouped by client (PairFeatures)
+    bounds:     {student_id: (first row, end row) in `pairs`}, ascending id
+    timings_ms: {phase: ms}
+    """
+
+    pairs: PairFeatures
+    bounds: Dict[int, Tuple[int, int]]
+    timings_ms: Dict[str, float]
+
+    @property
+    def clients(self) -> Dict[int, PairFeatures]:
+        """{student_id: that client's rows}: views over the shared tables, built per batch."""
+        return {student_id: self.client(student_id) for student_id in self.bounds}
+
+    def client(self, student_id: int) -> PairFeatures:
+        start, stop = self.bounds[student_id]
+        p = self.pairs
+        return PairFeatures(p.S, p.J, p.student_rows[start:stop], p.job_rows[start:stop], p.y[start:stop])
+
+    def dataset(self, student_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """One client's materialized (X (n, 4D) float32, y (n,) float32)."""
+        return self.client(student_id).materialize()
+
+    def concatenated(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All clients' rows as one (X, y), e.g. one organization's FL client."""
+        return self.pairs.materialize()
+
+
+class _FeedbackEmbeddings(NamedTuple):
+    students: List[int]     # eligible students, ascending
+    counts: np.ndarray      # rows per student, in that order
+    S: np.ndarray           # (students, D) float32
+    J: np.ndarray           # (unique jobs, D) float32
+    job_rows: np.ndarray    # row in J of every feedback row, grouped by student
+    y: np.ndarray           # (rows,) float32
+
+
+def _feedback_embeddings(
+    db: Session,
+    min_feedback: int,
+    student_ids: Optional[List[int]],
+    yield_per: int,
+    lap,
+) -> Optional[_FeedbackEmbeddings]:
+    """Phases query / jobs / students of build_feedback_datasets(); None if no eligible rows."""
+    # local import: job_embeddings imports app.ml.features
+    from app.ml.job_embeddings import index_jobs
+
+    q = (
+        db.query(Feedback.student_id, Feedback.job_id, Feedback.liked)
+        .join(Job, Feedback.job_id == Job.id)
+        .order_by(Feedback.student_id, Feedback.id)
+    )
+    if student_ids is not None:
+        q = q.filter(Feedback.student_id.in_(student_ids))
+
+    sids: List[int] = []
+    jids: List[int] = []
+    liked: List[float] = []
+    for student_id, job_id, is_liked in q.yield_per(yield_per):
+        sids.append(student_id)
+        jids.append(job_id)
+        liked.append(1.0 if is_liked else 0.0)
+    lap("query")
+
+    if not sids:
+        return None
+
+    sid_arr = np.asarray(sids, dtype=np.int64)
+    jid_arr = np.asarray(jids, dtype=np.int64)
+    y_arr = np.asarray(liked, dtype=np.float32)
+    del sids, jids, liked
+
+    # group by student (rows are already sorted by student) and drop small clients
+    students, starts, counts = np.unique(sid_arr, return_index=True, return_counts=True)
+    keep = counts >= min_feedback
+    students, starts, counts = students[keep], starts[keep], counts[keep]
+    if students.shape[0] == 0:
+        return None
+    rows = np.concatenate([np.arange(s, s + c) for s, c in zip(starts, counts)])
+
+    # one vector per unique job
+    job_ids, job_rows = np.unique(jid_arr[rows], return_inverse=True)
+    blocks = []
+    for start in range(0, job_ids.shape[0], _CHUNK):
+        chunk = job_ids[start : start + _CHUNK].tolist()
+        vectors = index_jobs(db, db.query(Job).filter(Job.id.in_(chunk)).all())
+        blocks.append(np.stack([vectors[job_id] for job_id in chunk]))
+    J = np.concatenate(blocks).astype(np.float32, copy=False)
+    lap("jobs")
+
+    # one vector per unique student
+    texts: Dict[int, str] = {}
+    student_list = students.tolist()
+    for start in range(0, len(student_list), _CHUNK):
+        chunk = student_list[start : start + _CHUNK]
+        for student in db.query(Student).filter(Student.id.in_(chunk)).all():
+            texts[student.id] = _student_text(student)
+    S = np.asarray(encode_texts([texts[sid] for sid in student_list]), dtype=np.float32)
+    lap("students")
+
+    return _FeedbackEmbeddings(student_list, counts, S, J, job_rows.astype(np.int32), y_arr[rows])
+
+
+def _timer(timings: Dict[str, float]):
+    clock = time.perf_counter()
+
+    def lap(phase: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[phase] = round((now - clock) * 1e3, 2)
+        clock = now
+
+    return lap
+
+
+def build_feedback_datasets(
+    db: Session,
+    min_feedback: int = 1,
+    student_ids: Optional[List[int]] = None,
+    yield_per: int = 5000,
+) -> FeedbackDatasets:
+    """
+    Training rows for every student with at least `min_feedback` feedback
+    rows, in one pass instead of one get_student_feedback_dataset() per student:
+
+    1. query:    one streaming Feedback ⋈ Job query ordered by student,
+                 kept as three int arrays (student, job, liked)
+    2. jobs:     vectors for the unique jobs, from the job embedding store
+                 (stale / missing ones encoded in one batch)
+    3. students: the unique eligible students' texts in one encode_texts()
+    4. assemble: each client's row range over the shared embeddings; its
+                 [s, j, |s-j|, s*j] features are built per training batch
+
+    Rows of a client are in feedback id order; y = 1 if liked, else 0.
+    Memory is the student / job tables plus ~12 bytes per feedback row,
+    not 6 KB of features per row (D=384).
+    """
+    timings: Dict[str, float] = {}
+    lap = _timer(timings)
+    emb = _feedback_embeddings(db, min_feedback, student_ids, yield_per, lap)
+    if emb is None:
+        return FeedbackDatasets(PairFeatures.empty(), {}, timings)
+
+    student_rows = np.repeat(np.arange(len(emb.students), dtype=np.int32), emb.counts)
+    pairs = PairFeatures(emb.S, emb.J, student_rows, emb.job_rows, emb.y)
+    ends = np.cumsum(emb.counts).tolist()
+    bounds = {
+        student_id: (end - count, end)
+        for student_id, count, end in zip(emb.students, emb.counts.tolist(), ends)
+    }
+    lap("assemble")
+
+    return FeedbackDatasets(pairs, bounds, timings)
+
+
+def build_feedback_pairs(
+    db: Session,
+    min_feedback: int = 1,
+    student_ids: Optional[List[int]] = None,
+    yield_per: int = 5000,
+) -> Tuple[PairFeatures, Dict[str, float]]:
+    """
+    All eligible feedback as one lazily built training source (the rows of
+    build_feedback_datasets(...).concatenated()); streaming_train builds
+    each mini-batch's features on demand.
+    """
+    data = build_feedback_datasets(db, min_feedback, student_ids, yield_per)
+    return data.pairs, data.timings_ms
+
+
+def _compare(min_feedback: int):
+    """
+    Build every client's dataset both ways on the current database and
+    compare results and wall time.
+    """
+    from app.db.session import SessionLocal
+    from app.ml.features import get_student_feedback_dataset
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        data = build_feedback_datasets(db, min_feedback=min_feedback)
+        bulk_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ref: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        for student in db.query(Student).all():
+            X, y = get_student_feedback_dataset(db, student)
+            if X.shape[0] >= min_feedback:
+                ref[student.id] = (X, y)
+        loop_s = time.perf_counter() - started
+    finally:
+        db.close()
+
+    print(f"clients={len(data.bounds)} rows={len(data.pairs)}")
+    print(f"  phases (ms)          : {data.timings_ms}")
+    print(f"  bulk builder         : {bulk_s * 1e3:8.1f} ms")
+    print(f"  per-student loop     : {loop_s * 1e3:8.1f} ms")
+
+    same_clients = set(ref) == set(data.bounds)
+    # the per-student query has no ORDER BY, so compare rows as multisets
+    max_diff = 0.0
+    for student_id in set(ref) & set(data.bounds):
+        a = np.column_stack([ref[student_id][0], ref[student_id][1]])
+        b = np.column_stack(data.dataset(student_id))
+        a, b = a[np.lexsort(a.T[::-1])], b[np.lexsort(b.T[::-1])]
+        max_diff = max(max_diff, float(np.max(np.abs(a - b))) if a.shape == b.shape else float("inf"))
+    print(f"  same clients         : {same_clients}")
+    print(f"  max |diff|           : {max_diff:.3e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the bulk feedback dataset builder with the per-student loop"
+    )
+    parser.add_argument("--min-feedback", type=int, default=1)
+    args = parser.parse_args()
+
+    _compare(args.min_feedback)
@@ -3,49 +3,37 @@
 import argparse
 from typing import Dict, List
 
-import numpy as np
 import requests
 import torch
-import torch.nn as nn
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal
-from app.models.models import Student
 from app.ml.model import PFLRecommender, get_shared_state, set_shared_state
-from app.ml.features import get_input_dim, get_student_feedback_dataset
+from app.ml.features import get_input_dim
+from app.ml.feedback_dataset import build_feedback_pairs
+from app.ml.streaming_train import PairFeatures, train_streaming
 
 
 API_BASE = "http://127.0.0.1:8000/api/v1/fl"
 # In real deployment, this is the URL of the central aggregator service.
 
 
-def build_client_dataset(db: Session):
+def build_client_dataset(db: Session) -> PairFeatures:
     """
     PURE FL CLIENT:
 
     This function uses ALL students in this local DB,
     because this whole DB belongs to one organization (one FL client).
     No more filtering by client_id.
-    """
-
-    X_list: List[np.ndarray] = []
-    y_list: List[np.ndarray] = []
-
-    students = db.query(Student).all()
-
-    for s in students:
-        X_s, y_s = get_student_feedback_dataset(db, s)
-        if X_s.shape[0] == 0:
-            continue
-        X_list.append(X_s)
-        y_list.append(y_s)
 
-    if not X_list:
-        return np.empty((0, 1), dtype=np.float32), np.empty((0,), dtype=np.float32)
+    One Feedback ⋈ Job query and one encode pass for all students
+    (app/ml/feedback_dataset.py), kept as embeddings + row indices:
+    features are built per mini-batch while training.
+    """
 
-    X = np.concatenate(X_list, axis=0).astype(np.float32)
-    y = np.concatenate(y_list, axis=0).astype(np.float32)
-    return X, y
+    source, timings = build_feedback_pairs(db)
+    print(f"Built local dataset: {len(source)} rows, phases (ms): {timings}")
+    return source
 
 
 def train_local_client(client_id: str, admin_token: str, epochs: int = 3):
@@ -54,14 +42,14 @@ def train_local_client(client_id: str, admin_token: str, epochs: int = 3):
 
     1. Pull global shared weights from aggregator.
     2. Build local dataset from this node's DB (ALL students + feedback).
-    3. Train locally for a few epochs (PFL).
+    3. Train locally for a few epochs (PFL), streaming FL_BATCH_SIZE mini-batches.
     4. Push updated shared weights back to aggregator.
     """
 
     db = SessionLocal()
     try:
-        X, y = build_client_dataset(db)
-        if X.shape[0] == 0:
+        source = build_client_dataset(db)
+        if len(source) == 0:
             print(f"[{client_id}] No local data to train on.")
             return
 
@@ -80,19 +68,8 @@ def train_local_client(client_id: str, admin_token: str, epochs: int = 3):
         model = PFLRecommender(input_dim)
         set_shared_state(model, shared_state)
 
-        X_tensor = torch.from_numpy(X)
-        y_tensor = torch.from_numpy(y)
-
-        loss_fn = nn.BCELoss()
-        optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
-
-        model.train()
-        for _ in range(epochs):
-            optimizer.zero_grad()
-            preds = model(X_tensor).squeeze()
-            loss = loss_fn(preds, y_tensor)
-            loss.backward()
-            optimizer.step()
+        loss = train_streaming(model, source, epochs=epochs)
+        print(f"[{client_id}] Last epoch loss: {loss:.4f}")
 
         # ---- 3. Extract updated shared weights ----
         updated_shared = get_shared_state(model)
@@ -0,0 +1,295 @@
+# app/ml/fl_jobs.py
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.locks import advisory_unlock, try_advisory_lock
+from app.db.session import SessionLocal
+from app.models.models import FLJob
+from app.ml.parallel_train import RoundCancelled
+from app.ml.pfl_train import run_federated_round
+from app.ml.precompute import get_precompute_scheduler
+
+settings = get_settings
+logger = logging.getLogger(__name__)
+
+# pg advisory lock held by a job for all of its rounds: one FL round at a time across workers
+_ADVISORY_LOCK_KEY = 0x5EC0_0002
+_LOCK_POLL_SECONDS = 2.0
+# progress writes and cancel polls hit the database at most this often
+_POLL_INTERVAL_SECONDS = 1.0
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _job_dict(job: FLJob) -> Dict[str, object]:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "params": json.loads(job.params),
+        "progress": json.loads(job.progress) if job.progress else None,
+        "metrics": json.loads(job.metrics) if job.metrics else [],
+        "error": job.error,
+        "cancel_requested": bool(job.cancel_requested),
+        "worker": job.worker,
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _update(db: Session, job_id: str, **values) -> int:
+    count = db.query(FLJob).filter(FLJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+    return count
+
+
+class FLJobRunner:
+    """
+    Runs federated-learning jobs (one or more run_federated_round() calls)
+    in a background thread of the API worker that accepted them, in
+    submission order. Status, progress, per-round metrics and cancel
+    requests live in the fl_jobs table, so any worker can report on or
+    cancel any job.
+
+    A job holds an advisory lock for all of its rounds: at most one round
+    runs at a time, across workers too; a job waiting for it stays "queued".
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancelled: Set[str] = set()  # cancelled through this worker; skips a DB poll
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="fl-jobs", daemon=True)
+                self._thread.start()
+
+    def start(self):
+        """
+        Fail the jobs a previous process on this host left queued or running
+        (its runner thread died with it). Call once at startup, before submit().
+        """
+        host = socket.gethostname()
+        db = SessionLocal()
+        try:
+            for job in db.query(FLJob).filter(FLJob.status.in_(ACTIVE_STATUSES)):
+                owner_host, _, owner_pid = (job.worker or "").rpartition(":")
+                if owner_host != host or not owner_pid.isdigit():
+                    continue
+                pid = int(owner_pid)
+                if pid != os.getpid():
+                    try:
+                        os.kill(pid, 0)
+                        continue  # owner still alive
+                    except ProcessLookupError:
+                        pass
+                    except PermissionError:
+                        continue
+                job.status = "failed"
+                job.error = "worker exited before the job finished"
+                job.finished_at = _now()
+            db.commit()
+        finally:
+            db.close()
+
+    def submit(self, rounds: int = 1, min_feedback: int = 3) -> Dict[str, object]:
+        db = SessionLocal()
+        try:
+            job = FLJob(
+                id=uuid.uuid4().hex,
+                status="queued",
+                params=json.dumps({"rounds": rounds, "min_feedback": min_feedback}),
+                cancel_requested=False,
+                worker=_worker_id(),
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            result = _job_dict(job)
+        finally:
+            db.close()
+        self._queue.put(result["id"])
+        self._ensure_thread()
+        return result
+
+    def get(self, job_id: str) -> Optional[Dict[str, object]]:
+        db = SessionLocal()
+        try:
+            job = db.get(FLJob, job_id)
+            return None if job is None else _job_dict(job)
+        finally:
+            db.close()
+
+    def list(self, limit: int = 20) -> List[Dict[str, object]]:
+        db = SessionLocal()
+        try:
+            jobs = db.query(FLJob).order_by(FLJob.submitted_at.desc()).limit(limit).all()
+            return [_job_dict(job) for job in jobs]
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, object]]:
+        """
+        A queued job is cancelled at once; a running one stops at its next
+        checkpoint (between phases / clients) without saving that round.
+        Rounds it already completed stay saved.
+        """
+        db = SessionLocal()
+        try:
+            db.query(FLJob).filter(FLJob.id == job_id, FLJob.status == "queued").update(
+                {"status": "cancelled", "cancel_requested": True, "finished_at": _now()},
+                synchronize_session=False,
+            )
+            db.query(FLJob).filter(FLJob.id == job_id, FLJob.status == "running").update(
+                {"cancel_requested": True}, synchronize_session=False
+            )
+            db.commit()
+            self._cancelled.add(job_id)
+            job = db.get(FLJob, job_id)
+            return None if job is None else _job_dict(job)
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception as exc:  # keep the thread alive for the next job
+                logger.exception("FL job %s failed outside its run", job_id)
+                self._fail(job_id, exc)
+            finally:
+                self._cancelled.discard(job_id)
+
+    def _fail(self, job_id: str, exc: Exception):
+        """Mark a still queued / running job failed, on a fresh session (the job's may be broken)."""
+        db = SessionLocal()
+        try:
+            db.query(FLJob).filter(FLJob.id == job_id, FLJob.status.in_(ACTIVE_STATUSES)).update(
+                {"status": "failed", "error": repr(exc), "finished_at": _now()},
+                synchronize_session=False,
+            )
+            db.commit()
+        except Exception:
+            logger.exception("could not mark FL job %s failed", job_id)
+        finally:
+            db.close()
+
+    def _run_job(self, job_id: str):
+        db = SessionLocal()
+        lock = None
+        try:
+            # wait for the round lock while the job is still queued
+            while True:
+                db.expire_all()
+                job = db.get(FLJob, job_id)
+                if job is None or job.status != "queued":
+                    return
+                lock = try_advisory_lock(db, _ADVISORY_LOCK_KEY)
+                if lock is not None:
+                    break
+                if not job.progress:
+                    _update(db, job_id, progress=json.dumps({"phase": "waiting for another FL job"}))
+                time.sleep(_LOCK_POLL_SECONDS)
+
+            claimed = (
+                db.query(FLJob)
+                .filter(FLJob.id == job_id, FLJob.status == "queued")
+                .update({"status": "running", "started_at": _now()}, synchronize_session=False)
+            )
+            db.commit()
+            if not claimed:
+                return
+
+            params = json.loads(job.params)
+            rounds = params["rounds"]
+            metrics: List[Dict[str, object]] = []
+            last_poll = 0.0
+            cancel_seen = False
+
+            def should_stop() -> bool:
+                nonlocal last_poll, cancel_seen
+                if cancel_seen or job_id in self._cancelled:
+                    return True
+                now = time.monotonic()
+                if now - last_poll >= _POLL_INTERVAL_SECONDS:
+                    last_poll = now
+                    cancel_seen = bool(
+                        db.query(FLJob.cancel_requested).filter(FLJob.id == job_id).scalar()
+                    )
+                    db.commit()
+                return cancel_seen
+
+            last_write = 0.0
+            last_phase = None
+
+            for number in range(1, rounds + 1):
+
+                def progress(phase: str, done: int, total: int):
+                    nonlocal last_write, last_phase
+                    now = time.monotonic()
+                    if phase == last_phase and done < total and now - last_write < _POLL_INTERVAL_SECONDS:
+                        return
+                    last_write, last_phase = now, phase
+                    _update(
+                        db,
+                        job_id,
+                        progress=json.dumps(
+                            {"round": number, "rounds": rounds, "phase": phase, "done": done, "total": total}
+                        ),
+                    )
+
+                if should_stop():
+                    raise RoundCancelled()
+                result = run_federated_round(
+                    min_feedback=params["min_feedback"],
+                    progress=progress,
+                    should_stop=should_stop,
+                )
+                metrics.append({"round": number, **result})
+                _update(db, job_id, metrics=json.dumps(metrics))
+                if result["model_updated"] and settings.PRECOMPUTE_AFTER_FL:
+                    get_precompute_scheduler().trigger()
+
+            _update(db, job_id, status="succeeded", finished_at=_now())
+        except RoundCancelled:
+            db.rollback()
+            _update(db, job_id, status="cancelled", finished_at=_now())
+        except Exception as exc:
+            logger.exception("FL job %s failed", job_id)
+            db.rollback()
+            _update(db, job_id, status="failed", error=repr(exc), finished_at=_now())
+        finally:
+            if lock is not None:
+                advisory_unlock(lock, _ADVISORY_LOCK_KEY)
+            db.close()
+
+
+_runner = FLJobRunner()
+
+
+def get_fl_job_runner() -> FLJobRunner:
+    return _runner
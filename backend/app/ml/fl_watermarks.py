@@ -0,0 +1,153 @@
+# app/ml/fl_watermarks.py
+
+import hashlib
+import io
+from typing import Dict, List, NamedTuple, Tuple
+
+import torch
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import dialect_insert
+from app.models.models import Feedback, FLClientWatermark, Job
+
+settings = get_settings
+
+
+class RoundPlan(NamedTuple):
+    """
+    Which clients a round trains, and how the others take part in its FedAvg.
+
+    train:   clients with new (or removed) feedback, or no watermark yet
+    reuse:   {client: cached update}, data unchanged and the cached update
+             was trained from the current global weights (retraining would
+             repeat it)
+    skipped: data unchanged, but the global model has moved since its cached
+             update (or nothing is cached): averaged in as the pre-round
+             global weights, which already hold its earlier updates
+    summary: {client: (last feedback id, feedback count)} for every eligible client
+
+    Every eligible client counts in the average, so a round where a few
+    clients changed moves the global model by their share only, instead of
+    replacing it with the average of the changed clients.
+    """
+
+    train: List[int]
+    reuse: Dict[int, Dict[str, torch.Tensor]]
+    skipped: List[int]
+    summary: Dict[int, Tuple[int, int]]
+
+
+def shared_state_digest(state: Dict[str, torch.Tensor]) -> str:
+    """sha256 of the global shared weights a round starts from."""
+    h = hashlib.sha256()
+    for name, tensor in state.items():
+        h.update(name.encode("utf-8"))
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def _state_to_bytes(state: Dict[str, torch.Tensor]) -> bytes:
+    buf = io.BytesIO()
+    torch.save({k: v.detach().cpu() for k, v in state.items()}, buf)
+    return buf.getvalue()
+
+
+def _state_from_bytes(raw: bytes) -> Dict[str, torch.Tensor]:
+    return torch.load(io.BytesIO(raw), map_location="cpu", weights_only=True)
+
+
+def feedback_summary(db: Session, min_feedback: int) -> Dict[int, Tuple[int, int]]:
+    """
+    {student_id: (max feedback id, count)} for students with at least
+    `min_feedback` rows, in one grouped query (same join as the dataset builder).
+    """
+    rows = (
+        db.query(Feedback.student_id, func.max(Feedback.id), func.count(Feedback.id))
+        .join(Job, Feedback.job_id == Job.id)
+        .group_by(Feedback.student_id)
+        .having(func.count(Feedback.id) >= min_feedback)
+        .all()
+    )
+    return {student_id: (last_id, count) for student_id, last_id, count in rows}
+
+
+def plan_round(db: Session, min_feedback: int, global_digest: str) -> RoundPlan:
+    """
+    Compare every eligible client's feedback with its watermark:
+
+    - no watermark, or a different (max id, count): train
+    - unchanged, and its cached update was trained from these same global
+      weights (`global_digest` matches): reuse that update
+    - unchanged, but the global model has moved since (or no update is
+      cached): skip, its data is already in the global model, so it counts
+      as the pre-round global weights (train anyway with
+      FL_SKIP_UNCHANGED_CLIENTS off)
+
+    A cached update is never reused against other global weights: it is a
+    delta from the model it was trained on.
+    """
+    summary = feedback_summary(db, min_feedback)
+    marks = {
+        mark.student_id: mark
+        for mark in db.query(FLClientWatermark).filter(FLClientWatermark.student_id.in_(list(summary)))
+    }
+
+    train: List[int] = []
+    reuse: Dict[int, Dict[str, torch.Tensor]] = {}
+    skipped: List[int] = []
+    for student_id in sorted(summary):
+        mark = marks.get(student_id)
+        if mark is None or (mark.last_feedback_id, mark.feedback_count) != summary[student_id]:
+            train.append(student_id)
+        elif mark.global_digest == global_digest and mark.update_state is not None:
+            reuse[student_id] = _state_from_bytes(mark.update_state)
+        elif settings.FL_SKIP_UNCHANGED_CLIENTS:
+            skipped.append(student_id)
+        else:
+            train.append(student_id)
+    return RoundPlan(train, reuse, skipped, summary)
+
+
+def save_watermarks(
+    db: Session,
+    plan: RoundPlan,
+    updates: Dict[int, Dict[str, torch.Tensor]],
+    global_digest: str,
+):
+    """
+    Upsert the watermark of every client trained this round; `global_digest`
+    is the digest of the global weights those updates were trained from
+    (the pre-round model). Reused and skipped clients keep their watermark
+    as it is, so a cached update stays labelled with the weights it was
+    trained against. The caller commits.
+    """
+    values = [
+        {
+            "student_id": student_id,
+            "last_feedback_id": plan.summary[student_id][0],
+            "feedback_count": plan.summary[student_id][1],
+            "global_digest": global_digest,
+            "update_state": _state_to_bytes(state) if settings.FL_CACHE_CLIENT_UPDATES else None,
+        }
+        for student_id, state in updates.items()
+    ]
+    if not values:
+        return
+
+    insert = dialect_insert(db)
+    table = FLClientWatermark.__table__
+    for start in range(0, len(values), 1000):
+        stmt = insert(table).values(values[start : start + 1000])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.student_id],
+            set_={
+                "last_feedback_id": stmt.excluded.last_feedback_id,
+                "feedback_count": stmt.excluded.feedback_count,
+                "global_digest": stmt.excluded.global_digest,
+                "update_state": stmt.excluded.update_state,
+                "trained_at": func.now(),
+            },
+        )
+        db.execute(stmt)
@@ -0,0 +1,144 @@
+# app/ml/fused_backbone.py
+
+import argparse
+import hashlib
+import pickle
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+import torch
+
+from app.core.config import get_settings
+from app.ml.inference import Backbone
+
+settings = get_settings
+
+
+class FusedBackbone(NamedTuple):
+    backbone: Backbone
+    source_digest: str
+
+
+def sources_digest(preproc_path: Path, backbone_path: Path) -> str:
+    """
+    sha256 over the preprocessor pickle and backbone checkpoint bytes, so an
+    artifact can tell whether it was exported from the files now on disk
+    (content-based, survives copying between hosts).
+    """
+    h = hashlib.sha256()
+    for path in (preproc_path, backbone_path):
+        h.update(path.read_bytes() if path.exists() else b"<missing>")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _scaler_params(preproc, n_features: int):
+    """mean_ / scale_ of a StandardScaler (or ThesisPreprocessor wrapping one)."""
+    scaler = getattr(preproc, "scaler", preproc)
+    mean = scaler.mean_ if getattr(scaler, "with_mean", True) and scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if getattr(scaler, "with_std", True) and scaler.scale_ is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def fold_scaler(preproc, backbone: Backbone) -> Dict[str, np.ndarray]:
+    """
+    Backbone state dict with the StandardScaler folded into the first Linear:
+
+        W ((x - mean) / scale) + b  =  (W / scale) x + (b - W (mean / scale))
+    """
+    state = {k: v.detach().double().numpy() for k, v in backbone.state_dict().items()}
+    W, b = state["mlp.0.weight"], state["mlp.0.bias"]
+    mean, scale = _scaler_params(preproc, W.shape[1])
+
+    state["mlp.0.weight"] = W / scale
+    state["mlp.0.bias"] = b - W @ (mean / scale)
+    return {k: v.astype(np.float32) for k, v in state.items()}
+
+
+def export_fused(
+    out_path: Path,
+    preproc_path: Path,
+    backbone_path: Path,
+) -> Tuple[object, Backbone]:
+    """
+    Write the fused backbone as a plain .npz (no pickle, no sklearn needed to
+    read it). Returns the (preprocessor, backbone) it was folded from.
+    """
+    with open(preproc_path, "rb") as f:
+        preproc = pickle.load(f)
+    backbone = Backbone()
+    if backbone_path.exists():
+        backbone.load_state_dict(torch.load(backbone_path, map_location="cpu"))
+    backbone.eval()
+
+    state = fold_scaler(preproc, backbone)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(".tmp.npz")
+    np.savez(tmp_path, source_digest=np.array(sources_digest(preproc_path, backbone_path)), **state)
+    tmp_path.replace(out_path)
+    return preproc, backbone
+
+
+def load_fused_backbone(path: Path) -> FusedBackbone:
+    data = np.load(path, allow_pickle=False)
+    backbone = Backbone()
+    backbone.load_state_dict(
+        {k: torch.from_numpy(data[k]) for k in backbone.state_dict().keys()}
+    )
+    backbone.eval()
+    return FusedBackbone(backbone=backbone, source_digest=str(data["source_digest"]))
+
+
+def _verify_and_benchmark(out_path: Path, rows: int, calls: int, seed: int = 0):
+    preproc_path = Path(settings.PREPROCESSOR_PATH)
+    backbone_path = Path(settings.BACKBONE_PATH)
+
+    preproc, backbone = export_fused(out_path, preproc_path, backbone_path)
+    print(f"✅ Fused backbone written to {out_path}")
+
+    fused = load_fused_backbone(out_path).backbone
+
+    # inputs spread around the fitted feature distribution
+    rng = np.random.default_rng(seed)
+    mean, scale = _scaler_params(preproc, 9)
+    X = mean + scale * rng.standard_normal((rows, 9)) * 3
+
+    def plain(x):
+        with torch.no_grad():
+            return backbone(torch.tensor(preproc.transform(x), dtype=torch.float32)).numpy()
+
+    def folded(x):
+        with torch.no_grad():
+            return fused(torch.tensor(x, dtype=torch.float32)).numpy()
+
+    ref, got = plain(X), folded(X)
+    print(f"  max |diff| hidden : {float(np.max(np.abs(ref - got))):.3e} (rows={rows})")
+
+    for n in (1, 100):
+        x = X[:n]
+        timings = {}
+        for name, fn in (("scaler + backbone", plain), ("fused backbone", folded)):
+            fn(x)
+            started = time.perf_counter()
+            for _ in range(calls):
+                fn(x)
+            timings[name] = (time.perf_counter() - started) / calls * 1e6
+        print(
+            f"  rows/call={n:>3}: "
+            + ", ".join(f"{name} {us:7.1f} us" for name, us in timings.items())
+            + f", saved {timings['scaler + backbone'] - timings['fused backbone']:.1f} us/call"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the preprocessor-folded PFL backbone (.npz), verify and benchmark it"
+    )
+    parser.add_argument("--out", default=settings.PFL_FUSED_BACKBONE_PATH)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--calls", type=int, default=2_000)
+    args = parser.parse_args()
+
+    _verify_and_benchmark(Path(args.out), args.rows, args.calls)
@@ -1,11 +1,15 @@
 
+import threading
+import time
 import torch
 import torch.nn as nn
+from collections import OrderedDict
 from pathlib import Path
 import pickle
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Sequence, Tuple
 from app.core.config import get_settings
+from app.ml.batching import MicroBatcher
 
 # settings = get_settings()
 settings = get_settings
@@ -29,35 +33,258 @@ class Head(nn.Module):
     def forward(self,h):
         return self.out(h)
 
+def _file_version(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _SharedParts(NamedTuple):
+    version: tuple
+    preproc: object  # None when serving the fused artifact (scaler folded into the backbone)
+    backbone: Backbone
+
+
 class PFLRegistry:
-    def __init__(self):
+    """
+    Serving-side PFL model: shared preprocessor + backbone, one head per client.
+
+    - Preprocessor and backbone are loaded once and reloaded only when their
+      files change (checked with a stat per call), then published with a
+      single reference swap.
+    - Client heads live in a bounded LRU (`head_cache_size`). A head file that
+      changes on disk is reloaded on its next use; concurrent first calls for
+      the same client wait on a per-client lock instead of loading twice.
+    - `stats()` reports cache hits/misses/evictions and load latency.
+
+    Use get_pfl_registry() for the process-wide instance.
+    """
+
+    def __init__(self, head_cache_size: Optional[int] = None):
         self.backbone_path = Path(settings.BACKBONE_PATH)
         self.heads_dir = Path(settings.HEADS_DIR)
         self.preproc_path = Path(settings.PREPROCESSOR_PATH)
+        self.fused_path = Path(settings.PFL_FUSED_BACKBONE_PATH)
+        self.head_cache_size = head_cache_size or settings.PFL_HEAD_CACHE_SIZE
+
+        self._lock = threading.Lock()
+        self._shared_lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # client_id -> (file version, head)
+        self._heads: "OrderedDict[str, Tuple[Optional[Tuple[int, int]], Head]]" = OrderedDict()
+        self._metrics = {
+            "head_hits": 0,
+            "head_misses": 0,
+            "head_reloads": 0,
+            "head_evictions": 0,
+            "head_load_seconds_total": 0.0,
+            "head_load_seconds_max": 0.0,
+            "shared_loads": 0,
+            "shared_load_seconds_last": 0.0,
+            "fused_backbone": False,
+        }
+
+        self._batcher = MicroBatcher(
+            self.predict_many,
+            max_items=settings.PFL_MICROBATCH_MAX_ROWS,
+            max_wait_ms=settings.PFL_MICROBATCH_WAIT_MS,
+            name="pfl-predict",
+        )
+
+        self._shared: Optional[_SharedParts] = None
+        self._get_shared()
+
+    # ---------- preprocessor + backbone ----------
+
+    def _shared_version(self) -> tuple:
+        return (
+            _file_version(self.preproc_path),
+            _file_version(self.backbone_path),
+            _file_version(self.fused_path),
+        )
+
+    def _load_fused(self) -> Optional[Backbone]:
+        """
+        The exported fused backbone (python -m app.ml.fused_backbone), if present
+        and exported from the preprocessor/backbone files now on disk. A
+        deployment may ship only the artifact (no preprocessor pickle).
+        """
+        if not self.fused_path.exists():
+            return None
+        from app.ml.fused_backbone import load_fused_backbone, sources_digest  # imports this module
+
+        fused = load_fused_backbone(self.fused_path)
+        if self.preproc_path.exists() and fused.source_digest != sources_digest(
+            self.preproc_path, self.backbone_path
+        ):
+            return None  # stale export; serve the unfused pipeline
+        return fused.backbone
+
+    def _get_shared(self) -> _SharedParts:
+        shared = self._shared
+        version = self._shared_version()
+        if shared is not None and shared.version == version:
+            return shared
+
+        with self._shared_lock:
+            shared = self._shared
+            if shared is not None and shared.version == version:
+                return shared
+
+            started = time.perf_counter()
+            preproc = None
+            backbone = self._load_fused()
+            if backbone is None:
+                with open(self.preproc_path, "rb") as f:
+                    preproc = pickle.load(f)
+
+                backbone = Backbone()
+                if self.backbone_path.exists():
+                    backbone.load_state_dict(torch.load(self.backbone_path, map_location="cpu"))
+                backbone.eval()
+
+            shared = _SharedParts(version=version, preproc=preproc, backbone=backbone)
+            self._shared = shared
+            with self._lock:
+                self._metrics["fused_backbone"] = preproc is None
+                self._metrics["shared_loads"] += 1
+                self._metrics["shared_load_seconds_last"] = round(time.perf_counter() - started, 6)
+            return shared
 
-        # load preprocessor
-        with open(self.preproc_path,"rb") as f:
-            self.preproc = pickle.load(f)
+    # ---------- client heads ----------
 
-        # load backbone
-        self.backbone = Backbone()
-        if self.backbone_path.exists():
-            self.backbone.load_state_dict(torch.load(self.backbone_path, map_location="cpu"))
-        self.backbone.eval()
+    def _load_lock(self, client_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._load_locks.get(client_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._load_locks[client_id] = lock
+            return lock
+
+    def _cached_head(self, client_id: str, version) -> Optional[Head]:
+        with self._lock:
+            entry = self._heads.get(client_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._heads.move_to_end(client_id)
+            return entry[1]
 
     def _load_head(self, client_id: str) -> Head:
-        head = Head()
         hpath = self.heads_dir / f"{client_id}.pt"
-        if hpath.exists():
-            head.load_state_dict(torch.load(hpath, map_location="cpu"))
-        head.eval()
-        return head
+        version = _file_version(hpath)
 
-    def predict(self, client_id: str, X: np.ndarray) -> np.ndarray:
-        Xs = self.preproc.transform(X)
+        head = self._cached_head(client_id, version)
+        if head is not None:
+            with self._lock:
+                self._metrics["head_hits"] += 1
+            return head
+
+        with self._load_lock(client_id):
+            # another thread may have loaded it while we waited
+            head = self._cached_head(client_id, version)
+            if head is not None:
+                with self._lock:
+                    self._metrics["head_hits"] += 1
+                return head
+
+            started = time.perf_counter()
+            head = Head()
+            if version is not None:
+                head.load_state_dict(torch.load(hpath, map_location="cpu"))
+            head.eval()
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                m = self._metrics
+                m["head_misses"] += 1
+                if client_id in self._heads:
+                    m["head_reloads"] += 1
+                m["head_load_seconds_total"] += elapsed
+                m["head_load_seconds_max"] = max(m["head_load_seconds_max"], elapsed)
+
+                self._heads[client_id] = (version, head)
+                self._heads.move_to_end(client_id)
+                while len(self._heads) > self.head_cache_size:
+                    self._heads.popitem(last=False)
+                    m["head_evictions"] += 1
+            return head
+
+    def predict_many(self, requests: Sequence[Tuple[str, np.ndarray]]) -> List[np.ndarray]:
+        """
+        Scores for several (client_id, X) requests in one pass.
+
+        The preprocessor and backbone run once over the concatenated rows;
+        each row then goes through its own client's head as one grouped
+        matmul (head weights stacked and gathered per row). Returns one score
+        array per request, in order.
+        """
+        if not requests:
+            return []
+        shared = self._get_shared()
+
+        client_ids = list(dict.fromkeys(client_id for client_id, _ in requests))
+        heads = [self._load_head(client_id) for client_id in client_ids]
+        group_of = {client_id: g for g, client_id in enumerate(client_ids)}
+
+        arrays = [np.atleast_2d(np.asarray(X, dtype=float)) for _, X in requests]
+        sizes = [a.shape[0] for a in arrays]
+        X_all = np.concatenate(arrays, axis=0)
+        if X_all.shape[0] == 0:
+            return [np.empty(0, dtype=np.float32) for _ in requests]
+        rows_group = torch.from_numpy(
+            np.repeat([group_of[client_id] for client_id, _ in requests], sizes).astype(np.int64)
+        )
+
+        Xs = shared.preproc.transform(X_all) if shared.preproc is not None else X_all
         xt = torch.tensor(Xs, dtype=torch.float32)
         with torch.no_grad():
-            h = self.backbone(xt)
-            head = self._load_head(client_id)
-            y = head(h).squeeze(-1).numpy()
-        return y
+            h = shared.backbone(xt)  # (N, H)
+            if len(heads) == 1:
+                y = heads[0](h).squeeze(-1)
+            else:
+                W = torch.stack([head.out.weight[0] for head in heads])  # (G, H)
+                b = torch.cat([head.out.bias for head in heads])  # (G,)
+                y = (h * W[rows_group]).sum(dim=1) + b[rows_group]
+        return list(np.split(y.numpy(), np.cumsum(sizes)[:-1]))
+
+    def predict(self, client_id: str, X: np.ndarray) -> np.ndarray:
+        return self.predict_many([(client_id, X)])[0]
+
+    def predict_batched(self, client_id: str, X: np.ndarray) -> np.ndarray:
+        """
+        predict() through the process-wide micro-batcher: concurrent calls
+        (e.g. several universities' requests at once) share one predict_many().
+        """
+        return self._batcher((client_id, X), size=len(X))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            m = dict(self._metrics)
+            loads = m["head_misses"]
+            lookups = m["head_hits"] + loads
+            m["head_load_ms_avg"] = round(m.pop("head_load_seconds_total") / loads * 1e3, 3) if loads else None
+            m["head_load_ms_max"] = round(m.pop("head_load_seconds_max") * 1e3, 3)
+            m["head_hit_rate"] = round(m["head_hits"] / lookups, 4) if lookups else None
+            m["heads_cached"] = len(self._heads)
+            m["head_cache_size"] = self.head_cache_size
+        m["micro_batching"] = self._batcher.stats()
+        return m
+
+
+_pfl_registry: Optional[PFLRegistry] = None
+_pfl_registry_lock = threading.Lock()
+
+
+def get_pfl_registry() -> PFLRegistry:
+    """
+    Process-wide PFLRegistry, created on first use (each uvicorn worker gets its own).
+    """
+    global _pfl_registry
+    if _pfl_registry is None:
+        with _pfl_registry_lock:
+            if _pfl_registry is None:
+                _pfl_registry = PFLRegistry()
+    return _pfl_registry
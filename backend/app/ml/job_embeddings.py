@@ -0,0 +1,188 @@
+# app/ml/job_embeddings.py
+
+import argparse
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.models import Job, JobEmbedding
+from app.ml.embeddings import encode_texts, get_model_registry
+from app.ml.features import _job_text
+
+logger = logging.getLogger(__name__)
+
+
+def job_content_hash(job: Job, model_name: str) -> str:
+    """
+    Hash of (embedding model, job text).
+    A stored vector is reusable only while this hash is unchanged.
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(_job_text(job).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _to_bytes(vec: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vec, dtype=np.float32).tobytes()
+
+
+def _from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+def _index_jobs(
+    db: Session,
+    jobs: List[Job],
+    commit: bool = True,
+) -> Tuple[Dict[int, np.ndarray], Dict[int, str]]:
+    if not jobs:
+        return {}, {}
+
+    model_name = get_model_registry().active_model
+    by_id = {job.id: job for job in jobs}
+
+    rows = db.query(JobEmbedding).filter(JobEmbedding.job_id.in_(list(by_id.keys()))).all()
+    existing = {row.job_id: row for row in rows}
+
+    vectors: Dict[int, np.ndarray] = {}
+    stale: List[Job] = []
+    hashes: Dict[int, str] = {}
+
+    for job in by_id.values():
+        content_hash = job_content_hash(job, model_name)
+        hashes[job.id] = content_hash
+        row = existing.get(job.id)
+        if row is not None and row.content_hash == content_hash:
+            vectors[job.id] = _from_bytes(row.vector)
+        else:
+            stale.append(job)
+
+    if stale:
+        embs = encode_texts([_job_text(job) for job in stale], model_name=model_name)
+        embs = np.asarray(embs, dtype=np.float32)
+
+        for job, vec in zip(stale, embs):
+            row = existing.get(job.id)
+            if row is None:
+                row = JobEmbedding(job_id=job.id)
+                db.add(row)
+            row.job_uid = job.job_uid
+            row.model_name = model_name
+            row.content_hash = hashes[job.id]
+            row.dim = int(vec.shape[0])
+            row.vector = _to_bytes(vec)
+            vectors[job.id] = vec
+
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+    return vectors, hashes
+
+
+def index_jobs(db: Session, jobs: List[Job], commit: bool = True) -> Dict[int, np.ndarray]:
+    """
+    Make sure every job in `jobs` has an up-to-date stored embedding.
+
+    - One SELECT for the existing rows.
+    - Only jobs whose content hash changed (or that have no row) are encoded,
+      all in a single encode_texts() batch.
+
+    Returns {job.id: vector} for all given jobs.
+    """
+    vectors, _ = _index_jobs(db, jobs, commit=commit)
+    return vectors
+
+
+def index_job(db: Session, job: Job) -> np.ndarray:
+    return index_jobs(db, [job])[job.id]
+
+
+def try_index_job(db: Session, job: Job) -> Optional[np.ndarray]:
+    """
+    Used by the /jobs router after create/update. Returns the job's vector,
+    or None if it could not be computed.
+
+    Job writes must keep working when ML deps are not installed, or the
+    encoder / embedding write fails (the job is already committed); the
+    embedding is then filled later by the backfill or lazily on first /recs call.
+    """
+    try:
+        return index_job(db, job)
+    except HTTPException:
+        return None
+    except Exception:
+        logger.exception("could not index job %s; it will be indexed on the next sync", job.id)
+        db.rollback()
+        return None
+
+
+def get_job_embedding_matrix(db: Session, jobs: List[Job]) -> np.ndarray:
+    """
+    (N, D) float32 matrix of job embeddings, rows in the same order as `jobs`.
+
+    Missing or stale rows are encoded and stored on the way, so the recommend
+    path self-heals if a job was written while ML deps were unavailable.
+    """
+    J, _ = get_job_catalog(db, jobs)
+    return J
+
+
+def get_job_catalog(db: Session, jobs: List[Job]) -> Tuple[np.ndarray, str]:
+    """
+    Like get_job_embedding_matrix(), plus a catalog key that changes whenever
+    the job list, order or any job's content hash changes. Callers use it to
+    cache per-catalog derived data (e.g. per-job model projections).
+    """
+    ids = [job.id for job in jobs]  # before _index_jobs() may commit and expire them
+    vectors, hashes = _index_jobs(db, jobs)
+    key = hashlib.blake2b(digest_size=16)
+    for job_id in ids:
+        key.update(f"{job_id}:{hashes[job_id]};".encode("ascii"))
+    J = np.stack([vectors[job_id] for job_id in ids]).astype(np.float32, copy=False)
+    return J, key.hexdigest()
+
+
+def backfill(batch_size: int = 256) -> int:
+    """
+    Encode/store embeddings for every job that is missing or stale.
+    Returns the number of jobs scanned.
+    """
+    db = SessionLocal()
+    try:
+        scanned = 0
+        last_id = 0
+        while True:
+            batch = (
+                db.query(Job)
+                .filter(Job.id > last_id)
+                .order_by(Job.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            index_jobs(db, batch)
+            scanned += len(batch)
+            last_id = batch[-1].id
+            print(f"indexed {scanned} jobs")
+        return scanned
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the job embedding store")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    total = backfill(batch_size=args.batch_size)
+    print(f"✅ Job embedding store up to date ({total} jobs scanned).")
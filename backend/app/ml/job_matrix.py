@@ -0,0 +1,400 @@
+# app/ml/job_matrix.py
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Job
+
+settings = get_settings
+
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+_MIN_ROWS = 1024
+_INDEX_BATCH = 1024
+# see app/ml/ann.py: now() is the transaction start, so re-check a little history
+_SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class JobMatrixView(NamedTuple):
+    """
+    Zero-copy slices of the mapped files, valid for one request.
+
+    Rows are in append order; a job has at most one active row. Inactive rows
+    (deactivated, deleted or superseded jobs) stay in place until compaction,
+    so callers mask them out instead of copying the active rows.
+    """
+
+    vectors: np.ndarray  # (n, D) float32 or float16, read-only memmap
+    job_ids: np.ndarray  # (n,) int64
+    active: np.ndarray  # (n,) bool
+    key: str  # changes whenever rows are appended or the files are rewritten
+
+    def row_of(self) -> Dict[int, int]:
+        """{job id: row} for active rows."""
+        rows = np.flatnonzero(self.active)
+        return dict(zip(self.job_ids[rows].tolist(), rows.tolist()))
+
+
+class _Maps(NamedTuple):
+    vectors: np.memmap
+    ids: np.memmap
+    hashes: np.memmap
+    active: np.memmap
+
+
+@contextmanager
+def _exclusive_file_lock(path: str):
+    """
+    Cross-process exclusive lock on `path` (blocking): flock on POSIX,
+    msvcrt.locking on Windows (first byte of the file, polled).
+    """
+    with open(path, "a+") as lock_file:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            import msvcrt
+
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _hash64(content_hash: str) -> int:
+    return int(content_hash[:16], 16)
+
+
+class JobEmbeddingMatrix:
+    """
+    Active job embeddings as one contiguous memory-mapped matrix on disk,
+    shared by every worker process.
+
+    Files under JOB_MATRIX_DIR (one set per generation):
+
+    - <gen>.vectors  (capacity, D) float32 / float16 (JOB_MATRIX_DTYPE)
+    - <gen>.ids      job id per row (int64)
+    - <gen>.hashes   first 8 bytes of the row's content hash (uint64)
+    - <gen>.active   active mask, one byte per row (read as a bool view)
+    - meta.json      generation, dim, dtype, committed row count, model name,
+                     the catalog version / updated_at watermark it reflects
+
+    Readers map the files read-only and slice them without copying. When the
+    catalog version moves, one process (under a file lock) syncs from the jobs
+    table: new or re-embedded jobs are appended, and rows of deactivated,
+    deleted or superseded jobs are switched off in the active mask, in place.
+    Files grow by doubling; the whole matrix is rewritten only on a model or
+    dtype change, or to compact once most rows are dead.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.JOB_MATRIX_DIR
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self._lock = threading.Lock()
+        self._meta: Optional[dict] = None
+        self._meta_stamp = None
+        self._maps: Dict[tuple, _Maps] = {}
+
+    # ---------- files ----------
+
+    def _path(self, generation: str, part: str) -> str:
+        return os.path.join(self.directory, f"{generation}.{part}")
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            st = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._meta_stamp:
+            with open(self.meta_path) as f:
+                self._meta = json.load(f)
+            self._meta_stamp = stamp
+        return self._meta
+
+    def _write_meta(self, meta: dict):
+        tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)
+
+    def _open(self, meta: dict, writable: bool = False) -> _Maps:
+        key = (meta["generation"], meta["capacity"], writable)
+        maps = self._maps.get(key)
+        if maps is None:
+            mode = "r+" if writable else "r"
+            gen, cap = meta["generation"], meta["capacity"]
+            maps = _Maps(
+                vectors=np.memmap(self._path(gen, "vectors"), dtype=_DTYPES[meta["dtype"]], mode=mode, shape=(cap, meta["dim"])),
+                ids=np.memmap(self._path(gen, "ids"), dtype=np.int64, mode=mode, shape=(cap,)),
+                hashes=np.memmap(self._path(gen, "hashes"), dtype=np.uint64, mode=mode, shape=(cap,)),
+                active=np.memmap(self._path(gen, "active"), dtype=np.uint8, mode=mode, shape=(cap,)),
+            )
+            # drop maps of older generations / capacities
+            self._maps = {k: v for k, v in self._maps.items() if k[0] == gen and k[1] == cap}
+            self._maps[key] = maps
+        return maps
+
+    def _allocate(self, meta: dict, capacity: int):
+        """Create or extend a generation's files to `capacity` rows (zero-filled)."""
+        item = np.dtype(_DTYPES[meta["dtype"]]).itemsize
+        for part, row_bytes in (("vectors", item * meta["dim"]), ("ids", 8), ("hashes", 8), ("active", 1)):
+            with open(self._path(meta["generation"], part), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        meta["capacity"] = capacity
+
+    # ---------- reading ----------
+
+    def view(self, db: Session) -> JobMatrixView:
+        """
+        The matrix for the current catalog, synced first if jobs changed
+        since it was last written (by any process).
+        """
+        from app.ml.embeddings import get_model_registry
+        from app.services.rec_cache import catalog_version
+
+        version = catalog_version(db)
+        model_name = get_model_registry().active_model
+
+        with self._lock:
+            meta = self._read_meta()
+            if not self._is_current(meta, version, model_name):
+                meta = self._sync(db, version, model_name)
+            try:
+                maps = self._open(meta)
+            except FileNotFoundError:
+                # another process compacted between our meta read and open
+                self._meta_stamp = None
+                meta = self._read_meta()
+                maps = self._open(meta)
+
+        n = meta["rows"]
+        return JobMatrixView(
+            vectors=maps.vectors[:n],
+            job_ids=maps.ids[:n],
+            active=maps.active[:n].view(np.bool_),
+            key=f"{meta['generation']}:{n}",
+        )
+
+    @staticmethod
+    def _is_current(meta: Optional[dict], version: str, model_name: str) -> bool:
+        return (
+            meta is not None
+            and meta["catalog_version"] == version
+            and meta["model_name"] == model_name
+            and meta["dtype"] == settings.JOB_MATRIX_DTYPE
+        )
+
+    # ---------- writing ----------
+
+    def _sync(self, db: Session, version: str, model_name: str) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        with _exclusive_file_lock(os.path.join(self.directory, "lock")):
+            self._meta_stamp = None
+            meta = self._read_meta()
+            if self._is_current(meta, version, model_name):
+                return meta  # another process synced while we waited
+
+            if meta is None or meta["model_name"] != model_name or meta["dtype"] != settings.JOB_MATRIX_DTYPE:
+                return self._rebuild(db, version, model_name, meta)
+            meta = self._apply_changes(db, version, meta)
+            if meta["dead"] > max(_MIN_ROWS, meta["rows"] // 2):
+                meta = self._rebuild(db, version, model_name, meta)  # compact
+            return meta
+
+    @staticmethod
+    def _job_states(db: Session):
+        rows = db.query(Job.id, Job.is_active, Job.updated_at).all()
+        watermark = max((updated for _, _, updated in rows if updated is not None), default=None)
+        return rows, watermark
+
+    def _embed(self, db: Session, job_ids: List[int]):
+        """Yields (job ids, vectors (n, D), content hashes) in batches, re-encoding stale jobs."""
+        from app.ml.job_embeddings import _index_jobs
+
+        for start in range(0, len(job_ids), _INDEX_BATCH):
+            ids = job_ids[start : start + _INDEX_BATCH]
+            jobs = db.query(Job).filter(Job.id.in_(ids)).all()
+            vectors, hashes = _index_jobs(db, jobs)
+            ids = [job_id for job_id in ids if job_id in vectors]
+            if ids:
+                yield ids, np.stack([vectors[job_id] for job_id in ids]), [hashes[job_id] for job_id in ids]
+
+    def _append(self, meta: dict, ids: List[int], vectors: np.ndarray, hashes: List[str]) -> np.ndarray:
+        """Write rows after meta["rows"] (inactive, not yet visible); returns their row numbers."""
+        first = meta["rows"]
+        end = first + len(ids)
+        if end > meta["capacity"]:
+            capacity = max(_MIN_ROWS, meta["capacity"])
+            while capacity < end:
+                capacity *= 2
+            self._allocate(meta, capacity)
+
+        maps = self._open(meta, writable=True)
+        maps.vectors[first:end] = vectors
+        maps.ids[first:end] = ids
+        maps.hashes[first:end] = [_hash64(h) for h in hashes]
+        maps.active[first:end] = 0
+        for arr in (maps.vectors, maps.ids, maps.hashes):
+            arr.flush()
+        meta["rows"] = end
+        return np.arange(first, end)
+
+    def _rebuild(self, db: Session, version: str, model_name: str, old: Optional[dict]) -> dict:
+        states, watermark = self._job_states(db)
+        active_ids = sorted(job_id for job_id, is_active, _ in states if is_active)
+
+        meta = {
+            "generation": uuid.uuid4().hex[:12],
+            "dtype": settings.JOB_MATRIX_DTYPE,
+            "dim": None,
+            "rows": 0,
+            "capacity": 0,
+            "dead": 0,
+            "model_name": model_name,
+        }
+        for ids, vectors, hashes in self._embed(db, active_ids):
+            if meta["dim"] is None:
+                meta["dim"] = int(vectors.shape[1])
+                self._allocate(meta, max(_MIN_ROWS, len(active_ids)))
+            rows = self._append(meta, ids, vectors, hashes)
+            self._open(meta, writable=True).active[rows] = 1
+
+        if meta["dim"] is None:
+            # empty catalog: a zero-row matrix of the model's dimension
+            from app.ml.embeddings import get_embedding_model
+
+            meta["dim"] = int(get_embedding_model(model_name).get_sentence_embedding_dimension())
+            self._allocate(meta, _MIN_ROWS)
+        self._open(meta, writable=True).active.flush()
+
+        meta["catalog_version"] = version
+        meta["watermark"] = watermark.isoformat() if watermark is not None else None
+        self._write_meta(meta)
+
+        if old is not None:
+            # open maps in other processes stay valid after unlink
+            for part in ("vectors", "ids", "hashes", "active"):
+                try:
+                    os.remove(self._path(old["generation"], part))
+                except FileNotFoundError:
+                    pass
+        return meta
+
+    def _apply_changes(self, db: Session, version: str, meta: dict) -> dict:
+        states, watermark = self._job_states(db)
+        meta = dict(meta)
+        maps = self._open(meta, writable=True)
+        n = meta["rows"]
+
+        live = np.flatnonzero(maps.active[:n])
+        row_of = dict(zip(maps.ids[live].tolist(), live.tolist()))
+        since = datetime.fromisoformat(meta["watermark"]) - _SYNC_OVERLAP if meta["watermark"] else None
+
+        active_ids = set()
+        changed = []
+        for job_id, is_active, updated in states:
+            if not is_active:
+                continue
+            active_ids.add(job_id)
+            if job_id not in row_of or (since is not None and updated is not None and updated >= since):
+                changed.append(job_id)
+
+        retire = [row for job_id, row in row_of.items() if job_id not in active_ids]
+        for ids, vectors, hashes in self._embed(db, changed):
+            keep = [
+                i for i, (job_id, h) in enumerate(zip(ids, hashes))
+                if job_id not in row_of or int(maps.hashes[row_of[job_id]]) != _hash64(h)
+            ]
+            if not keep:
+                continue
+            new_rows = self._append(meta, [ids[i] for i in keep], vectors[keep], [hashes[i] for i in keep])
+            maps = self._open(meta, writable=True)
+            retire.extend(row_of[ids[i]] for i in keep if ids[i] in row_of)
+            maps.active[new_rows] = 1
+
+        # deactivations are flipped in place; readers see them immediately
+        if retire:
+            maps.active[retire] = 0
+        maps.active.flush()
+
+        meta["dead"] = int(meta["rows"] - np.count_nonzero(maps.active[: meta["rows"]]))
+        meta["catalog_version"] = version
+        meta["watermark"] = watermark.isoformat() if watermark is not None else meta["watermark"]
+        self._write_meta(meta)
+        return meta
+
+    def stats(self) -> Dict[str, object]:
+        meta = self._read_meta()
+        if meta is None:
+            return {"built": False}
+        item = np.dtype(_DTYPES[meta["dtype"]]).itemsize
+        return {
+            "built": True,
+            "generation": meta["generation"],
+            "dtype": meta["dtype"],
+            "dim": meta["dim"],
+            "rows": meta["rows"],
+            "active_rows": meta["rows"] - meta["dead"],
+            "capacity": meta["capacity"],
+            "vector_bytes": meta["capacity"] * meta["dim"] * item,
+            "model_name": meta["model_name"],
+        }
+
+
+_job_matrix: Optional[JobEmbeddingMatrix] = None
+_job_matrix_lock = threading.Lock()
+
+
+def get_job_matrix() -> JobEmbeddingMatrix:
+    global _job_matrix
+    if _job_matrix is None:
+        with _job_matrix_lock:
+            if _job_matrix is None:
+                _job_matrix = JobEmbeddingMatrix()
+    return _job_matrix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / sync the memory-mapped job embedding matrix")
+    parser.parse_args()
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        view = get_job_matrix().view(db)
+        print(json.dumps(get_job_matrix().stats(), indent=2))
+        print(
+            f"✅ Job matrix synced: {int(view.active.sum())} active of {len(view.job_ids)} rows "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+    finally:
+        db.close()
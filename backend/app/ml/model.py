@@ -1,9 +1,15 @@
+import hashlib
 import os
-from typing import Dict
+import threading
+from typing import Dict, NamedTuple, Optional
 
 import torch
 import torch.nn as nn
 
+from app.core.config import get_settings
+
+settings = get_settings
+
 MODEL_DIR = "models"
 GLOBAL_MODEL_PATH = os.path.join(MODEL_DIR, "global_pfl_model.pt")
 
@@ -33,7 +39,15 @@ def init_global_model(input_dim: int) -> PFLRecommender:
 
 def save_global_model(model: PFLRecommender):
     os.makedirs(MODEL_DIR, exist_ok=True)
-    torch.save(model.state_dict(), GLOBAL_MODEL_PATH)
+    # write-then-rename so a concurrent reload never reads a half-written file
+    tmp_path = GLOBAL_MODEL_PATH + ".tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, GLOBAL_MODEL_PATH)
+    _global_model_holder.bump()
+
+    from app.services.rec_cache import get_rec_cache  # rankings from the old model are stale
+
+    get_rec_cache().clear()
 
 
 def load_global_model(input_dim: int) -> PFLRecommender:
@@ -53,3 +67,145 @@ def set_shared_state(model: PFLRecommender, shared_state: Dict[str, torch.Tensor
     for k, v in shared_state.items():
         current[k] = v
     model.load_state_dict(current)
+
+
+def global_model_version() -> str:
+    """
+    Version of the checkpoint on disk: "<mtime_ns>-<size>", or "init" if no
+    checkpoint exists yet (a freshly initialised model).
+    """
+    try:
+        st = os.stat(GLOBAL_MODEL_PATH)
+    except FileNotFoundError:
+        return "init"
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def global_checkpoint_digest() -> str:
+    """
+    sha256 of the checkpoint bytes ("init" if none). Exported artifacts record
+    it to tell whether they still match the checkpoint on disk.
+    """
+    if not os.path.exists(GLOBAL_MODEL_PATH):
+        return "init"
+    with open(GLOBAL_MODEL_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def global_artifact_path(name: str) -> str:
+    """Path of an exported artifact (python -m app.ml.export) in ARTIFACTS_DIR."""
+    return os.path.join(settings.ARTIFACTS_DIR, name)
+
+
+# exported files served by GLOBAL_MODEL_ARTIFACT (written by app/ml/export.py)
+GLOBAL_ARTIFACT_FILES = {
+    "torchscript": "global_pfl_model.ts.pt",
+    "int8": "global_pfl_model.int8.ts.pt",
+}
+
+
+def _load_torchscript_global(input_dim: int, artifact: str):
+    """
+    The TorchScript (or int8 TorchScript) export of the current checkpoint,
+    or None if it is missing, exported from another checkpoint, or built for
+    another input_dim.
+    """
+    path = global_artifact_path(GLOBAL_ARTIFACT_FILES[artifact])
+    if not os.path.exists(path):
+        return None
+    extra = {"source_digest": "", "input_dim": ""}
+    module = torch.jit.load(path, map_location="cpu", _extra_files=extra)
+    if extra["source_digest"].decode() != global_checkpoint_digest():
+        return None
+    if int(extra["input_dim"].decode() or 0) != input_dim:
+        return None
+    return module.eval()
+
+
+class LoadedGlobalModel(NamedTuple):
+    version: str
+    input_dim: int
+    model: torch.nn.Module  # PFLRecommender, or the loaded TorchScript module
+    scorer: object  # app.ml.scoring FactorizedScorer (eager) or ModuleScorer (exports), bound to `model`
+    artifact: str  # what is actually serving: "eager", "torchscript" or "int8"
+    eager: PFLRecommender  # the checkpoint itself (`model` when eager): FL weights come from here
+
+
+class GlobalModelHolder:
+    """
+    Keeps the eval-mode global PFLRecommender in memory for serving.
+
+    - get() stats the checkpoint (cheap) and only runs torch.load when the
+      file version changed, or after bump() (called by save_global_model).
+    - GLOBAL_MODEL_ARTIFACT picks the eager checkpoint (factorized scoring)
+      or runs the TorchScript / int8 TorchScript export itself
+      (app/ml/export.py); a missing or stale export falls back to eager.
+      Exports are for scoring only: `eager` always holds the checkpoint's
+      float weights (an int8 module has no shared state to hand to FL clients).
+    - A reload builds a complete new LoadedGlobalModel and publishes it with a
+      single reference assignment, so concurrent requests see either the old
+      or the new model, never a partially loaded state dict. Requests that
+      already hold the old one finish with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Optional[LoadedGlobalModel] = None
+        self._stale = False
+
+    def bump(self):
+        """Force the next get() to reload, even if the file version looks unchanged."""
+        self._stale = True
+
+    def _is_fresh(self, current: Optional[LoadedGlobalModel], input_dim: int) -> bool:
+        return (
+            current is not None
+            and not self._stale
+            and current.input_dim == input_dim
+            and current.version == global_model_version()
+        )
+
+    def get(self, input_dim: int) -> LoadedGlobalModel:
+        current = self._current
+        if self._is_fresh(current, input_dim):
+            return current
+
+        with self._lock:
+            current = self._current
+            if self._is_fresh(current, input_dim):
+                return current
+
+            from app.ml.scoring import FactorizedScorer, ModuleScorer  # scoring imports this module
+
+            self._stale = False
+            version = global_model_version()
+
+            artifact = settings.GLOBAL_MODEL_ARTIFACT
+            module = None
+            if artifact in GLOBAL_ARTIFACT_FILES:
+                module = _load_torchscript_global(input_dim, artifact)
+
+            eager = load_global_model(input_dim)
+            eager.eval()
+            if module is not None:
+                model, scorer = module, ModuleScorer(module)
+            else:
+                model, scorer, artifact = eager, FactorizedScorer(eager), "eager"
+
+            loaded = LoadedGlobalModel(
+                version=version,
+                input_dim=input_dim,
+                model=model,
+                scorer=scorer,
+                artifact=artifact,
+                eager=eager,
+            )
+            self._current = loaded
+            return loaded
+
+
+_global_model_holder = GlobalModelHolder()
+
+
+def get_global_model_holder() -> GlobalModelHolder:
+    return _global_model_holder
@@ -0,0 +1,430 @@
+# app/ml/parallel_train.py
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import torch
+
+from app.core.config import get_settings
+from app.ml.streaming_train import PairFeatures
+
+settings = get_settings
+
+
+class LocalUpdate(NamedTuple):
+    """One client's local training result: updated shared state, last-epoch loss, rows."""
+
+    state: Dict[str, torch.Tensor]
+    loss: float
+    rows: int
+
+
+class RoundCancelled(Exception):
+    """Raised when a round is cancelled (should_stop() returned True) before it saved anything."""
+
+
+class _StateSpec(NamedTuple):
+    name: str
+    shape: Tuple[int, ...]
+    offset: int
+    size: int
+
+
+class _PairLayout(NamedTuple):
+    """Shape of the shared data block: S (students, dim), J (jobs, dim), then per-row indices and labels."""
+
+    students: int
+    jobs: int
+    dim: int
+    rows: int
+
+
+class _Task(NamedTuple):
+    index: int
+    client_id: int
+    data_shm: str
+    state_shm: str
+    out_shm: str
+    row_start: int
+    row_stop: int
+    layout: _PairLayout
+    input_dim: int
+    specs: Tuple[_StateSpec, ...]
+    epochs: int
+    seed: Optional[int]
+
+
+def client_seed(seed: int, client_id: int) -> int:
+    """Per-client torch seed: the same for a client however the round is scheduled."""
+    return (seed * 1_000_003 + client_id) % (2**63)
+
+
+def _state_specs(state: Dict[str, torch.Tensor]) -> Tuple[_StateSpec, ...]:
+    specs, offset = [], 0
+    for name, tensor in state.items():
+        specs.append(_StateSpec(name, tuple(tensor.shape), offset, tensor.numel()))
+        offset += tensor.numel()
+    return tuple(specs)
+
+
+def _flatten_state(state: Dict[str, torch.Tensor]) -> np.ndarray:
+    return np.concatenate([t.detach().cpu().numpy().astype(np.float32).ravel() for t in state.values()])
+
+
+def _unflatten_state(flat: np.ndarray, specs) -> Dict[str, torch.Tensor]:
+    return {
+        s.name: torch.from_numpy(np.array(flat[s.offset : s.offset + s.size]).reshape(s.shape))
+        for s in specs
+    }
+
+
+def _pair_nbytes(layout: _PairLayout) -> int:
+    return 4 * ((layout.students + layout.jobs) * layout.dim + 3 * layout.rows)
+
+
+def _pair_views(shm: SharedMemory, layout: _PairLayout) -> Tuple[np.ndarray, ...]:
+    """
+    All clients' PairFeatures, deduplicated: S, J (float32 tables), then
+    student_rows, job_rows (int32, into S / J) and y (float32) of every row.
+    """
+    views, offset = [], 0
+    for shape, dtype in (
+        ((layout.students, layout.dim), np.float32),
+        ((layout.jobs, layout.dim), np.float32),
+        ((layout.rows,), np.int32),
+        ((layout.rows,), np.int32),
+        ((layout.rows,), np.float32),
+    ):
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        views.append(view)
+        offset += view.nbytes
+    return tuple(views)
+
+
+def _client_pairs(shm: SharedMemory, layout: _PairLayout, start: int, stop: int) -> PairFeatures:
+    """
+    Rows start:stop of the shared block as a PairFeatures of their own: only
+    the student / job vectors those rows use are copied out of the tables.
+    """
+    S_all, J_all, student_rows, job_rows, y = _pair_views(shm, layout)
+    students, s_rows = np.unique(student_rows[start:stop], return_inverse=True)
+    jobs, j_rows = np.unique(job_rows[start:stop], return_inverse=True)
+    return PairFeatures(
+        S_all[students],
+        J_all[jobs],
+        s_rows.astype(np.int32),
+        j_rows.astype(np.int32),
+        np.array(y[start:stop]),
+    )
+
+
+def _init_worker(threads: int):
+    torch.set_num_threads(threads)
+
+
+def _train_task(task: _Task) -> bool:
+    """
+    Worker side: one client's local training, written into the out block as
+    the flattened update followed by its loss.
+    """
+    from app.ml.pfl_train import local_update_from
+
+    # spawned workers share the parent's resource tracker; the parent unlinks
+    blocks = [SharedMemory(name=task.data_shm), SharedMemory(name=task.state_shm), SharedMemory(name=task.out_shm)]
+    data, state, out = blocks
+    state_size = sum(s.size for s in task.specs)
+    try:
+        # copies: numpy views must be gone before the blocks are closed
+        source = _client_pairs(data, task.layout, task.row_start, task.row_stop)
+        flat = np.ndarray((state_size,), dtype=np.float32, buffer=state.buf)
+        shared = _unflatten_state(flat, task.specs)
+        del flat
+
+        update = local_update_from(
+            source,
+            shared,
+            task.input_dim,
+            epochs=task.epochs,
+            seed=None if task.seed is None else client_seed(task.seed, task.client_id),
+        )
+        if update is None:
+            return False
+        results = np.ndarray((task.index + 1, state_size + 1), dtype=np.float32, buffer=out.buf)
+        results[task.index, :state_size] = _flatten_state(update.state)
+        results[task.index, state_size] = update.loss
+        del results
+        return True
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_config: Optional[Tuple[int, int]] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int, threads: int) -> ProcessPoolExecutor:
+    """
+    Process pool kept across rounds (workers start once per process). Uses
+    "spawn": forking a process that already runs torch threads can deadlock.
+    """
+    global _pool, _pool_config
+    with _pool_lock:
+        if _pool is None or _pool_config != (workers, threads):
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            _pool_config = (workers, threads)
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next _get_pool() creates a new one."""
+    global _pool, _pool_config
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_config = None, None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def resolve_workers(workers: Optional[int] = None) -> Tuple[int, int]:
+    """(processes, torch threads per process) from FL_TRAIN_WORKERS / FL_TRAIN_THREADS_PER_WORKER."""
+    cpus = os.cpu_count() or 1
+    workers = workers or settings.FL_TRAIN_WORKERS or cpus
+    threads = settings.FL_TRAIN_THREADS_PER_WORKER or max(1, cpus // workers)
+    return workers, threads
+
+
+def _write_pairs(
+    shm: SharedMemory,
+    layout: _PairLayout,
+    clients: Dict[int, PairFeatures],
+    s_tables: Dict[int, Tuple[int, np.ndarray]],
+    j_tables: Dict[int, Tuple[int, np.ndarray]],
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Copy the distinct tables ({id: (first row, table)}) and every client's
+    row indices (re-based onto the shared tables) and labels into the data
+    block; returns each client's (start, stop) rows in it.
+    """
+    S_all, J_all, student_rows, job_rows, y = _pair_views(shm, layout)
+    for start, table in s_tables.values():
+        S_all[start : start + table.shape[0]] = table
+    for start, table in j_tables.values():
+        J_all[start : start + table.shape[0]] = table
+
+    ranges: Dict[int, Tuple[int, int]] = {}
+    offset = 0
+    for client_id, source in clients.items():
+        n = len(source)
+        if n:
+            student_rows[offset : offset + n] = source.student_rows + s_tables[id(source.S)][0]
+            job_rows[offset : offset + n] = source.job_rows + j_tables[id(source.J)][0]
+            y[offset : offset + n] = source.y
+        ranges[client_id] = (offset, offset + n)
+        offset += n
+    return ranges
+
+
+def train_clients(
+    clients: Dict[int, PairFeatures],
+    global_shared_state: Dict[str, torch.Tensor],
+    input_dim: int,
+    epochs: int = 3,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict[int, Optional[LocalUpdate]]:
+    """
+    Local training for every client {client_id: PairFeatures}, returning
+    {client_id: LocalUpdate or None (no rows)}, in the input order.
+
+    Clients are trained in a process pool. The clients' embedding tables
+    (each distinct S / J once, e.g. the shared tables of
+    build_feedback_datasets), their row indices and labels, and the global
+    shared state are copied once into shared memory; a worker copies out
+    the vectors its client uses and builds features per batch, then writes
+    its update into a shared output block (no per-client pickling of
+    arrays, no (rows, 4D) matrix anywhere). Small rounds (fewer than
+    FL_PARALLEL_MIN_CLIENTS clients or FL_PARALLEL_MIN_ROWS rows) run
+    serially in this process.
+
+    With `seed`, each client is seeded by client_seed(seed, client_id), so
+    results do not depend on worker count or scheduling.
+
+    progress(done, total) is called as clients finish. should_stop() is
+    polled between clients; when it returns True, clients not yet started
+    are dropped, running ones are waited for, and RoundCancelled is raised.
+    """
+    from app.ml.pfl_train import local_update_from
+
+    workers, threads = resolve_workers(workers)
+    total_rows = sum(len(source) for source in clients.values())
+
+    if (
+        workers <= 1
+        or len(clients) < settings.FL_PARALLEL_MIN_CLIENTS
+        or total_rows < settings.FL_PARALLEL_MIN_ROWS
+    ):
+        updates: Dict[int, Optional[LocalUpdate]] = {}
+        for client_id, source in clients.items():
+            if should_stop is not None and should_stop():
+                raise RoundCancelled()
+            updates[client_id] = local_update_from(
+                source,
+                global_shared_state,
+                input_dim,
+                epochs=epochs,
+                seed=None if seed is None else client_seed(seed, client_id),
+            )
+            if progress is not None:
+                progress(len(updates), len(clients))
+        return updates
+
+    # each distinct table once, at a row offset into the shared S / J
+    s_tables: Dict[int, Tuple[int, np.ndarray]] = {}
+    j_tables: Dict[int, Tuple[int, np.ndarray]] = {}
+    dim = 1
+    for source in clients.values():
+        if len(source) == 0:
+            continue
+        dim = source.S.shape[1]
+        for tables, table in ((s_tables, source.S), (j_tables, source.J)):
+            if id(table) not in tables:
+                tables[id(table)] = (sum(t.shape[0] for _, t in tables.values()), table)
+    layout = _PairLayout(
+        sum(t.shape[0] for _, t in s_tables.values()),
+        sum(t.shape[0] for _, t in j_tables.values()),
+        dim,
+        total_rows,
+    )
+
+    specs = _state_specs(global_shared_state)
+    state_flat = _flatten_state(global_shared_state)
+    data = SharedMemory(create=True, size=max(1, _pair_nbytes(layout)))
+    state = SharedMemory(create=True, size=state_flat.nbytes)
+    out = SharedMemory(create=True, size=max(1, len(clients) * (state_flat.nbytes + 4)))
+    results = None
+    try:
+        ranges = _write_pairs(data, layout, clients, s_tables, j_tables)
+        tasks = [
+            _Task(
+                index, client_id, data.name, state.name, out.name,
+                start, stop, layout, input_dim, specs, epochs, seed,
+            )
+            for index, (client_id, (start, stop)) in enumerate(ranges.items())
+        ]
+        np.ndarray(state_flat.shape, dtype=np.float32, buffer=state.buf)[:] = state_flat
+
+        pool = _get_pool(workers, threads)
+        futures: Dict = {}
+        trained: Dict[int, bool] = {}
+        try:
+            for task in tasks:
+                futures[pool.submit(_train_task, task)] = task
+            for future in as_completed(futures):
+                trained[futures[future].index] = future.result()
+                if progress is not None:
+                    progress(len(trained), len(tasks))
+                if should_stop is not None and should_stop() and len(trained) < len(tasks):
+                    raise RoundCancelled()
+        except BaseException as exc:
+            for pending in futures:
+                pending.cancel()
+            wait(futures)  # tasks already running still write into `out`
+            if isinstance(exc, BrokenProcessPool):
+                _discard_pool(pool)  # a worker died (e.g. OOM-killed): the next round starts a fresh pool
+            raise
+
+        state_size = state_flat.shape[0]
+        results = np.ndarray((len(clients), state_size + 1), dtype=np.float32, buffer=out.buf)
+        updates = {
+            task.client_id: LocalUpdate(
+                _unflatten_state(results[task.index, :state_size], specs),
+                float(results[task.index, state_size]),
+                task.row_stop - task.row_start,
+            )
+            if trained[task.index]
+            else None
+            for task in tasks
+        }
+        return updates
+    finally:
+        results = None  # release the view before closing the blocks
+        for shm in (data, state, out):
+            shm.close()
+            shm.unlink()
+
+
+def _benchmark(clients: int, rows: int, dim: int, epochs: int, worker_counts: List[int], seed: int = 0):
+    """
+    Wall-clock of one round's local training on synthetic clients for each
+    worker count, and the max deviation of every run from the serial one.
+    """
+    from app.ml.model import PFLRecommender, get_shared_state
+
+    rng = np.random.default_rng(seed)
+    input_dim = 4 * dim
+    # one student per client, rows over a shared job table (as in a real round)
+    S = rng.standard_normal((clients, dim)).astype(np.float32)
+    J = rng.standard_normal((max(1, min(5000, clients * rows // 10)), dim)).astype(np.float32)
+    data = {
+        client_id: PairFeatures(
+            S,
+            J,
+            np.full(rows, client_id, dtype=np.int32),
+            rng.integers(0, J.shape[0], rows).astype(np.int32),
+            rng.integers(0, 2, rows).astype(np.float32),
+        )
+        for client_id in range(clients)
+    }
+    torch.manual_seed(seed)
+    shared = get_shared_state(PFLRecommender(input_dim))
+
+    print(f"clients={clients} rows/client={rows} input_dim={input_dim} epochs={epochs} cpus={os.cpu_count()}")
+    settings.FL_PARALLEL_MIN_CLIENTS = 1
+    settings.FL_PARALLEL_MIN_ROWS = 0
+
+    reference = None
+    baseline_s = None
+    for workers in worker_counts:
+        n_workers, threads = resolve_workers(workers)
+        train_clients(data, shared, input_dim, epochs=epochs, workers=workers, seed=seed)  # warm-up / pool start
+        started = time.perf_counter()
+        updates = train_clients(data, shared, input_dim, epochs=epochs, workers=workers, seed=seed)
+        elapsed = time.perf_counter() - started
+
+        flat = np.stack([_flatten_state(updates[c].state) for c in sorted(updates)])
+        if reference is None:
+            reference, baseline_s = flat, elapsed
+        print(
+            f"  workers={n_workers:>2} threads/worker={threads:>2}: {elapsed:7.2f} s  "
+            f"speedup x{baseline_s / elapsed:4.2f}  max |diff| vs first {float(np.max(np.abs(flat - reference))):.2e}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel local training vs. worker count")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    _benchmark(args.clients, args.rows, args.dim, args.epochs, args.workers)
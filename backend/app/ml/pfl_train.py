@@ -1,13 +1,14 @@
 # app/ml/pfl_train.py
 
 import copy
-from typing import List
+import time
+from typing import Callable, Dict, List, Optional
 
 import torch
-import torch.nn as nn
 import numpy as np
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.db.session import SessionLocal
 from app.models.models import Student
 from app.ml.model import (
@@ -16,43 +17,89 @@ from app.ml.model import (
     save_global_model,
     get_shared_state,
     set_shared_state,
+    global_model_version,
 )
-from app.ml.features import get_student_feedback_dataset, get_input_dim
+from app.ml.features import get_input_dim
+from app.ml.feedback_dataset import build_feedback_datasets
+from app.ml.fl_watermarks import RoundPlan, plan_round, save_watermarks, shared_state_digest
+from app.ml.parallel_train import LocalUpdate, RoundCancelled, train_clients
+from app.ml.streaming_train import ArrayFeatures, train_streaming
 
+settings = get_settings
 
-def train_local(
-    student: Student,
+
+def local_update(
+    X: np.ndarray,
+    y: np.ndarray,
     global_shared_state,
-    db: Session,
     input_dim: int,
     epochs: int = 3,
-) -> dict | None:
+    seed: Optional[int] = None,
+) -> Optional[LocalUpdate]:
     """
-    Local PFL training on one client's (student's) feedback.
-    Returns updated shared state dict, or None if no data.
+    Local PFL training on one client's (X, y), in FL_BATCH_SIZE mini-batches.
+    Returns the updated shared state with the last epoch's loss, or None if no data.
+    `seed` fixes the personal layers' init and the shuffling (deterministic runs).
+    X may be memory-mapped.
     """
-    X, y = get_student_feedback_dataset(db, student)
-    if X.shape[0] == 0:
-        return None
+    return local_update_from(ArrayFeatures(X, y), global_shared_state, input_dim, epochs=epochs, seed=seed)
 
-    X_tensor = torch.from_numpy(X)
-    y_tensor = torch.from_numpy(y)
+
+def local_update_from(
+    source,
+    global_shared_state,
+    input_dim: int,
+    epochs: int = 3,
+    seed: Optional[int] = None,
+) -> Optional[LocalUpdate]:
+    """
+    local_update() on any streaming_train source (ArrayFeatures /
+    PairFeatures), so a large client never holds its whole feature matrix.
+    """
+    if len(source) == 0:
+        return None
+    if seed is not None:
+        torch.manual_seed(seed)
 
     local_model = PFLRecommender(input_dim)
     set_shared_state(local_model, global_shared_state)
+    loss = train_streaming(local_model, source, epochs=epochs, seed=seed)
+    return LocalUpdate(get_shared_state(local_model), loss, len(source))
 
-    loss_fn = nn.BCELoss()
-    optimizer = torch.optim.Adam(local_model.parameters(), lr=1e-3)
 
-    local_model.train()
-    for _ in range(epochs):
-        optimizer.zero_grad()
-        preds = local_model(X_tensor).squeeze()
-        loss = loss_fn(preds, y_tensor)
-        loss.backward()
-        optimizer.step()
+def train_on_dataset(
+    X: np.ndarray,
+    y: np.ndarray,
+    global_shared_state,
+    input_dim: int,
+    epochs: int = 3,
+    seed: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Local PFL training on one client's (X, y).
+    Returns updated shared state dict, or None if no data.
+    """
+    update = local_update(X, y, global_shared_state, input_dim, epochs=epochs, seed=seed)
+    return None if update is None else update.state
+
 
-    return get_shared_state(local_model)
+def train_local(
+    student: Student,
+    global_shared_state,
+    db: Session,
+    input_dim: int,
+    epochs: int = 3,
+) -> dict | None:
+    """
+    Local PFL training on one client's (student's) feedback, streamed in
+    mini-batches from the student / job embeddings (no (n, 4D) matrix).
+    Returns updated shared state dict, or None if no data.
+    """
+    data = build_feedback_datasets(db, min_feedback=1, student_ids=[student.id])
+    if student.id not in data.bounds:
+        return None
+    update = local_update_from(data.client(student.id), global_shared_state, input_dim, epochs=epochs)
+    return None if update is None else update.state
 
 
 def fed_avg(states: List[dict]) -> dict:
@@ -65,51 +112,136 @@ def fed_avg(states: List[dict]) -> dict:
     return avg_state
 
 
-def run_federated_round(min_feedback: int = 3):
+def round_states(trained: List[dict], plan: RoundPlan, global_shared: dict) -> List[dict]:
+    """
+    What a round's FedAvg averages, one state per eligible client: the fresh
+    updates, the reused clients' cached updates, and the pre-round global
+    weights for each skipped client (global model moved since its cached
+    update, or none cached; its data is already in them). Unchanged clients thus keep their weight in the average.
+    """
+    return trained + list(plan.reuse.values()) + [global_shared] * len(plan.skipped)
+
+
+def run_federated_round(
+    min_feedback: int = 3,
+    epochs: int = 3,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict[str, object]:
     """
     One PFL / FL round across all students with at least `min_feedback` samples.
 
+    Incremental: clients are retrained only when their feedback changed since
+    their watermark (app/ml/fl_watermarks.py). Unchanged clients still count
+    in FedAvg, through their cached update (only if it was trained from the
+    current global weights) or the pre-round global weights (round_states()). A round in which no client trained leaves the global
+    model as it is.
+
+    progress(phase, done, total) reports "plan", "datasets", "train"
+    (per client) and "aggregate". should_stop() is checked between phases
+    and between clients; a stop raises RoundCancelled before the global
+    model or any watermark is written.
+
+    Returns the round's metrics: clients trained / reused / skipped, rows,
+    row-weighted mean of the trained clients' last-epoch loss, whether the
+    global model was updated, duration and per-phase timings.
+
     This is what you reference for RQ1 + RQ2:
     - data heterogeneity handled via client-specific training
     - privacy preserved as only model parameters are exchanged
     """
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    clock = started
+
+    def lap(phase: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[phase] = round((now - clock) * 1e3, 2)
+        clock = now
+        if should_stop is not None and should_stop():
+            raise RoundCancelled()
+
+    def report(phase: str, done: int, total: int):
+        if progress is not None:
+            progress(phase, done, total)
+
     db = SessionLocal()
     try:
         input_dim = get_input_dim()
 
+        report("plan", 0, 1)
         global_model = load_global_model(input_dim)
         global_shared = get_shared_state(global_model)
-
-        students = db.query(Student).all()
-        client_states: List[dict] = []
-
-        for s in students:
-            X, y = get_student_feedback_dataset(db, s)
-            if X.shape[0] < min_feedback:
-                continue
-
-            updated_shared = train_local(
-                student=s,
-                global_shared_state=global_shared,
-                db=db,
-                input_dim=input_dim,
-                epochs=3,
-            )
-            if updated_shared is not None:
-                client_states.append(updated_shared)
-
-        if not client_states:
-            print("No eligible clients for FL round (not enough feedback).")
-            return
-
-        new_shared = fed_avg(client_states)
-        set_shared_state(global_model, new_shared)
-        save_global_model(global_model)
-        print("✅ Federated round completed and global semantic model updated.")
+        global_digest = shared_state_digest(global_shared)
+
+        # only clients whose feedback changed since their watermark are retrained
+        plan = plan_round(db, min_feedback, global_digest)
+        print(
+            f"Round plan: {len(plan.train)} to train, {len(plan.reuse)} reused, "
+            f"{len(plan.skipped)} unchanged and skipped"
+        )
+        lap("plan")
+
+        # every client to train: shared embedding tables + row indices from one
+        # query and one encode pass; features are built per mini-batch
+        report("datasets", 0, len(plan.train))
+        data = build_feedback_datasets(db, min_feedback=min_feedback, student_ids=plan.train)
+        clients = data.clients  # {student_id: PairFeatures} views over the shared tables
+        print(f"Built datasets for {len(clients)} clients, phases (ms): {data.timings_ms}")
+        lap("datasets")
+
+        # local updates in a process pool (serial for small rounds)
+        report("train", 0, len(clients))
+        updates = train_clients(
+            clients,
+            global_shared,
+            input_dim,
+            epochs=epochs,
+            seed=settings.FL_TRAIN_SEED,
+            progress=lambda done, total: report("train", done, total),
+            should_stop=should_stop,
+        )
+        trained = {student_id: u for student_id, u in updates.items() if u is not None}
+        lap("train")
+        print(f"Trained {len(trained)} clients in {timings['train'] / 1e3:.2f}s")
+
+        rows = sum(u.rows for u in trained.values())
+        metrics: Dict[str, object] = {
+            "clients_eligible": len(plan.summary),
+            "clients_trained": len(trained),
+            "clients_reused": len(plan.reuse),
+            "clients_skipped": len(plan.skipped),
+            "rows": rows,
+            "loss": round(sum(u.loss * u.rows for u in trained.values()) / rows, 6) if rows else None,
+            "model_updated": False,
+            "model_version": None,
+        }
+
+        if not trained:
+            print("No eligible clients for FL round (not enough new feedback).")
+        else:
+            report("aggregate", 0, 1)
+            client_states = round_states([u.state for u in trained.values()], plan, global_shared)
+            set_shared_state(global_model, fed_avg(client_states))
+            save_global_model(global_model)
+
+            # each update is labelled with the weights it was trained from
+            save_watermarks(db, plan, {sid: u.state for sid, u in trained.items()}, global_digest)
+            db.commit()
+            metrics["model_updated"] = True
+            metrics["model_version"] = global_model_version()
+            timings["aggregate"] = round((time.perf_counter() - clock) * 1e3, 2)
+            report("aggregate", 1, 1)
+            print("✅ Federated round completed and global semantic model updated.")
+
+        metrics["duration_s"] = round(time.perf_counter() - started, 3)
+        metrics["timings_ms"] = timings
+        return metrics
 
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    run_federated_round()
+    print(run_federated_round())
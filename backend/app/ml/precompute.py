@@ -0,0 +1,170 @@
+# app/ml/precompute.py
+
+import argparse
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.locks import advisory_unlock, try_advisory_lock
+from app.db.session import SessionLocal
+from app.models.models import Student, MaterializedRecommendation
+
+settings = get_settings
+
+# pg_try_advisory_lock key, so only one worker/process precomputes at a time
+_ADVISORY_LOCK_KEY = 0x5EC0_0001
+
+
+def write_materialized(
+    db: Session,
+    results: Dict[int, list],
+    model_version: str,
+    computed_at: datetime,
+):
+    """
+    Replace the materialized sets of the given students in bulk:
+    one DELETE ... WHERE student_id IN (...) and one multi-row INSERT.
+
+    results: {student_id: [(job, score), ...]} best first.
+    """
+    if not results:
+        return
+    db.query(MaterializedRecommendation).filter(
+        MaterializedRecommendation.student_id.in_(list(results.keys()))
+    ).delete(synchronize_session=False)
+
+    rows = [
+        {
+            "student_id": student_id,
+            "job_id": job.id,
+            "rank": rank,
+            "score": score,
+            "model_version": model_version,
+            "computed_at": computed_at,
+        }
+        for student_id, ranked in results.items()
+        for rank, (job, score) in enumerate(ranked)
+    ]
+    if rows:
+        db.execute(insert(MaterializedRecommendation), rows)
+
+
+def precompute_all(top_k: Optional[int] = None, batch_size: int = 1000) -> Dict[str, object]:
+    """
+    Recompute top-K for every student with the current global model and
+    write them to materialized_recommendations.
+
+    Students are processed in id-ordered batches through the same batched
+    scorer as /recs/recommend/batch; each batch is written and committed on
+    its own. Returns a small run summary.
+    """
+    from app.services.semantic_recommendation import recommend_batch
+
+    top_k = top_k or settings.PRECOMPUTE_TOP_K
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        lock = try_advisory_lock(db, _ADVISORY_LOCK_KEY)
+        if lock is None:
+            return {"skipped": "another precompute run is in progress"}
+
+        try:
+            computed_at = datetime.now(timezone.utc)
+            model_version = None
+            done = 0
+            last_id = 0
+            while True:
+                batch = (
+                    db.query(Student.id, Student.student_uid)
+                    .filter(Student.id > last_id)
+                    .order_by(Student.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                id_of = {uid: student_id for student_id, uid in batch}
+
+                out = recommend_batch(db, list(id_of.keys()), top_k=top_k, persist=False)
+                results = {id_of[uid]: ranked for uid, ranked in out["results"].items()}
+                # label with the model that actually scored this batch
+                model_version = out["model_version"]
+                write_materialized(db, results, model_version, computed_at)
+                db.commit()
+                done += len(results)
+
+            return {
+                "students": done,
+                "model_version": model_version,
+                "computed_at": computed_at.isoformat(),
+                "seconds": round(time.perf_counter() - started, 2),
+            }
+        finally:
+            advisory_unlock(lock, _ADVISORY_LOCK_KEY)
+    finally:
+        db.close()
+
+
+class PrecomputeScheduler:
+    """
+    Background thread that runs precompute_all() every
+    PRECOMPUTE_INTERVAL_SECONDS and/or whenever trigger() is called
+    (e.g. right after a global model save).
+
+    Triggers arriving during a run coalesce into one follow-up run.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict[str, object]] = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rec-precompute", daemon=True)
+                self._thread.start()
+
+    def start(self):
+        if settings.PRECOMPUTE_INTERVAL_SECONDS > 0:
+            self._ensure_thread()
+
+    def trigger(self):
+        self._wake.set()
+        self._ensure_thread()
+
+    def _run(self):
+        interval = settings.PRECOMPUTE_INTERVAL_SECONDS
+        while True:
+            woke = self._wake.wait(timeout=interval if interval > 0 else None)
+            self._wake.clear()
+            if not woke and interval <= 0:
+                continue
+            try:
+                self.last_result = precompute_all()
+            except Exception as exc:  # keep the thread alive; next run retries
+                self.last_result = {"error": repr(exc)}
+
+
+_scheduler = PrecomputeScheduler()
+
+
+def get_precompute_scheduler() -> PrecomputeScheduler:
+    return _scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute top-K recommendations for all students")
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    summary = precompute_all(top_k=args.top_k, batch_size=args.batch_size)
+    print(f"✅ Precompute finished: {summary}")
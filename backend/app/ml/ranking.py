@@ -0,0 +1,88 @@
+# app/ml/ranking.py
+
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+
+
+def top_k_indices(
+    scores: np.ndarray,
+    k: int,
+    score_threshold: Optional[float] = None,
+    tie_break: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Indices of the k best scores, best first, in O(N + k log k).
+
+    - np.argpartition finds the k-th best score; only elements at or above it
+      are sorted (ties at the boundary are all kept so the tie-break decides).
+    - Equal scores are ordered by ascending `tie_break` (e.g. job ids), or by
+      position when not given, so results don't depend on candidate order.
+    - Scores below `score_threshold`, NaN and -inf (padding) are dropped, so
+      fewer than k indices may come back.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    valid = np.isfinite(scores)
+    if score_threshold is not None:
+        valid &= scores >= score_threshold
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return idx
+
+    s = scores[idx]
+    if idx.size > k:
+        kth = s[np.argpartition(-s, k - 1)[k - 1]]
+        keep = s >= kth
+        idx, s = idx[keep], s[keep]
+
+    tie = idx if tie_break is None else np.asarray(tie_break)[idx]
+    order = np.lexsort((tie, -s))[:k]
+    return idx[order]
+
+
+def _benchmark(sizes, k: int, repeats: int, seed: int = 0):
+    """
+    sorted(zip(jobs, scores)) (the old ranking) vs top_k_indices + picking
+    only the k winning objects.
+    """
+    rng = np.random.default_rng(seed)
+    print(f"top-{k}, best of {repeats}")
+    for n in sizes:
+        scores = rng.random(n, dtype=np.float32)
+        jobs = [object() for _ in range(n)]
+
+        full = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            ranked = sorted(zip(jobs, scores), key=lambda x: x[1], reverse=True)
+            [(job, float(score)) for job, score in ranked[:k]]
+            full.append(time.perf_counter() - started)
+
+        part = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            top = top_k_indices(scores, k)
+            [(jobs[i], float(scores[i])) for i in top]
+            part.append(time.perf_counter() - started)
+
+        assert np.allclose(np.sort(scores)[::-1][:k], scores[top])
+        print(
+            f"  N={n:>9,}  sorted(): {min(full) * 1e3:9.2f} ms   "
+            f"top_k_indices: {min(part) * 1e3:7.2f} ms   x{min(full) / min(part):6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark partial top-K selection vs full sort")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    _benchmark(args.sizes, args.k, args.repeats)
@@ -0,0 +1,368 @@
+# app/ml/scoring.py
+
+import argparse
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from app.core.config import get_settings
+from app.ml.batching import MicroBatcher
+from app.ml.features import build_pair_feature_matrix, pair_feature_buffer
+from app.ml.model import PFLRecommender
+
+settings = get_settings
+
+
+def _as_tensor(x: np.ndarray) -> torch.Tensor:
+    """
+    Zero-copy tensor over a float32 / float16 array (e.g. a read-only slice of
+    the mapped job matrix); other dtypes are converted to float32.
+    """
+    x = np.asarray(x)
+    if x.dtype not in (np.float32, np.float16):
+        x = x.astype(np.float32)
+    x = np.ascontiguousarray(x)
+    with warnings.catch_warnings():
+        # read-only memmaps: the scorer never writes into its inputs
+        warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+        return torch.from_numpy(x)
+
+
+class _Scorer:
+    """submit() / score_batched() on top of a scorer's score() / score_many()."""
+
+    def submit(self, s_vec: np.ndarray, J: np.ndarray, catalog_key: Optional[str] = None) -> Future:
+        """
+        Future of score(s_vec, J). With a `catalog_key`, concurrent requests
+        for the same catalog are coalesced into one score_many() by the
+        scoring micro-batcher; without one (per-request candidate sets) the
+        score runs right away.
+        """
+        if catalog_key is None or not settings.GLOBAL_MICROBATCH_ENABLED:
+            future: Future = Future()
+            try:
+                future.set_result(self.score(s_vec, J, catalog_key=catalog_key))
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+        return _score_batcher.submit((self, s_vec, J, catalog_key))
+
+    def score_batched(self, s_vec: np.ndarray, J: np.ndarray, catalog_key: Optional[str] = None) -> np.ndarray:
+        """Blocking submit()."""
+        return self.submit(s_vec, J, catalog_key).result()
+
+
+class FactorizedScorer(_Scorer):
+    """
+    Score one student against a whole job catalog without building the
+    (N, 4D) [s, j, |s-j|, s*j] matrix.
+
+    The first shared layer is Linear(4D, H). Splitting its weight into the four
+    D-wide blocks W_s, W_j, W_d, W_p gives, for every job j:
+
+        h_pre = W_s s + b          (one vector per student)
+              + W_j j              (per-job projection, cached per catalog)
+              + (W_p * s) j        (one (N, D) x (D, H) matmul)
+              + W_d |s - j|        (the only non-separable block; chunked)
+
+    which is exactly the plain forward pass, reordered. Per request this is two
+    N x D x H matmuls instead of one N x 4D x H matmul, and peak extra memory is
+    one (chunk, D) block instead of the full (N, 4D) feature matrix.
+
+    `model` is the eager PFLRecommender; exported TorchScript / int8 modules
+    are opaque and served by ModuleScorer.
+    """
+
+    def __init__(
+        self,
+        model: PFLRecommender,
+        chunk_size: int = 16384,
+        cache_size: int = 4,
+    ):
+        state = model.state_dict()
+        W = state["shared.0.weight"].detach().to(torch.float32)
+        b = state["shared.0.bias"].detach().to(torch.float32)
+
+        d = W.shape[1] // 4
+        self.dim = d
+        self.W_s = W[:, :d].contiguous()
+        self.W_j_t = W[:, d : 2 * d].t().contiguous()  # (D, H)
+        self.W_d_t = W[:, 2 * d : 3 * d].t().contiguous()  # (D, H)
+        self.W_p = W[:, 3 * d :].contiguous()  # (H, D)
+        self.b = b
+        self.activation = torch.relu  # shared = Linear + ReLU
+        self.personal = model.personal
+
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self._job_proj_cache: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def project_jobs(self, J: np.ndarray) -> torch.Tensor:
+        """
+        W_j j for every job: (N, H). Independent of the student.
+        """
+        J_t = _as_tensor(J)
+        with torch.no_grad():
+            if J_t.dtype == torch.float32:
+                return J_t @ self.W_j_t
+            out = torch.empty((J_t.shape[0], self.W_j_t.shape[1]), dtype=torch.float32)
+            for start in range(0, J_t.shape[0], self.chunk_size):
+                stop = min(start + self.chunk_size, J_t.shape[0])
+                out[start:stop] = J_t[start:stop].float() @ self.W_j_t
+            return out
+
+    def job_projections(self, J: np.ndarray, catalog_key: Optional[str] = None) -> torch.Tensor:
+        """
+        Cached project_jobs(); `catalog_key` must change whenever J does.
+        """
+        if catalog_key is None:
+            return self.project_jobs(J)
+
+        with self._cache_lock:
+            proj = self._job_proj_cache.get(catalog_key)
+            if proj is not None:
+                self._job_proj_cache.move_to_end(catalog_key)
+                return proj
+
+        proj = self.project_jobs(J)
+        with self._cache_lock:
+            self._job_proj_cache[catalog_key] = proj
+            while len(self._job_proj_cache) > self.cache_size:
+                self._job_proj_cache.popitem(last=False)
+        return proj
+
+    def score(
+        self,
+        s_vec: np.ndarray,
+        J: np.ndarray,
+        catalog_key: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        Model scores (sigmoid outputs) for one student vs. every row of J: (N,).
+        J may be float16 (converted chunk by chunk) or a read-only memmap slice.
+        """
+        J_t = _as_tensor(J)
+        s = torch.from_numpy(np.asarray(s_vec, dtype=np.float32))
+        n = J_t.shape[0]
+
+        with torch.no_grad():
+            job_proj = self.job_projections(J, catalog_key)
+            base = self.W_s @ s + self.b  # (H,)
+            W_prod_s_t = (self.W_p * s).t()  # (D, H)
+
+            out = torch.empty(n, dtype=torch.float32)
+            for start in range(0, n, self.chunk_size):
+                stop = min(start + self.chunk_size, n)
+                Jc = J_t[start:stop].float()
+
+                h = job_proj[start:stop] + base
+                h.addmm_(Jc, W_prod_s_t)
+                h.addmm_((Jc - s).abs_(), self.W_d_t)
+
+                h = self.activation(h)
+                out[start:stop] = self.personal(h).squeeze(-1)
+
+        return out.numpy()
+
+    def score_many(
+        self,
+        S: np.ndarray,
+        J: np.ndarray,
+        catalog_key: Optional[str] = None,
+        candidates: Optional[np.ndarray] = None,
+        max_block_elems: int = 1 << 23,
+    ) -> np.ndarray:
+        """
+        Scores for B students at once, with batched matmuls.
+
+        S:          (B, D) student embeddings
+        J:          (N, D) job embeddings (float32, or float16 converted per block)
+        candidates: optional (B, C) row indices into J (per-student candidate
+                    sets); -1 entries are padding and score -inf
+
+        Returns (B, N) scores, or (B, C) when `candidates` is given.
+        Work is split in job blocks so the (B, block, D) |s-j| tensor stays
+        under `max_block_elems` elements.
+        """
+        S_t = torch.from_numpy(np.ascontiguousarray(S, dtype=np.float32))
+        J_t = _as_tensor(J)
+        b = S_t.shape[0]
+
+        with torch.no_grad():
+            job_proj = self.job_projections(J, catalog_key)
+            base = (S_t @ self.W_s.t() + self.b).unsqueeze(1)  # (B, 1, H)
+            W_prod_s_t = (self.W_p.unsqueeze(0) * S_t.unsqueeze(1)).transpose(1, 2)  # (B, D, H)
+
+            if candidates is not None:
+                cand = torch.from_numpy(np.asarray(candidates, dtype=np.int64))
+                pad = cand < 0
+                cand = cand.clamp(min=0)
+                n = cand.shape[1]
+            else:
+                n = J_t.shape[0]
+
+            out = torch.empty((b, n), dtype=torch.float32)
+            block = max(1, max_block_elems // max(1, b * self.dim))
+            for start in range(0, n, block):
+                stop = min(start + block, n)
+                if candidates is not None:
+                    idx = cand[:, start:stop]
+                    Jc = J_t[idx].float()  # (B, c, D)
+                    h = job_proj[idx] + base  # (B, c, H)
+                else:
+                    Jc = J_t[start:stop].float()  # (c, D), broadcast over students
+                    h = job_proj[start:stop].unsqueeze(0) + base  # (B, c, H)
+
+                h = h + torch.matmul(Jc, W_prod_s_t)
+                diff = (Jc - S_t.unsqueeze(1)).abs_()
+                h = h + torch.matmul(diff, self.W_d_t)
+
+                h = self.activation(h)
+                out[:, start:stop] = self.personal(h).squeeze(-1)
+
+            if candidates is not None:
+                out[pad] = float("-inf")
+
+        return out.numpy()
+
+
+class ModuleScorer(_Scorer):
+    """
+    Scores with an exported module (TorchScript or int8 TorchScript, see
+    app/ml/export.py) run on [s, j, |s-j|, s*j] rows, built `chunk_size` jobs
+    at a time into a reused buffer. The export is a black box, so the
+    factorized first layer doesn't apply; memory stays one chunk of features.
+    Same interface as FactorizedScorer.
+    """
+
+    def __init__(self, module, chunk_size: int = 4096):
+        self.module = module
+        self.chunk_size = chunk_size
+
+    def score(
+        self,
+        s_vec: np.ndarray,
+        J: np.ndarray,
+        catalog_key: Optional[str] = None,
+    ) -> np.ndarray:
+        """Model scores for one student vs. every row of J: (N,). `catalog_key` is unused."""
+        s = np.asarray(s_vec, dtype=np.float32)
+        n, d = J.shape
+        out = np.empty(n, dtype=np.float32)
+        with torch.no_grad():
+            for start in range(0, n, self.chunk_size):
+                stop = min(start + self.chunk_size, n)
+                X = build_pair_feature_matrix(
+                    s, np.asarray(J[start:stop], dtype=np.float32), out=pair_feature_buffer(stop - start, d)
+                )
+                out[start:stop] = self.module(torch.from_numpy(X)).reshape(-1).numpy()
+        return out
+
+    def score_many(
+        self,
+        S: np.ndarray,
+        J: np.ndarray,
+        catalog_key: Optional[str] = None,
+        candidates: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """(B, N) scores, or (B, C) for per-student `candidates` (-1 = padding, scores -inf)."""
+        if candidates is None:
+            return np.stack([self.score(s, J) for s in S]) if len(S) else np.empty((0, J.shape[0]), np.float32)
+
+        candidates = np.asarray(candidates, dtype=np.int64)
+        out = np.full(candidates.shape, -np.inf, dtype=np.float32)
+        for i, s in enumerate(S):
+            valid = candidates[i] >= 0
+            if valid.any():
+                out[i, valid] = self.score(s, J[candidates[i, valid]])
+        return out
+
+
+def _score_many_requests(
+    payloads: List[Tuple[_Scorer, np.ndarray, np.ndarray, str]],
+) -> List[np.ndarray]:
+    """
+    MicroBatcher batch_fn: requests with the same scorer and catalog key
+    share one score_many() over their stacked student vectors.
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(payloads)
+    groups: Dict[Tuple[int, str], List[int]] = {}
+    for i, (scorer, _, _, catalog_key) in enumerate(payloads):
+        groups.setdefault((id(scorer), catalog_key), []).append(i)
+    for idxs in groups.values():
+        scorer, _, J, catalog_key = payloads[idxs[0]]
+        if len(idxs) == 1:
+            results[idxs[0]] = scorer.score(payloads[idxs[0]][1], J, catalog_key=catalog_key)
+            continue
+        S = np.stack([payloads[i][1] for i in idxs])
+        for i, row in zip(idxs, scorer.score_many(S, J, catalog_key=catalog_key)):
+            results[i] = row
+    return results
+
+
+_score_batcher = MicroBatcher(
+    _score_many_requests,
+    max_items=settings.GLOBAL_MICROBATCH_MAX_STUDENTS,
+    max_wait_ms=settings.GLOBAL_MICROBATCH_WAIT_MS,
+    name="global-score",
+)
+
+
+def get_score_batcher() -> MicroBatcher:
+    return _score_batcher
+
+
+def _check(n_jobs: int, dim: int, seed: int = 0):
+    """
+    Compare FactorizedScorer against the plain forward pass on random data.
+    """
+    rng = np.random.default_rng(seed)
+    torch.manual_seed(seed)
+
+    model = PFLRecommender(4 * dim).eval()
+    s_vec = rng.standard_normal(dim).astype(np.float32)
+    J = rng.standard_normal((n_jobs, dim)).astype(np.float32)
+
+    started = time.perf_counter()
+    X = build_pair_feature_matrix(s_vec, J)
+    with torch.no_grad():
+        ref = model(torch.from_numpy(X)).squeeze(-1).numpy()
+    plain_s = time.perf_counter() - started
+
+    scorer = FactorizedScorer(model)
+    scorer.score(s_vec, J, catalog_key="bench")  # fills the per-job projection cache
+    started = time.perf_counter()
+    got = scorer.score(s_vec, J, catalog_key="bench")
+    fact_s = time.perf_counter() - started
+
+    many = scorer.score_many(np.stack([s_vec, -s_vec]), J, catalog_key="bench")
+    cand = np.array([[0, 5, -1], [7, 1, 2]])
+    picked = scorer.score_many(np.stack([s_vec, s_vec]), J, catalog_key="bench", candidates=cand)
+
+    hidden = model.shared[0].out_features
+    print(f"jobs={n_jobs} dim={dim}")
+    print(f"  max |diff|          : {float(np.max(np.abs(ref - got))):.3e}")
+    print(f"  max |diff| batched  : {float(np.max(np.abs(ref - many[0]))):.3e}")
+    print(f"  max |diff| gathered : {float(np.max(np.abs(ref[[7, 1, 2]] - picked[1]))):.3e}")
+    print(f"  plain forward       : {plain_s * 1e3:8.1f} ms, pair matrix {X.nbytes / 2**20:8.1f} MiB")
+    print(
+        f"  factorized (cached) : {fact_s * 1e3:8.1f} ms, "
+        f"chunk scratch {min(n_jobs, scorer.chunk_size) * dim * 4 / 2**20:8.1f} MiB"
+    )
+    print(f"  first-layer MACs    : {n_jobs * 4 * dim * hidden:,} -> {n_jobs * 2 * dim * hidden:,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check/benchmark factorized PFL scoring")
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    _check(args.jobs, args.dim)
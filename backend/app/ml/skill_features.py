@@ -0,0 +1,167 @@
+# app/ml/skill_features.py
+
+import argparse
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from scipy import sparse
+
+# Column order of ThesisPreprocessor.FEATURE_ORDER (ml/preprocessors/preprocessor.py)
+FEATURE_ORDER = [
+    "GPA", "age", "salary_min", "salary_max",
+    "skill_overlap", "is_frontend", "is_backend", "is_data", "is_other",
+]
+
+ROLE_KEYWORDS = [
+    ["front-end", "frontend", "ui"],
+    ["back-end", "backend", "api"],
+    ["data", "ml", "ai"],
+]
+
+
+def tokenize_skills(raw: Optional[str]) -> Set[str]:
+    """Comma-separated skills -> set of stripped, lowercased tokens."""
+    return {t.strip().lower() for t in (raw or "").split(",") if t.strip()}
+
+
+def role_flag_row(role: Optional[str]) -> List[int]:
+    """[is_frontend, is_backend, is_data, is_other] for one job title."""
+    r = (role or "").lower()
+    return [int(any(k in r for k in keywords)) for keywords in ROLE_KEYWORDS] + [0]
+
+
+class JobFeatureTable:
+    """
+    Per-catalog job side of the 9-feature PFL input, computed once:
+
+    - skills: binary CSR matrix (jobs x vocabulary) of tokenized required_skills
+    - salary: (N, 2) salary_min / salary_max
+    - flags:  (N, 4) role flags
+
+    features_for(student) then needs one sparse mat-vec for skill overlap and
+    no per-job Python work.
+    """
+
+    def __init__(self, jobs: Iterable, version: Optional[str] = None):
+        self.version = version
+        job_ids, salary, flags = [], [], []
+        indptr, indices = [0], []
+        self.vocab: Dict[str, int] = {}
+
+        for job in jobs:
+            job_ids.append(job.id)
+            salary.append((float(job.salary_min or 0.0), float(job.salary_max or 0.0)))
+            flags.append(role_flag_row(job.role))
+            for token in tokenize_skills(job.required_skills):
+                indices.append(self.vocab.setdefault(token, len(self.vocab)))
+            indptr.append(len(indices))
+
+        n = len(job_ids)
+        self.job_ids = np.asarray(job_ids, dtype=np.int64)
+        self.salary = np.asarray(salary, dtype=float).reshape(n, 2)
+        self.flags = np.asarray(flags, dtype=float).reshape(n, 4)
+        self.skills = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), indptr),
+            shape=(n, max(1, len(self.vocab))),
+        )
+
+    def __len__(self) -> int:
+        return self.job_ids.shape[0]
+
+    def skill_overlap(self, student_skills: Optional[str]) -> np.ndarray:
+        """|student skills ∩ job skills| for every job: (N,)."""
+        cols = [self.vocab[t] for t in tokenize_skills(student_skills) if t in self.vocab]
+        if not cols:
+            return np.zeros(len(self), dtype=float)
+        v = np.zeros(self.skills.shape[1], dtype=np.float32)
+        v[cols] = 1.0
+        return np.asarray(self.skills @ v, dtype=float)
+
+    def features_for(self, student) -> np.ndarray:
+        """(N, 9) feature matrix in FEATURE_ORDER for one student vs. every job."""
+        X = np.empty((len(self), len(FEATURE_ORDER)), dtype=float)
+        X[:, 0] = float(student.cgpa or 0.0)
+        X[:, 1] = int(getattr(student, "age", None) or 0)  # no age column yet
+        X[:, 2:4] = self.salary
+        X[:, 4] = self.skill_overlap(student.skills_raw)
+        X[:, 5:] = self.flags
+        return X
+
+
+_table: Optional[JobFeatureTable] = None
+_table_lock = threading.Lock()
+
+
+def get_job_feature_table(version: str, load_jobs) -> JobFeatureTable:
+    """
+    The JobFeatureTable for catalog `version`, rebuilt (from `load_jobs()`)
+    only when the version changes.
+    """
+    global _table
+    table = _table
+    if table is not None and table.version == version:
+        return table
+    with _table_lock:
+        if _table is None or _table.version != version:
+            _table = JobFeatureTable(load_jobs(), version=version)
+        return _table
+
+
+def _check(n_jobs: int, vocab: int, seed: int = 0):
+    """
+    Compare against the per-pair string-parsing loop on random data.
+    """
+    from types import SimpleNamespace
+
+    rng = np.random.default_rng(seed)
+    skills = [f"Skill{i}" for i in range(vocab)]
+    roles = ["Frontend Engineer", "Backend API Intern", "Data Analyst", "ML Intern", "Designer"]
+
+    def pick():
+        return ", ".join(rng.choice(skills, size=rng.integers(0, 8), replace=False))
+
+    jobs = [
+        SimpleNamespace(
+            id=i, role=roles[i % len(roles)], required_skills=pick(),
+            salary_min=float(rng.integers(0, 500)), salary_max=float(rng.integers(500, 1000)),
+        )
+        for i in range(n_jobs)
+    ]
+    student = SimpleNamespace(cgpa=3.4, skills_raw=pick())
+
+    started = time.perf_counter()
+    s_tokens = tokenize_skills(student.skills_raw)
+    ref = np.array(
+        [
+            [student.cgpa, 0, j.salary_min, j.salary_max,
+             len(s_tokens & tokenize_skills(j.required_skills)), *role_flag_row(j.role)]
+            for j in jobs
+        ],
+        dtype=float,
+    )
+    loop_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = JobFeatureTable(jobs, version="bench")
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    got = table.features_for(student)
+    fast_s = time.perf_counter() - started
+
+    print(f"jobs={n_jobs} vocab={len(table.vocab)}")
+    print(f"  max |diff|           : {float(np.max(np.abs(ref - got))):.3e}")
+    print(f"  per-pair loop        : {loop_s * 1e3:8.1f} ms per student")
+    print(f"  table build (once)   : {build_s * 1e3:8.1f} ms per catalog version")
+    print(f"  vectorized           : {fast_s * 1e3:8.1f} ms per student")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check/benchmark vectorized 9-feature extraction")
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--vocab", type=int, default=2000)
+    args = parser.parse_args()
+
+    _check(args.jobs, args.vocab)
@@ -0,0 +1,207 @@
+# app/ml/streaming_train.py
+
+import argparse
+import multiprocessing
+import time
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.core.config import get_settings
+from app.ml.features import build_pair_feature_matrix
+
+settings = get_settings
+
+
+class ArrayFeatures:
+    """
+    Training rows of an (X, y) pair. X may live in memory or on disk
+    (np.memmap / np.load(mmap_mode="r")): a batch reads only its own rows.
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray):
+        if X.shape[0] != y.shape[0]:
+            raise ValueError(f"X has {X.shape[0]} rows, y has {y.shape[0]}")
+        self.X = X
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.X.shape[0]
+
+    def take(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.asarray(self.X[rows], dtype=np.float32), np.asarray(self.y[rows], dtype=np.float32)
+
+
+class PairFeatures:
+    """
+    Training rows built per batch from embedding tables: row i is
+    [s, j, |s-j|, s*j] with s = S[student_rows[i]], j = J[job_rows[i]].
+    The (rows, 4D) matrix never exists as a whole; S and J may be memory-mapped.
+    """
+
+    def __init__(
+        self,
+        S: np.ndarray,
+        J: np.ndarray,
+        student_rows: np.ndarray,
+        job_rows: np.ndarray,
+        y: np.ndarray,
+    ):
+        if not (student_rows.shape[0] == job_rows.shape[0] == y.shape[0]):
+            raise ValueError("student_rows, job_rows and y must have the same length")
+        self.S = S
+        self.J = J
+        self.student_rows = student_rows
+        self.job_rows = job_rows
+        self.y = y
+
+    @classmethod
+    def empty(cls) -> "PairFeatures":
+        vectors = np.empty((0, 1), dtype=np.float32)
+        rows = np.empty((0,), dtype=np.int32)
+        return cls(vectors, vectors, rows, rows, np.empty((0,), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return self.y.shape[0]
+
+    def take(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        X = build_pair_feature_matrix(self.S[self.student_rows[rows]], self.J[self.job_rows[rows]])
+        return X, np.asarray(self.y[rows], dtype=np.float32)
+
+    def materialize(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The whole (X, y), e.g. for callers that still want one matrix."""
+        return self.take(np.arange(len(self)))
+
+
+def iter_batches(
+    n: int,
+    batch_size: int,
+    shuffle: bool,
+    rng: np.random.Generator,
+    window: int = 0,
+) -> Iterator[np.ndarray]:
+    """
+    Row indices of each mini-batch of one epoch over `n` rows
+    (batch_size <= 0: one batch of all rows).
+
+    Without shuffle: consecutive slices. With shuffle: windows of `window`
+    rows (0 = all rows) are visited in random order and each window's rows
+    permuted, so a memory-mapped source is read one region at a time.
+    Indices are sorted within a batch (sequential reads; the mean batch
+    loss does not depend on row order).
+    """
+    batch_size = batch_size if batch_size > 0 else max(n, 1)
+    if not shuffle:
+        for start in range(0, n, batch_size):
+            yield np.arange(start, min(start + batch_size, n))
+        return
+
+    window = max(window if window > 0 else n, batch_size)
+    starts = np.arange(0, n, window)
+    rng.shuffle(starts)
+    for window_start in starts.tolist():
+        perm = window_start + rng.permutation(min(window, n - window_start))
+        for start in range(0, perm.shape[0], batch_size):
+            yield np.sort(perm[start : start + batch_size])
+
+
+def train_streaming(
+    model: nn.Module,
+    source,
+    epochs: int = 3,
+    batch_size: Optional[int] = None,
+    shuffle: Optional[bool] = None,
+    seed: Optional[int] = None,
+    lr: float = 1e-3,
+) -> float:
+    """
+    Mini-batch training of `model` on `source` (ArrayFeatures / PairFeatures),
+    BCE loss and Adam, only one batch's features in memory at a time.
+
+    batch_size / shuffle default to FL_BATCH_SIZE / FL_SHUFFLE; batch_size 0
+    is one full batch per epoch (the old behaviour). `seed` fixes the
+    shuffling order. Returns the row-weighted mean loss of the last epoch.
+    """
+    batch_size = settings.FL_BATCH_SIZE if batch_size is None else batch_size
+    shuffle = settings.FL_SHUFFLE if shuffle is None else shuffle
+    rng = np.random.default_rng(seed)
+    n = len(source)
+
+    loss_fn = nn.BCELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+
+    model.train()
+    epoch_loss = 0.0
+    for _ in range(epochs):
+        total = 0.0
+        for rows in iter_batches(n, batch_size, shuffle, rng, settings.FL_SHUFFLE_WINDOW_ROWS):
+            X, y = source.take(rows)
+            optimizer.zero_grad()
+            preds = model(torch.from_numpy(X)).reshape(-1)
+            loss = loss_fn(preds, torch.from_numpy(y))
+            loss.backward()
+            optimizer.step()
+            total += float(loss.item()) * rows.shape[0]
+        epoch_loss = total / n if n else 0.0
+    return epoch_loss
+
+
+def _synthetic_pairs(rows: int, dim: int, seed: int) -> PairFeatures:
+    rng = np.random.default_rng(seed)
+    students = max(1, rows // 50)
+    jobs = min(5000, max(1, rows // 10))
+    return PairFeatures(
+        rng.standard_normal((students, dim)).astype(np.float32),
+        rng.standard_normal((jobs, dim)).astype(np.float32),
+        np.sort(rng.integers(0, students, rows)).astype(np.int32),
+        rng.integers(0, jobs, rows).astype(np.int32),
+        rng.integers(0, 2, rows).astype(np.float32),
+    )
+
+
+def _benchmark_run(mode: str, rows: int, dim: int, epochs: int, batch_size: int) -> Tuple[float, float, float]:
+    """Child process: (seconds, last-epoch loss, peak RSS MiB or nan off POSIX) for one mode."""
+    from app.ml.model import PFLRecommender
+
+    source = _synthetic_pairs(rows, dim, seed=0)
+    torch.manual_seed(0)
+    model = PFLRecommender(4 * dim)
+    started = time.perf_counter()
+    if mode == "full":
+        X, y = source.materialize()
+        loss = train_streaming(model, ArrayFeatures(X, y), epochs=epochs, batch_size=0, shuffle=False)
+    else:
+        loss = train_streaming(model, source, epochs=epochs, batch_size=batch_size, seed=0)
+    elapsed = time.perf_counter() - started
+    try:
+        import resource  # POSIX only; the benchmark is the only user
+    except ImportError:
+        return elapsed, loss, float("nan")
+    return elapsed, loss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _benchmark(rows: int, dim: int, epochs: int, batch_size: int):
+    """
+    Full-batch training on the materialized (rows, 4D) matrix vs. streaming
+    mini-batches over the same synthetic feedback, each in a fresh process
+    so peak RSS is comparable.
+    """
+    print(f"rows={rows} input_dim={4 * dim} epochs={epochs} batch_size={batch_size}")
+    ctx = multiprocessing.get_context("spawn")
+    for mode in ("full", "streaming"):
+        with ctx.Pool(1) as pool:
+            elapsed, loss, peak_mib = pool.apply(_benchmark_run, (mode, rows, dim, epochs, batch_size))
+        print(f"  {mode:>9}: {elapsed:7.2f} s  loss {loss:.4f}  peak RSS {peak_mib:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full-batch and streaming mini-batch local training")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    _benchmark(args.rows, args.dim, args.epochs, args.batch_size)
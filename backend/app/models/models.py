@@ -8,6 +8,8 @@ from sqlalchemy import (
     Text,
     TIMESTAMP,
     Double,
+    LargeBinary,
+    UniqueConstraint,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -48,6 +50,8 @@ class Student(Base):
     preferred_locations_raw = Column(Text, nullable=True)
 
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # bumped on profile writes; precomputed recommendations older than this are stale
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="student")
     recommendations = relationship(
@@ -66,6 +70,25 @@ class Student(Base):
         cascade="all, delete-orphan",
     )
 
+    # list views of the comma-separated columns (used by StudentProfileIn / StudentOut)
+    @property
+    def skills(self):
+        return [s.strip() for s in self.skills_raw.split(",") if s.strip()] if self.skills_raw else None
+
+    @skills.setter
+    def skills(self, values):
+        self.skills_raw = ",".join(values) if values else None
+
+    @property
+    def preferred_locations(self):
+        if not self.preferred_locations_raw:
+            return None
+        return [s.strip() for s in self.preferred_locations_raw.split(",") if s.strip()]
+
+    @preferred_locations.setter
+    def preferred_locations(self, values):
+        self.preferred_locations_raw = ",".join(values) if values else None
+
 
 class Job(Base):
     __tablename__ = "jobs"
@@ -87,6 +110,13 @@ class Job(Base):
 
     is_active = Column(Boolean, nullable=False, default=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # bumped on every write; in-process job indexes sync incrementally from it
+    updated_at = Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        index=True,
+    )
 
     recommendations = relationship(
         "Recommendation",
@@ -103,10 +133,69 @@ class Job(Base):
         back_populates="job",
         cascade="all, delete-orphan",
     )
+    embedding = relationship(
+        "JobEmbedding",
+        back_populates="job",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+
+class JobEmbedding(Base):
+    """Precomputed sentence embedding of a job's text.
+
+    One row per job. `content_hash` covers the embedding model name and the
+    job text, so a row is stale as soon as either changes. Vectors are stored
+    as raw float32 bytes (see app/ml/job_embeddings.py).
+    """
+
+    __tablename__ = "job_embeddings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), unique=True, nullable=False, index=True)
+    job_uid = Column(String(100), unique=True, nullable=False, index=True)
+
+    model_name = Column(String(255), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    job = relationship("Job", back_populates="embedding")
+
+
+class Skill(Base):
+    """Canonical skill vocabulary (names are stripped + lowercased)."""
+
+    __tablename__ = "skills"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), unique=True, nullable=False, index=True)
+
+
+class JobSkill(Base):
+    """Job <-> skill links, derived from Job.required_skills by the jobs router."""
+
+    __tablename__ = "job_skills"
+
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+class StudentSkill(Base):
+    """Student <-> skill links, derived from Student.skills_raw by the students router."""
+
+    __tablename__ = "student_skills"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    skill_id = Column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), primary_key=True, index=True)
 
 
 class Recommendation(Base):
     __tablename__ = "recommendations"
+    # one row per (student, job); re-ranking updates it in place (app/services/recommendation_store.py)
+    __table_args__ = (UniqueConstraint("student_id", "job_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
@@ -117,8 +206,28 @@ class Recommendation(Base):
     student = relationship("Student", back_populates="recommendations")
     job = relationship("Job", back_populates="recommendations")
 
-    # if using Alembic later you can add a unique constraint:
-    # UniqueConstraint("student_id", "job_id")
+class MaterializedRecommendation(Base):
+    """Precomputed top-K jobs per student (written by app/ml/precompute.py).
+
+    Each student's set is replaced as a whole on every precompute run, so all
+    rows of a student share one `model_version` and `computed_at`.
+    /recs/recommend serves from here while the set is fresh.
+    """
+
+    __tablename__ = "materialized_recommendations"
+    __table_args__ = (UniqueConstraint("student_id", "rank"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    score = Column(Numeric(10, 6), nullable=False)
+
+    model_version = Column(String(64), nullable=False)
+    computed_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    job = relationship("Job")
+
 
 class Interaction(Base):
     """User→Job interaction log.
@@ -159,3 +268,47 @@ class Feedback(Base):
     student = relationship("Student", back_populates="feedback")
     job = relationship("Job", back_populates="feedback")
     recommendation = relationship("Recommendation")
+
+
+class FLClientWatermark(Base):
+    """Training watermark of one FL client (student), see app/ml/fl_watermarks.py.
+
+    Records the feedback a client's last local update was trained on (highest
+    feedback id + row count), a digest of the global shared weights it was
+    trained from, and the update itself, so a round can reuse or skip
+    clients whose data has not changed instead of retraining them.
+    """
+
+    __tablename__ = "fl_client_watermarks"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    last_feedback_id = Column(Integer, nullable=False)
+    feedback_count = Column(Integer, nullable=False)
+    global_digest = Column(String(64), nullable=False)
+    update_state = Column(LargeBinary, nullable=True)  # torch.save()d shared-state update
+    trained_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FLJob(Base):
+    """Background federated-learning job (app/ml/fl_jobs.py).
+
+    Submitted through POST /ml/run-fl-round and run by the FL job runner of
+    the API worker that accepted it; the row is how every worker reports its
+    status and how a cancel request reaches the runner.
+    progress / metrics / params hold JSON.
+    """
+
+    __tablename__ = "fl_jobs"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    status = Column(String(16), nullable=False, index=True)  # queued | running | succeeded | failed | cancelled
+    params = Column(Text, nullable=False)
+    progress = Column(Text, nullable=True)
+    metrics = Column(Text, nullable=True)  # one entry per completed round
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    worker = Column(String(255), nullable=True)  # "<host>:<pid>" of the runner that owns it
+
+    submitted_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), index=True)
+    started_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
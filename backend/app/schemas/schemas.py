@@ -179,7 +179,7 @@
 
 # app/schemas/schemas.py
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr, Field
 
 # -------- Auth / User --------
@@ -291,6 +291,7 @@ class JobOut(JobBase):
 class RecommendIn(BaseModel):
     student_uid: str
     top_k: int = 10
+    score_threshold: Optional[float] = None  # drop jobs scoring below this
 
 
 class RecItem(BaseModel):
@@ -306,6 +307,23 @@ class RecItem(BaseModel):
 class RecommendationResponse(BaseModel):
     student_uid: str
     items: List[RecItem]
+    # which global model produced the ranking, and when
+    model_version: Optional[str] = None
+    computed_at: Optional[datetime] = None
+
+
+class BatchRecommendIn(BaseModel):
+    student_uids: List[str] = Field(min_length=1, max_length=10000)
+    top_k: int = 10
+    persist: bool = True
+    score_threshold: Optional[float] = None
+
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[RecommendationResponse]
+    missing_student_uids: List[str]
+    timings_ms: Dict[str, float]
+
 class FeedbackIn(BaseModel):
     student_uid: str
     job_uid: str
@@ -0,0 +1,247 @@
+# app/services/rec_cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Job
+
+settings = get_settings
+
+# What a cached /recs/recommend result looks like:
+# {"items": [RecItem dict, ...], "model_version": str, "computed_at": iso str}
+CachedResult = Dict[str, object]
+
+
+def catalog_version(db: Session) -> str:
+    """
+    Cheap version of the job catalog: row count + latest updated_at (indexed).
+    Changes on every job create, update, (de)activation and delete, in every
+    worker, without any cross-process signalling.
+    """
+    total, latest = db.query(func.count(Job.id), func.max(Job.updated_at)).one()
+    return f"{total}-{latest.isoformat() if latest is not None else ''}"
+
+
+def cache_key(
+    student_id: int,
+    student_updated_at,
+    top_k: int,
+    model_version: str,
+    catalog: str,
+    score_threshold: Optional[float] = None,
+) -> str:
+    """
+    Everything the ranking depends on. A profile edit, a job write or a new
+    global model gives a new key, so stale entries are never served even when
+    an invalidation hook ran in another worker.
+    """
+    profile = student_updated_at.isoformat() if student_updated_at is not None else ""
+    threshold = "" if score_threshold is None else repr(float(score_threshold))
+    return f"{student_id}|{profile}|{top_k}|{threshold}|{model_version}|{catalog}"
+
+
+class MemoryBackend:
+    """
+    In-process LRU with per-entry TTL. One copy per uvicorn worker.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (student_id, expires_at, value)
+        self._entries: "OrderedDict[str, Tuple[int, float, CachedResult]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: str, student_id: int, value: CachedResult):
+        with self._lock:
+            self._entries[key] = (student_id, time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_student(self, student_id: int):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e[0] == student_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SqliteBackend:
+    """
+    LRU/TTL cache in a local sqlite file (WAL mode), shared by every uvicorn
+    worker on the host. Values are stored as JSON.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rec_cache ("
+            " key TEXT PRIMARY KEY,"
+            " student_id INTEGER NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rec_cache_student ON rec_cache (student_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rec_cache_last_used ON rec_cache (last_used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, expires_at FROM rec_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM rec_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE rec_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, student_id: int, value: CachedResult):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO rec_cache (key, student_id, value, expires_at, last_used)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, student_id, json.dumps(value), now + self.ttl_seconds, now),
+        )
+        # trim expired rows, then the least recently used beyond max_entries
+        conn.execute("DELETE FROM rec_cache WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM rec_cache WHERE key IN ("
+            " SELECT key FROM rec_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate_student(self, student_id: int):
+        self._conn().execute("DELETE FROM rec_cache WHERE student_id = ?", (student_id,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM rec_cache")
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM rec_cache").fetchone()[0]
+
+
+class RecommendationCache:
+    """
+    Ranked /recs/recommend results, keyed by cache_key().
+
+    Backend is chosen by REC_CACHE_BACKEND: "memory" (per worker), "sqlite"
+    (shared by all workers on the host, at REC_CACHE_PATH) or "off".
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.REC_CACHE_BACKEND != "off"
+
+    def _get_backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    if settings.REC_CACHE_BACKEND == "sqlite":
+                        self._backend = SqliteBackend(
+                            settings.REC_CACHE_PATH,
+                            settings.REC_CACHE_MAX_ENTRIES,
+                            settings.REC_CACHE_TTL_SECONDS,
+                        )
+                    else:
+                        self._backend = MemoryBackend(
+                            settings.REC_CACHE_MAX_ENTRIES,
+                            settings.REC_CACHE_TTL_SECONDS,
+                        )
+        return self._backend
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        if not self.enabled:
+            return None
+        value = self._get_backend().get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key: str, student_id: int, value: CachedResult):
+        if self.enabled:
+            self._get_backend().put(key, student_id, value)
+
+    def invalidate_student(self, student_id: int):
+        """Profile / CV changes."""
+        if self.enabled:
+            self._get_backend().invalidate_student(student_id)
+
+    def clear(self):
+        """Job writes and global model saves: every entry is stale."""
+        if self.enabled:
+            self._get_backend().clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.REC_CACHE_BACKEND,
+            "entries": self._get_backend().size() if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_rec_cache = RecommendationCache()
+
+
+def get_rec_cache() -> RecommendationCache:
+    return _rec_cache
@@ -1,73 +1,49 @@
-
 import numpy as np
 from sqlalchemy.orm import Session
-from app.models.models import Student, Job, Recommendation
-from app.ml.inference import PFLRegistry
-from typing import List, Dict
+from app.models.models import Student, Job
+from app.ml.inference import get_pfl_registry
+from app.ml.ranking import top_k_indices
+from app.ml.skill_features import JobFeatureTable, get_job_feature_table, role_flag_row, tokenize_skills
+from app.services.rec_cache import catalog_version
+from app.services.recommendation_store import upsert_recommendations
+from typing import List, Dict, Optional
 
 def compute_skill_overlap(student_skills: str, job_skills: str) -> int:
-    s = {t.strip().lower() for t in (student_skills or '').split(',') if t.strip()}
-    j = {t.strip().lower() for t in (job_skills or '').split(',') if t.strip()}
-    return len(s & j)
+    return len(tokenize_skills(student_skills) & tokenize_skills(job_skills))
 
 def role_flags(role: str):
-    r = (role or '').lower()
-    return [
-        int(any(k in r for k in ['front-end','frontend','ui'])),
-        int(any(k in r for k in ['back-end','backend','api'])),
-        int(any(k in r for k in ['data','ml','ai'])),
-        0
-    ]
+    return role_flag_row(role)
 
 def build_features(student: Student, jobs: List[Job]) -> np.ndarray:
-    rows = []
-    for jb in jobs:
-        overlap = compute_skill_overlap(student.skills, jb.required_skills)
-        flags = role_flags(jb.role)
-        rows.append([
-            float(student.gpa or 0.0),
-            int(student.age or 0),
-            float(jb.salary_min or 0.0),
-            float(jb.salary_max or 0.0),
-            overlap, *flags
-        ])
-    return np.array(rows, dtype=float)
-
-def recommend_for_student(db: Session, client_id: str, student_uid: str, top_k: int = 10):
+    """
+    (len(jobs), 9) matrix in ThesisPreprocessor.FEATURE_ORDER. For the whole
+    catalog prefer get_job_feature_table(), which is cached per catalog version.
+    """
+    return JobFeatureTable(jobs).features_for(student)
+
+def recommend_for_student(db: Session, client_id: str, student_uid: str, top_k: int = 10,
+                          score_threshold: Optional[float] = None):
     student = db.query(Student).filter(Student.student_uid==student_uid).first()
     if not student:
         raise ValueError("Student not found")
 
-    jobs = db.query(Job).all()
-    feats = build_features(student, jobs)
-    registry = PFLRegistry()
-    scores = registry.predict(client_id, feats)
+    # job-side features (skill matrix, salaries, role flags) are built once per catalog version
+    table = get_job_feature_table(catalog_version(db), lambda: db.query(Job).all())
+    feats = table.features_for(student)
+    registry = get_pfl_registry()
+    scores = np.asarray(registry.predict_batched(client_id, feats)).reshape(-1)
 
-    # store/update recommendations
-    items = []
-    for jb, sc in zip(jobs, scores):
-        items.append((jb, float(sc)))
-    items.sort(key=lambda x: x[1], reverse=True)
-    items = items[:top_k]
+    # top-k on the score array; only the winning jobs are loaded
+    top = top_k_indices(scores, top_k, score_threshold=score_threshold, tie_break=table.job_ids)
+    winner_ids = table.job_ids[top].tolist()
+    by_id = {jb.id: jb for jb in db.query(Job).filter(Job.id.in_(winner_ids)).all()}
+    items = [(by_id[job_id], float(scores[i])) for job_id, i in zip(winner_ids, top) if job_id in by_id]
 
-    recs = []
-    for jb, sc in items:
-        # upsert on (student, job)
-        existing = db.query(Recommendation).filter(
-            Recommendation.student_id == student.id,
-            Recommendation.job_id == jb.id
-        ).first()
-        if existing:
-            existing.score = sc
-            recs.append(existing)
-        else:
-            obj = Recommendation(student_id=student.id, job_id=jb.id, score=sc)
-            db.add(obj); db.flush()
-            recs.append(obj)
+    # one INSERT ... ON CONFLICT (student_id, job_id) DO UPDATE for all k rows
+    upsert_recommendations(db, {student.id: items})
 
-    db.commit()
-    # return dicts
-    return [{
+    # build dicts before commit (it expires the loaded jobs); no per-row re-fetch
+    out = [{
         "job_uid": jb.job_uid,
         "role": jb.role,
         "company": jb.company,
@@ -75,4 +51,7 @@ def recommend_for_student(db: Session, client_id: str, student_uid: str, top_k:
         "salary_min": jb.salary_min,
         "salary_max": jb.salary_max,
         "score": sc
-    } for jb, sc in [(db.query(Job).get(r.job_id), r.score) for r in recs]]
+    } for jb, sc in items]
+
+    db.commit()
+    return out
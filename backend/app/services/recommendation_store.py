@@ -0,0 +1,53 @@
+# app/services/recommendation_store.py
+
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.db.session import dialect_insert
+from app.models.models import Job, Recommendation
+
+# Postgres caps a statement at 65535 bind parameters; 3 per row
+_MAX_ROWS_PER_STATEMENT = 10000
+
+
+def upsert_recommendations(
+    db: Session,
+    results: Dict[int, Sequence[Tuple[Job, float]]],
+) -> List[Row]:
+    """
+    Persist ranked results for one or many students in bulk:
+
+        INSERT INTO recommendations (student_id, job_id, score) VALUES (...), (...)
+        ON CONFLICT (student_id, job_id) DO UPDATE SET score = excluded.score, created_at = now()
+        RETURNING id, student_id, job_id, score, created_at
+
+    results: {student_id: [(job, score), ...]}. A job repeated for the same
+    student keeps its first (best-ranked) score. Returns the written rows
+    (inserted or updated); the caller commits.
+    """
+    values = []
+    seen = set()
+    for student_id, ranked in results.items():
+        for job, score in ranked:
+            key = (student_id, job.id)
+            if key in seen:  # ON CONFLICT can't touch the same row twice in one statement
+                continue
+            seen.add(key)
+            values.append({"student_id": student_id, "job_id": job.id, "score": score})
+    if not values:
+        return []
+
+    insert = dialect_insert(db)
+    table = Recommendation.__table__
+    written: List[Row] = []
+    for start in range(0, len(values), _MAX_ROWS_PER_STATEMENT):
+        stmt = insert(table).values(values[start : start + _MAX_ROWS_PER_STATEMENT])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.student_id, table.c.job_id],
+            set_={"score": stmt.excluded.score, "created_at": func.now()},
+        ).returning(table.c.id, table.c.student_id, table.c.job_id, table.c.score, table.c.created_at)
+        written.extend(db.execute(stmt).all())
+    return written
@@ -0,0 +1,283 @@
+# app/services/semantic_recommendation.py
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.models import Student, Job, MaterializedRecommendation
+from app.ml.ann import get_job_ann_index
+from app.ml.embeddings import encode_texts
+from app.ml.features import _student_text, encode_student, get_input_dim
+from app.ml.job_embeddings import get_job_catalog
+from app.ml.job_matrix import get_job_matrix
+from app.ml.model import get_global_model_holder, global_model_version
+from app.ml.ranking import top_k_indices
+from app.services.recommendation_store import upsert_recommendations
+
+settings = get_settings
+
+Ranked = List[Tuple[Job, float]]
+
+
+def _ann_candidate_ids(db: Session, s_vec: np.ndarray) -> Optional[np.ndarray]:
+    """
+    The ANN_CANDIDATES job ids closest to the student by cosine similarity,
+    from the in-process IVF index, or None when the catalog is small enough
+    (or ANN is off) to score every active job.
+    """
+    if settings.ANN_ENABLED:
+        index = get_job_ann_index()
+        index.sync(db)
+        if len(index) >= settings.ANN_MIN_CATALOG:
+            return index.search(s_vec, settings.ANN_CANDIDATES, nprobe=settings.ANN_NPROBE)
+    return None
+
+
+def _jobs_by_id(db: Session, job_ids: List[int]) -> Dict[int, Job]:
+    if not job_ids:
+        return {}
+    return {job.id: job for job in db.query(Job).filter(Job.id.in_(job_ids)).all()}
+
+
+def rank_jobs_for_student(
+    db: Session,
+    student: Student,
+    top_k: int,
+    score_threshold: Optional[float] = None,
+) -> Ranked:
+    """
+    Top-k (job, score) for one student, ties broken by job id.
+    Empty if there are no active jobs (or none scores >= `score_threshold`).
+    """
+    # Student is encoded once; job vectors come from the job embedding store
+    s_vec = encode_student(student)
+
+    # Stage 1: ANN candidates on large catalogs
+    ann_ids = _ann_candidate_ids(db, s_vec)
+
+    # In-memory global model; reloaded only when the checkpoint changes
+    loaded = get_global_model_holder().get(get_input_dim())
+
+    if ann_ids is None and settings.JOB_MATRIX_ENABLED:
+        # Full catalog straight off the mapped job matrix: no ORM rows, no vector
+        # copies; inactive rows are masked, and only the winners are loaded.
+        view = get_job_matrix().view(db)
+        # concurrent requests on the same catalog share one batched forward
+        scores = loaded.scorer.score_batched(s_vec, view.vectors, catalog_key=view.key)
+        scores[~view.active] = -np.inf
+        top = top_k_indices(scores, top_k, score_threshold=score_threshold, tie_break=view.job_ids)
+        winners = view.job_ids[top].tolist()
+        by_id = _jobs_by_id(db, winners)
+        return [(by_id[job_id], float(scores[i])) for job_id, i in zip(winners, top) if job_id in by_id]
+
+    if ann_ids is not None:
+        jobs = (
+            db.query(Job)
+            .filter(Job.id.in_(ann_ids.tolist()), Job.is_active == True)  # noqa: E712
+            .all()
+        )
+    else:
+        jobs = db.query(Job).filter(Job.is_active == True).all()  # noqa: E712
+    if not jobs:
+        return []
+
+    job_ids = np.fromiter((job.id for job in jobs), dtype=np.int64, count=len(jobs))
+    J, catalog_key = get_job_catalog(db, jobs)
+
+    # Stage 2: PFL scores (same outputs as model(X) on [s, j, |s-j|, s*j], without building X).
+    # Candidate sets differ per student, so only the full catalog's projections are cached.
+    scores = loaded.scorer.score_batched(s_vec, J, catalog_key=None if ann_ids is not None else catalog_key)
+
+    # Partial selection over the score array; only the k winners become tuples
+    top = top_k_indices(scores, top_k, score_threshold=score_threshold, tie_break=job_ids)
+    return [(jobs[i], float(scores[i])) for i in top]
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def materialized_top_k(
+    db: Session,
+    student: Student,
+    top_k: int,
+    score_threshold: Optional[float] = None,
+) -> Optional[Tuple[Ranked, str, datetime]]:
+    """
+    Serve top-k from materialized_recommendations in one indexed query.
+
+    Returns (ranked, model_version, computed_at), or None when the student has
+    no fresh set: never precomputed, computed with another model version,
+    older than the student's last profile update or PRECOMPUTE_MAX_AGE_SECONDS,
+    or too few of its jobs are still active.
+    """
+    if top_k > settings.PRECOMPUTE_TOP_K:
+        return None
+
+    rows = (
+        db.query(MaterializedRecommendation, Job)
+        .join(Job, Job.id == MaterializedRecommendation.job_id)
+        .filter(
+            MaterializedRecommendation.student_id == student.id,
+            Job.is_active == True,  # noqa: E712
+        )
+        .order_by(MaterializedRecommendation.rank)
+        .limit(top_k)
+        .all()
+    )
+    if len(rows) < top_k:
+        return None
+
+    first = rows[0][0]
+    computed_at = _aware(first.computed_at)
+    if first.model_version != global_model_version():
+        return None
+    if student.updated_at is not None and computed_at < _aware(student.updated_at):
+        return None
+    if (datetime.now(timezone.utc) - computed_at).total_seconds() > settings.PRECOMPUTE_MAX_AGE_SECONDS:
+        return None
+
+    # rows are a prefix of the full ranking, so thresholding it is exact
+    ranked = [
+        (job, float(mat.score))
+        for mat, job in rows
+        if score_threshold is None or mat.score >= score_threshold
+    ]
+    return ranked, first.model_version, computed_at
+
+
+def save_recommendations(db: Session, student_id: int, ranked: Ranked):
+    """
+    Upsert Recommendation rows for `ranked` in one statement; the caller commits.
+    """
+    upsert_recommendations(db, {student_id: ranked})
+
+
+def recommend_batch(
+    db: Session,
+    student_uids: List[str],
+    top_k: int = 10,
+    persist: bool = True,
+    block_size: int = 64,
+    score_threshold: Optional[float] = None,
+) -> Dict[str, object]:
+    """
+    Top-k jobs for many students in one pass.
+
+    Job embeddings (the mapped job matrix) and the model are loaded once, and
+    only the winning jobs as ORM rows; all student texts go through a single
+    encode_texts() call; scoring runs `block_size` students
+    at a time with batched matmuls (FactorizedScorer.score_many). Large
+    catalogs use the same ANN candidate stage as the single-student path.
+
+    Returns {"results": {student_uid: Ranked}, "missing": [uid, ...],
+    "timings_ms": {phase: ms}, "model_version": str, "computed_at": datetime}.
+    """
+    timings: Dict[str, float] = {}
+    clock = time.perf_counter()
+
+    def lap(phase: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[phase] = round((now - clock) * 1e3, 2)
+        clock = now
+
+    uids = list(dict.fromkeys(student_uids))
+    students = db.query(Student).filter(Student.student_uid.in_(uids)).all()
+    by_uid = {s.student_uid: s for s in students}
+    found = [uid for uid in uids if uid in by_uid]
+    missing = [uid for uid in uids if uid not in by_uid]
+    # read what we need now: later commits expire ORM attributes
+    student_ids = [by_uid[uid].id for uid in found]
+    student_texts = [_student_text(by_uid[uid]) for uid in found]
+    lap("load_students")
+
+    results: Dict[str, Ranked] = {}
+    out = {
+        "results": results,
+        "missing": missing,
+        "timings_ms": timings,
+        "model_version": global_model_version(),
+        "computed_at": datetime.now(timezone.utc),
+    }
+    if not found:
+        return out
+
+    inactive = None
+    jobs_by_id: Optional[Dict[int, Job]] = None
+    if settings.JOB_MATRIX_ENABLED:
+        # zero-copy slices of the mapped job matrix; inactive rows are masked
+        view = get_job_matrix().view(db)
+        J, job_ids, catalog_key = view.vectors, view.job_ids, view.key
+        inactive = ~view.active
+        n_active = int(view.active.sum())
+        lap("load_jobs")
+    else:
+        jobs: List[Job] = db.query(Job).filter(Job.is_active == True).all()  # noqa: E712
+        job_ids = np.fromiter((job.id for job in jobs), dtype=np.int64, count=len(jobs))
+        jobs_by_id = {job.id: job for job in jobs}
+        n_active = len(jobs)
+        lap("load_jobs")
+        if jobs:
+            J, catalog_key = get_job_catalog(db, jobs)
+    lap("job_embeddings")
+    if not n_active:
+        return out
+
+    S = np.asarray(encode_texts(student_texts), dtype=np.float32)
+    lap("encode_students")
+
+    loaded = get_global_model_holder().get(get_input_dim())
+    out["model_version"] = loaded.version
+    lap("load_model")
+
+    candidates = None
+    if settings.ANN_ENABLED and n_active >= settings.ANN_MIN_CATALOG:
+        index = get_job_ann_index()
+        index.sync(db)
+        if inactive is not None:
+            row_of = view.row_of()
+        else:
+            row_of = {job_id: row for row, job_id in enumerate(job_ids.tolist())}
+        candidates = np.full((len(found), settings.ANN_CANDIDATES), -1, dtype=np.int64)
+        for i, s_vec in enumerate(S):
+            ids = index.search(s_vec, settings.ANN_CANDIDATES, nprobe=settings.ANN_NPROBE)
+            rows = [row_of[job_id] for job_id in ids.tolist() if job_id in row_of]
+            candidates[i, : len(rows)] = rows
+        lap("retrieve_candidates")
+
+    winners: Dict[str, Tuple[List[int], List[float]]] = {}
+    for start in range(0, len(found), block_size):
+        stop = min(start + block_size, len(found))
+        cand = candidates[start:stop] if candidates is not None else None
+        scores = loaded.scorer.score_many(S[start:stop], J, catalog_key=catalog_key, candidates=cand)
+        if cand is None and inactive is not None:
+            scores[:, inactive] = -np.inf
+
+        for i, uid in enumerate(found[start:stop]):
+            row_scores = scores[i]
+            rows_i = cand[i] if cand is not None else None
+            tie = job_ids[rows_i.clip(min=0)] if rows_i is not None else job_ids
+            order = top_k_indices(row_scores, top_k, score_threshold=score_threshold, tie_break=tie)
+            rows = rows_i[order] if rows_i is not None else order
+            winners[uid] = (job_ids[rows].tolist(), row_scores[order].tolist())
+    lap("score")
+
+    if jobs_by_id is None:
+        jobs_by_id = _jobs_by_id(db, sorted({job_id for ids, _ in winners.values() for job_id in ids}))
+    for uid, (ids, scores) in winners.items():
+        results[uid] = [(jobs_by_id[job_id], score) for job_id, score in zip(ids, scores) if job_id in jobs_by_id]
+    lap("load_winners")
+
+    if persist:
+        upsert_recommendations(
+            db, {student_id: results[uid] for uid, student_id in zip(found, student_ids)}
+        )
+        db.commit()
+        lap("persist")
+
+    return out
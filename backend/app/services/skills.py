@@ -0,0 +1,144 @@
+# app/services/skills.py
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.session import dialect_insert
+from app.ml.skill_features import tokenize_skills
+from app.models.models import Job, JobSkill, Skill, Student, StudentSkill
+from app.services.rec_cache import catalog_version
+
+
+def ensure_skills(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    {name: skill id} for normalized skill names, inserting unknown ones
+    (INSERT ... ON CONFLICT DO NOTHING, so concurrent writers don't clash).
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+    insert = dialect_insert(db)
+    db.execute(
+        insert(Skill.__table__)
+        .values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[Skill.__table__.c.name])
+    )
+    rows = db.query(Skill.id, Skill.name).filter(Skill.name.in_(names)).all()
+    return {name: skill_id for skill_id, name in rows}
+
+
+def _replace_links(db: Session, model, owner_col: str, owner_id: int, raw: Optional[str]) -> List[int]:
+    skill_ids = sorted(ensure_skills(db, tokenize_skills(raw)).values())
+    db.query(model).filter(getattr(model, owner_col) == owner_id).delete(synchronize_session=False)
+    if skill_ids:
+        db.execute(
+            dialect_insert(db)(model.__table__).values(
+                [{owner_col: owner_id, "skill_id": skill_id} for skill_id in skill_ids]
+            )
+        )
+    return skill_ids
+
+
+def sync_job_skills(db: Session, job_id: int, required_skills: Optional[str]) -> List[int]:
+    """Replace a job's skill links from its required_skills text; the caller commits."""
+    return _replace_links(db, JobSkill, "job_id", job_id, required_skills)
+
+
+def sync_student_skills(db: Session, student_id: int, skills_raw: Optional[str]) -> List[int]:
+    """Replace a student's skill links from skills_raw; the caller commits."""
+    return _replace_links(db, StudentSkill, "student_id", student_id, skills_raw)
+
+
+def student_skill_ids(db: Session, student_id: int) -> List[int]:
+    return [
+        skill_id
+        for (skill_id,) in db.query(StudentSkill.skill_id).filter(StudentSkill.student_id == student_id)
+    ]
+
+
+class SkillJobIndex:
+    """
+    In-memory inverted index: skill id -> sorted array of active job ids.
+
+    Rebuilt from job_skills in one query whenever the catalog version
+    (job count + max updated_at) changes, so it follows job writes made by
+    any worker. Lookups touch only the postings of the requested skills.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._postings: Dict[int, np.ndarray] = {}
+
+    def sync(self, db: Session):
+        version = catalog_version(db)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = (
+                db.query(JobSkill.skill_id, JobSkill.job_id)
+                .join(Job, Job.id == JobSkill.job_id)
+                .filter(Job.is_active == True)  # noqa: E712
+                .order_by(JobSkill.skill_id, JobSkill.job_id)
+                .all()
+            )
+            postings: Dict[int, np.ndarray] = {}
+            if rows:
+                pairs = np.asarray(rows, dtype=np.int64)
+                skills, starts = np.unique(pairs[:, 0], return_index=True)
+                for skill_id, part in zip(skills.tolist(), np.split(pairs[:, 1], starts[1:])):
+                    postings[skill_id] = part
+            self._postings = postings
+            self._version = version
+
+    def overlap_counts(self, skill_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (job_ids, counts): how many of `skill_ids` each matching active job
+        requires. Cost is the total length of the touched postings.
+        """
+        parts = [self._postings[s] for s in set(skill_ids) if s in self._postings]
+        if not parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.unique(np.concatenate(parts), return_counts=True)
+
+
+_skill_index = SkillJobIndex()
+
+
+def get_skill_job_index() -> SkillJobIndex:
+    return _skill_index
+
+
+def backfill(batch_size: int = 500):
+    """
+    Populate skills / job_skills / student_skills from the existing text columns.
+    """
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        jobs = db.query(Job.id, Job.required_skills).all()
+        for start in range(0, len(jobs), batch_size):
+            for job_id, raw in jobs[start : start + batch_size]:
+                sync_job_skills(db, job_id, raw)
+            db.commit()
+
+        students = db.query(Student.id, Student.skills_raw).all()
+        for start in range(0, len(students), batch_size):
+            for student_id, raw in students[start : start + batch_size]:
+                sync_student_skills(db, student_id, raw)
+            db.commit()
+
+        print(f"✅ Skill links synced for {len(jobs)} jobs and {len(students)} students")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    backfill()
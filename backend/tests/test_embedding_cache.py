@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from app.ml import embeddings
+from app.ml.embeddings import EmbeddingCache, _DiskEmbeddingStore
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def fake_encoder(offset, calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t) + offset, offset] for t in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_only_misses_are_encoded(cache_dir):
+    cache, calls = EmbeddingCache(), []
+    first = cache.encode(["a", "bb", "a"], "m", fake_encoder(0, calls))
+    second = cache.encode(["bb", "ccc"], "m", fake_encoder(0, calls))
+    assert calls == [["a", "bb"], ["ccc"]]
+    np.testing.assert_array_equal(first[:, 0], [1, 2, 1])
+    np.testing.assert_array_equal(second[:, 0], [2, 3])
+
+
+def test_artifact_variants_do_not_share_entries(cache_dir):
+    assert EmbeddingCache.key("m", "text", "eager") != EmbeddingCache.key("m", "text", "int8")
+
+    cache, calls = EmbeddingCache(), []
+    eager = cache.encode(["x"], "m", fake_encoder(0, calls), artifact="eager")
+    int8 = cache.encode(["x"], "m", fake_encoder(100, calls), artifact="int8")
+    assert calls == [["x"], ["x"]]
+    assert eager[0, 1] == 0 and int8[0, 1] == 100
+
+    # a fresh process finds both variants on disk
+    reopened = EmbeddingCache()
+    calls.clear()
+    again = reopened.encode(["x"], "m", fake_encoder(7, calls), artifact="int8")
+    assert calls == [] and again[0, 1] == 100
+
+
+def test_store_opened_before_first_write_sees_later_vectors(tmp_path):
+    reader = _DiskEmbeddingStore(str(tmp_path))
+    assert reader.dim is None and reader.get_many([b"k"]) == {}
+
+    writer = _DiskEmbeddingStore(str(tmp_path))  # another process
+    writer.put_many([b"k"], np.array([[1.0, 2.0, 3.0]], dtype=np.float32))
+
+    got = reader.get_many([b"k"])
+    assert reader.dim == 3
+    np.testing.assert_array_equal(got[b"k"], [1.0, 2.0, 3.0])
@@ -0,0 +1,80 @@
+import hashlib
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.ml import embeddings
+from app.ml.feedback_dataset import build_feedback_datasets
+from app.ml.features import get_student_feedback_dataset
+from app.models.models import Feedback, Job, Student, User
+
+
+class HashEncoder:
+    """Deterministic stand-in for the SentenceTransformer: a vector per text."""
+
+    def encode(self, texts, convert_to_numpy=True, **_):
+        return np.stack(
+            [
+                np.random.default_rng(int(hashlib.md5(t.encode()).hexdigest()[:8], 16))
+                .standard_normal(8)
+                .astype(np.float32)
+                for t in texts
+            ]
+        )
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_MICROBATCH_ENABLED", False)
+    monkeypatch.setitem(embeddings._registry._models, embeddings._registry.active_model, HashEncoder())
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user = User(email="a@b.c", password_hash="x", role="student")
+    session.add(user)
+    session.commit()
+    session.add_all([Job(job_uid=f"j{i}", role=f"role {i}", company="c", required_skills="python") for i in range(6)])
+    session.add_all(
+        [Student(user_id=user.id, student_uid=f"s{i}", full_name=f"S {i}", skills_raw="sql") for i in range(4)]
+    )
+    session.commit()
+    rng = np.random.default_rng(0)
+    for student_id, count in zip(range(1, 5), (5, 1, 3, 0)):
+        for _ in range(count):
+            session.add(
+                Feedback(student_id=student_id, job_id=int(rng.integers(1, 7)), liked=bool(rng.integers(0, 2)))
+            )
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_clients_share_tables_and_match_per_student_datasets(db):
+    data = build_feedback_datasets(db, min_feedback=2)
+    assert list(data.bounds) == [1, 3]
+    assert len(data.pairs) == 8
+
+    for student_id, client in data.clients.items():
+        assert client.S is data.pairs.S and client.J is data.pairs.J
+        X, y = data.dataset(student_id)
+        X_ref, y_ref = get_student_feedback_dataset(db, db.get(Student, student_id))
+        np.testing.assert_allclose(X, X_ref, rtol=1e-6)
+        np.testing.assert_array_equal(y, y_ref)
+
+    X, y = data.concatenated()
+    assert X.shape == (8, 32) and y.shape == (8,)
+
+
+def test_selected_students_and_empty_result(db):
+    assert list(build_feedback_datasets(db, min_feedback=1, student_ids=[2, 3]).bounds) == [2, 3]
+
+    empty = build_feedback_datasets(db, min_feedback=10)
+    assert empty.clients == {} and len(empty.pairs) == 0
@@ -0,0 +1,66 @@
+import logging
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.ml import fl_jobs
+from app.ml.fl_jobs import FLJobRunner
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(fl_jobs, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(fl_jobs.settings, "PRECOMPUTE_AFTER_FL", False)
+    return FLJobRunner()
+
+
+def wait_for(runner, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job["status"] not in fl_jobs.ACTIVE_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_rounds_record_metrics(runner, monkeypatch):
+    monkeypatch.setattr(fl_jobs, "run_federated_round", lambda **_: {"model_updated": False})
+    job = wait_for(runner, runner.submit(rounds=2)["id"])
+    assert job["status"] == "succeeded"
+    assert [m["round"] for m in job["metrics"]] == [1, 2]
+
+
+def test_failed_round_is_logged_and_marked_failed(runner, monkeypatch, caplog):
+    def fail(**_):
+        raise RuntimeError("no feedback table")
+
+    monkeypatch.setattr(fl_jobs, "run_federated_round", fail)
+    with caplog.at_level(logging.ERROR, logger=fl_jobs.__name__):
+        job = wait_for(runner, runner.submit()["id"])
+    assert job["status"] == "failed" and "no feedback table" in job["error"]
+    assert any(r.exc_info and job["id"] in r.getMessage() for r in caplog.records)
+
+
+def test_error_outside_the_run_still_fails_the_job(runner, monkeypatch, caplog):
+    def broken(job_id):
+        raise RuntimeError("session setup failed")
+
+    monkeypatch.setattr(runner, "_run_job", broken)
+    with caplog.at_level(logging.ERROR, logger=fl_jobs.__name__):
+        job = wait_for(runner, runner.submit()["id"])
+    assert job["status"] == "failed" and "session setup failed" in job["error"]
+    assert any(r.exc_info for r in caplog.records)
+
+    # the runner thread survived and takes the next job
+    monkeypatch.delattr(runner, "_run_job")
+    monkeypatch.setattr(fl_jobs, "run_federated_round", lambda **_: {"model_updated": False})
+    assert wait_for(runner, runner.submit()["id"])["status"] == "succeeded"
@@ -0,0 +1,113 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.ml import fl_watermarks
+from app.ml.fl_watermarks import plan_round, save_watermarks, shared_state_digest
+from app.ml.pfl_train import fed_avg, round_states
+from app.models.models import Feedback, FLClientWatermark, Job, Student, User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user = User(email="a@b.c", password_hash="x", role="student")
+    session.add(user)
+    session.commit()
+    session.add(Job(job_uid="j1", role="role", company="c"))
+    session.add_all([Student(user_id=user.id, student_uid=f"s{i}", full_name=f"S {i}") for i in range(3)])
+    session.commit()
+    for student_id in (1, 2, 3):
+        add_feedback(session, student_id, 2)
+    yield session
+    session.close()
+
+
+def add_feedback(db, student_id, count):
+    db.add_all([Feedback(student_id=student_id, job_id=1, liked=True) for _ in range(count)])
+    db.commit()
+
+
+def state(value):
+    return {"shared.0.weight": torch.full((2, 2), float(value)), "shared.0.bias": torch.full((2,), float(value))}
+
+
+def finish_round(db, plan, trained, digest):
+    save_watermarks(db, plan, {sid: state(sid) for sid in trained}, digest)
+    db.commit()
+
+
+def test_cached_update_is_reused_only_against_its_own_global_weights(db):
+    plan = plan_round(db, 1, "g0")
+    assert plan.train == [1, 2, 3] and not plan.reuse and not plan.skipped
+    finish_round(db, plan, plan.train, "g0")  # labelled with the weights they trained from
+
+    # global model unchanged: retraining would repeat the cached updates
+    add_feedback(db, 2, 1)
+    plan = plan_round(db, 1, "g0")
+    assert plan.train == [2] and sorted(plan.reuse) == [1, 3] and not plan.skipped
+    torch.testing.assert_close(plan.reuse[3]["shared.0.bias"], state(3)["shared.0.bias"])
+
+    # the round saved a new global model: the cached deltas are stale
+    finish_round(db, plan, plan.train, "g0")
+    plan = plan_round(db, 1, "g1")
+    assert plan.train == [] and not plan.reuse and plan.skipped == [1, 2, 3]
+
+
+def test_reused_and_skipped_watermarks_are_not_relabelled(db):
+    finish_round(db, plan_round(db, 1, "g0"), [1, 2, 3], "g0")
+    add_feedback(db, 1, 1)
+    plan = plan_round(db, 1, "g1")
+    assert plan.train == [1] and plan.skipped == [2, 3]
+    finish_round(db, plan, plan.train, "g1")
+
+    digests = {m.student_id: m.global_digest for m in db.query(FLClientWatermark)}
+    assert digests == {1: "g1", 2: "g0", 3: "g0"}
+    assert plan_round(db, 1, "g2").skipped == [1, 2, 3]
+
+
+def test_without_cached_updates_unchanged_clients_are_skipped(db, monkeypatch):
+    monkeypatch.setattr(fl_watermarks.settings, "FL_CACHE_CLIENT_UPDATES", False)
+    finish_round(db, plan_round(db, 1, "g0"), [1, 2, 3], "g0")
+
+    plan = plan_round(db, 1, "g0")
+    assert plan.train == [] and not plan.reuse and plan.skipped == [1, 2, 3]
+
+
+def test_moved_global_model_retrains_unchanged_clients_without_skipping(db, monkeypatch):
+    finish_round(db, plan_round(db, 1, "g0"), [1, 2, 3], "g0")
+    monkeypatch.setattr(fl_watermarks.settings, "FL_SKIP_UNCHANGED_CLIENTS", False)
+
+    assert plan_round(db, 1, "restored").train == [1, 2, 3]
+    assert sorted(plan_round(db, 1, "g0").reuse) == [1, 2, 3]
+
+
+def test_min_feedback_limits_eligible_clients(db):
+    add_feedback(db, 1, 3)
+    assert plan_round(db, 4, "g").train == [1]
+
+
+def test_round_average_keeps_unchanged_clients_weight(db):
+    finish_round(db, plan_round(db, 1, "g0"), [1, 2, 3], "g1")
+    # client 3's update was not cached (FL_CACHE_CLIENT_UPDATES was off)
+    db.query(FLClientWatermark).filter(FLClientWatermark.student_id == 3).update({"update_state": None})
+    db.commit()
+
+    add_feedback(db, 1, 1)
+    plan = plan_round(db, 1, "g1")
+    assert plan.train == [1] and list(plan.reuse) == [2] and plan.skipped == [3]
+
+    averaged = fed_avg(round_states([state(10)], plan, state(4)))
+    # fresh update 10, cached update 2, pre-round global 4 for the skipped client
+    torch.testing.assert_close(averaged["shared.0.weight"], torch.full((2, 2), 16 / 3))
+
+
+def test_digest_tracks_weights():
+    assert shared_state_digest(state(1)) == shared_state_digest(state(1))
+    assert shared_state_digest(state(1)) != shared_state_digest(state(2))
@@ -0,0 +1,81 @@
+import pickle
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+StandardScaler = pytest.importorskip("sklearn.preprocessing").StandardScaler
+
+from app.ml.fused_backbone import export_fused, fold_scaler, load_fused_backbone
+from app.ml.inference import Backbone, Head, PFLRegistry, settings
+
+
+@pytest.fixture
+def pfl_files(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[10, 0.5, 300, 2, 0, 1, 50, 3, 0.1], scale=[5, 0.2, 100, 1, 1, 2, 20, 1, 0.05], size=(500, 9))
+    scaler = StandardScaler().fit(X)
+    torch.manual_seed(0)
+    backbone, head = Backbone(), Head()
+
+    paths = {
+        "preproc": tmp_path / "preprocessor.pkl",
+        "backbone": tmp_path / "backbone.pt",
+        "heads": tmp_path / "heads",
+        "fused": tmp_path / "backbone_fused.npz",
+    }
+    paths["preproc"].write_bytes(pickle.dumps(scaler))
+    torch.save(backbone.state_dict(), paths["backbone"])
+    paths["heads"].mkdir()
+    torch.save(head.state_dict(), paths["heads"] / "uni_a.pt")
+    return X, scaler, backbone, paths
+
+
+def _hidden(backbone, X):
+    with torch.no_grad():
+        return backbone(torch.tensor(X, dtype=torch.float32)).numpy()
+
+
+def test_folded_backbone_matches_scaler_plus_backbone(pfl_files):
+    X, scaler, backbone, paths = pfl_files
+    export_fused(paths["fused"], paths["preproc"], paths["backbone"])
+    fused = load_fused_backbone(paths["fused"]).backbone
+
+    np.testing.assert_allclose(_hidden(fused, X), _hidden(backbone, scaler.transform(X)), atol=1e-4, rtol=1e-5)
+
+
+def test_fold_handles_unit_scaler(pfl_files):
+    X, _, backbone, _ = pfl_files
+    identity = StandardScaler(with_mean=False, with_std=False).fit(X)
+    state = fold_scaler(identity, backbone)
+    np.testing.assert_allclose(state["mlp.0.weight"], backbone.state_dict()["mlp.0.weight"].numpy(), atol=1e-7)
+
+
+def _registry(monkeypatch, paths):
+    monkeypatch.setattr(settings, "PREPROCESSOR_PATH", str(paths["preproc"]))
+    monkeypatch.setattr(settings, "BACKBONE_PATH", str(paths["backbone"]))
+    monkeypatch.setattr(settings, "HEADS_DIR", str(paths["heads"]))
+    monkeypatch.setattr(settings, "PFL_FUSED_BACKBONE_PATH", str(paths["fused"]))
+    return PFLRegistry()
+
+
+def test_registry_serves_fused_artifact_with_same_scores(monkeypatch, pfl_files):
+    X, _, _, paths = pfl_files
+    plain = _registry(monkeypatch, paths)
+    assert plain.stats()["fused_backbone"] is False
+    expected = plain.predict("uni_a", X)
+
+    export_fused(paths["fused"], paths["preproc"], paths["backbone"])
+    fused = _registry(monkeypatch, paths)
+    assert fused.stats()["fused_backbone"] is True
+    np.testing.assert_allclose(fused.predict("uni_a", X), expected, atol=1e-4, rtol=1e-5)
+
+
+def test_registry_ignores_stale_fused_artifact(monkeypatch, pfl_files):
+    _, _, _, paths = pfl_files
+    export_fused(paths["fused"], paths["preproc"], paths["backbone"])
+
+    torch.manual_seed(1)
+    torch.save(Backbone().state_dict(), paths["backbone"])  # retrained after the export
+    registry = _registry(monkeypatch, paths)
+    assert registry.stats()["fused_backbone"] is False
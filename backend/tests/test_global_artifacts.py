@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import app.ml.model as model_module
+from app.ml.export import export_global_model
+from app.ml.model import GlobalModelHolder, load_global_model, save_global_model, settings
+from app.ml.scoring import FactorizedScorer, ModuleScorer
+
+D = 16
+INPUT_DIM = 4 * D
+
+
+@pytest.fixture
+def checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_module, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(model_module, "GLOBAL_MODEL_PATH", str(tmp_path / "global_pfl_model.pt"))
+    monkeypatch.setattr(settings, "ARTIFACTS_DIR", str(tmp_path / "artifacts"))
+    (tmp_path / "artifacts").mkdir()
+    torch.manual_seed(0)
+    save_global_model(model_module.PFLRecommender(INPUT_DIM))
+    return tmp_path / "artifacts"
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    J = rng.standard_normal((500, D)).astype(np.float32)
+    S = rng.standard_normal((3, D)).astype(np.float32)
+    return S, J
+
+
+def _serve(monkeypatch, artifact):
+    monkeypatch.setattr(settings, "GLOBAL_MODEL_ARTIFACT", artifact)
+    return GlobalModelHolder().get(INPUT_DIM)
+
+
+@pytest.mark.parametrize("artifact, atol", [("torchscript", 1e-6), ("int8", 5e-2)])
+def test_exported_module_is_what_serves(monkeypatch, checkpoint, catalog, artifact, atol):
+    S, J = catalog
+    eager = load_global_model(INPUT_DIM).eval()
+    export_global_model(str(checkpoint), [artifact], eager, INPUT_DIM)
+
+    loaded = _serve(monkeypatch, artifact)
+    assert loaded.artifact == artifact
+    assert isinstance(loaded.model, torch.jit.ScriptModule)
+    assert isinstance(loaded.scorer, ModuleScorer)
+
+    reference = FactorizedScorer(eager).score_many(S, J)
+    np.testing.assert_allclose(loaded.scorer.score_many(S, J), reference, atol=atol)
+
+    cand = np.array([[4, -1, 9], [0, 1, 2], [-1, -1, -1]])
+    picked = loaded.scorer.score_many(S, J, candidates=cand)
+    assert np.isneginf(picked[2]).all() and np.isneginf(picked[0, 1])
+    np.testing.assert_allclose(picked[1], reference[1, :3], atol=atol)
+
+
+def test_missing_or_stale_export_falls_back_to_eager(monkeypatch, checkpoint, catalog):
+    assert _serve(monkeypatch, "int8").artifact == "eager"
+
+    export_global_model(str(checkpoint), ["torchscript"], load_global_model(INPUT_DIM).eval(), INPUT_DIM)
+    torch.manual_seed(1)
+    save_global_model(model_module.PFLRecommender(INPUT_DIM))  # new round after the export
+
+    loaded = _serve(monkeypatch, "torchscript")
+    assert loaded.artifact == "eager"
+    assert isinstance(loaded.scorer, FactorizedScorer)
+
+
+def test_module_scorer_matches_forward_in_chunks(catalog):
+    S, J = catalog
+    torch.manual_seed(0)
+    model = model_module.PFLRecommender(INPUT_DIM).eval()
+    scripted = torch.jit.trace(model, torch.randn(8, INPUT_DIM))
+    got = ModuleScorer(scripted, chunk_size=64).score(S[0], J.astype(np.float16))
+    np.testing.assert_allclose(got, FactorizedScorer(model).score(S[0], J.astype(np.float16)), atol=1e-5)
+
+
+@pytest.mark.parametrize("artifact", ["torchscript", "int8"])
+def test_fl_clients_get_the_checkpoint_weights_whatever_serves(monkeypatch, checkpoint, artifact):
+    from app.api.v1 import fl
+
+    eager = load_global_model(INPUT_DIM).eval()
+    export_global_model(str(checkpoint), [artifact], eager, INPUT_DIM)
+    holder = GlobalModelHolder()
+    monkeypatch.setattr(settings, "GLOBAL_MODEL_ARTIFACT", artifact)
+    monkeypatch.setattr(fl, "get_global_model_holder", lambda: holder)
+    monkeypatch.setattr(fl, "get_input_dim", lambda: INPUT_DIM)
+
+    shared = fl.get_global_model()["shared_state"]
+    assert holder.get(INPUT_DIM).artifact == artifact
+    expected = model_module.get_shared_state(eager)
+    assert set(shared) == set(expected) == {"shared.0.weight", "shared.0.bias"}
+    for name, tensor in expected.items():
+        np.testing.assert_array_equal(np.asarray(shared[name], dtype=np.float32), tensor.numpy())
@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.ml import job_embeddings
+from app.ml.job_embeddings import try_index_job
+from app.models.models import Job, JobEmbedding
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Job(job_uid="j1", role="Data analyst", company="c"))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.mark.parametrize("error", [RuntimeError("model load failed"), OSError("no space left")])
+def test_indexing_failure_keeps_the_saved_job(db, monkeypatch, caplog, error):
+    def fail(texts, model_name=None):
+        raise error
+
+    monkeypatch.setattr(job_embeddings, "encode_texts", fail)
+    monkeypatch.setattr(job_embeddings, "get_model_registry", lambda: type("R", (), {"active_model": "m"})())
+    job = db.query(Job).one()
+
+    with caplog.at_level(logging.ERROR, logger=job_embeddings.__name__):
+        assert try_index_job(db, job) is None
+    assert any(r.exc_info and "job 1" in r.getMessage() for r in caplog.records)
+    assert db.query(Job).one().role == "Data analyst"  # session still usable
+    assert db.query(JobEmbedding).count() == 0
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from app.ml.job_matrix import _exclusive_file_lock
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "lock")
+    events = []
+    holding = threading.Event()
+
+    def hold():
+        with _exclusive_file_lock(path):
+            holding.set()
+            time.sleep(0.2)
+            events.append("first released")
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait()
+    with _exclusive_file_lock(path):  # a separate open file: waits for the holder
+        events.append("second acquired")
+    thread.join()
+    assert events == ["first released", "second acquired"]
@@ -0,0 +1,78 @@
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.ml import parallel_train
+from app.ml.model import PFLRecommender, get_shared_state
+from app.ml.parallel_train import train_clients
+from app.ml.streaming_train import PairFeatures
+
+
+def make_clients(dim=8):
+    rng = np.random.default_rng(0)
+    S = rng.standard_normal((3, dim)).astype(np.float32)
+    J = rng.standard_normal((10, dim)).astype(np.float32)
+    other_J = rng.standard_normal((4, dim)).astype(np.float32)
+
+    def pairs(student, jobs, rows):
+        return PairFeatures(
+            S,
+            jobs,
+            np.full(rows, student, dtype=np.int32),
+            rng.integers(0, jobs.shape[0], rows).astype(np.int32),
+            rng.integers(0, 2, rows).astype(np.float32),
+        )
+
+    # two clients share the round's tables, one brings its own J, one is empty
+    return {5: pairs(0, J, 12), 7: pairs(2, J, 9), 9: pairs(1, other_J, 6), 11: PairFeatures.empty()}
+
+
+def test_pool_matches_serial_training(monkeypatch):
+    monkeypatch.setattr(parallel_train.settings, "FL_PARALLEL_MIN_CLIENTS", 1)
+    monkeypatch.setattr(parallel_train.settings, "FL_PARALLEL_MIN_ROWS", 0)
+    clients = make_clients()
+    torch.manual_seed(0)
+    shared = get_shared_state(PFLRecommender(32))
+
+    serial = train_clients(clients, shared, 32, epochs=2, workers=1, seed=3)
+    pooled = train_clients(clients, shared, 32, epochs=2, workers=2, seed=3)
+
+    assert list(pooled) == [5, 7, 9, 11]
+    assert serial[11] is None and pooled[11] is None
+    for client_id in (5, 7, 9):
+        assert pooled[client_id].rows == len(clients[client_id])
+        assert pooled[client_id].loss == pytest.approx(serial[client_id].loss, abs=1e-6)
+        for name, tensor in serial[client_id].state.items():
+            torch.testing.assert_close(pooled[client_id].state[name], tensor)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_round_after_a_worker_died_gets_a_fresh_pool(monkeypatch):
+    monkeypatch.setattr(parallel_train.settings, "FL_PARALLEL_MIN_CLIENTS", 1)
+    monkeypatch.setattr(parallel_train.settings, "FL_PARALLEL_MIN_ROWS", 0)
+    clients = make_clients()
+    shared = get_shared_state(PFLRecommender(32))
+    serial = train_clients(clients, shared, 32, epochs=1, workers=1, seed=3)
+    train_clients(clients, shared, 32, epochs=1, workers=2, seed=3)
+
+    broken = parallel_train._pool
+    for process in list(broken._processes.values()):  # e.g. the OOM killer
+        os.kill(process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    with pytest.raises(BrokenProcessPool):
+        train_clients(clients, shared, 32, epochs=1, workers=2, seed=3)
+    assert parallel_train._pool is None
+
+    again = train_clients(clients, shared, 32, epochs=1, workers=2, seed=3)
+    assert parallel_train._pool is not broken
+    for client_id in (5, 7, 9):
+        torch.testing.assert_close(again[client_id].state, serial[client_id].state)
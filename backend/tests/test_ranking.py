@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.ml.ranking import top_k_indices
+
+
+def _full_sort(scores, k, tie_break):
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], tie_break[i]))
+    return [i for i in order if np.isfinite(scores[i])][:k]
+
+
+def test_matches_full_sort_with_ties():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 20, 1000).astype(np.float32) / 20  # many ties
+    ids = rng.permutation(1000) + 100
+    for k in (1, 5, 50, 1000, 2000):
+        assert top_k_indices(scores, k, tie_break=ids).tolist() == _full_sort(scores, k, ids)
+
+
+def test_boundary_ties_decided_by_tie_break():
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.1])
+    ids = np.array([40, 10, 30, 20, 50])
+    # three jobs tie for the last two places: lowest ids win
+    assert top_k_indices(scores, 3, tie_break=ids).tolist() == [1, 3, 2]
+
+
+def test_position_breaks_ties_without_tie_break():
+    assert top_k_indices(np.array([0.2, 0.7, 0.7, 0.7]), 2).tolist() == [1, 2]
+
+
+def test_independent_of_candidate_order():
+    scores = np.array([0.3, 0.8, 0.8, 0.1, 0.8])
+    ids = np.array([5, 9, 2, 7, 4])
+    perm = np.array([4, 2, 0, 3, 1])
+    a = ids[top_k_indices(scores, 3, tie_break=ids)]
+    b = ids[perm][top_k_indices(scores[perm], 3, tie_break=ids[perm])]
+    assert a.tolist() == b.tolist() == [2, 4, 9]
+
+
+def test_threshold_nan_and_padding_dropped():
+    scores = np.array([0.9, np.nan, -np.inf, 0.4, 0.6])
+    assert top_k_indices(scores, 10).tolist() == [0, 4, 3]
+    assert top_k_indices(scores, 10, score_threshold=0.5).tolist() == [0, 4]
+    assert top_k_indices(scores, 0).size == 0
+    assert top_k_indices(np.array([]), 3).size == 0
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.models import Recommendation
+from app.services.recommendation_store import upsert_recommendations
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def job(job_id):
+    return SimpleNamespace(id=job_id)
+
+
+def test_inserts_then_updates_in_place(db):
+    first = upsert_recommendations(db, {1: [(job(10), 0.9), (job(11), 0.5)], 2: [(job(10), 0.3)]})
+    db.commit()
+    assert {(r.student_id, r.job_id) for r in first} == {(1, 10), (1, 11), (2, 10)}
+    ids = {(r.student_id, r.job_id): r.id for r in first}
+
+    second = upsert_recommendations(db, {1: [(job(11), 0.7), (job(12), 0.2)]})
+    db.commit()
+    by_pair = {(r.student_id, r.job_id): r for r in second}
+    assert by_pair[(1, 11)].id == ids[(1, 11)]
+    assert float(by_pair[(1, 11)].score) == pytest.approx(0.7)
+
+    rows = {(r.student_id, r.job_id): float(r.score) for r in db.query(Recommendation)}
+    assert rows == {(1, 10): 0.9, (1, 11): 0.7, (1, 12): 0.2, (2, 10): 0.3}
+
+
+def test_repeated_job_keeps_best_ranked_score(db):
+    written = upsert_recommendations(db, {1: [(job(5), 0.8), (job(5), 0.1)]})
+    assert len(written) == 1
+    assert float(written[0].score) == pytest.approx(0.8)
+
+
+def test_empty_results(db):
+    assert upsert_recommendations(db, {}) == []
+    assert upsert_recommendations(db, {1: []}) == []
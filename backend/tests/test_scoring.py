@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.ml.model import PFLRecommender
+from app.ml.features import build_pair_feature_matrix
+from app.ml.scoring import FactorizedScorer
+
+D = 32
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return PFLRecommender(4 * D).eval()
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((300, D)).astype(np.float32), rng.standard_normal((5, D)).astype(np.float32)
+
+
+def _reference(model, s, J):
+    with torch.no_grad():
+        return model(torch.from_numpy(build_pair_feature_matrix(s, J))).squeeze(-1).numpy()
+
+
+def test_score_matches_forward_pass(model, catalog):
+    J, S = catalog
+    scorer = FactorizedScorer(model, chunk_size=64)
+    for s in S:
+        np.testing.assert_allclose(scorer.score(s, J), _reference(model, s, J), atol=1e-6)
+
+
+def test_cached_projections_and_float16(model, catalog):
+    J, S = catalog
+    scorer = FactorizedScorer(model)
+    first = scorer.score(S[0], J, catalog_key="k")
+    np.testing.assert_array_equal(scorer.score(S[0], J, catalog_key="k"), first)
+
+    half = scorer.score(S[0], J.astype(np.float16))
+    np.testing.assert_allclose(half, _reference(model, S[0], J.astype(np.float16).astype(np.float32)), atol=1e-5)
+
+
+def test_score_many_matches_score(model, catalog):
+    J, S = catalog
+    scorer = FactorizedScorer(model)
+    many = scorer.score_many(S, J, max_block_elems=1000)
+    for i, s in enumerate(S):
+        np.testing.assert_allclose(many[i], scorer.score(s, J), atol=1e-6)
+
+
+def test_score_many_candidates_and_padding(model, catalog):
+    J, S = catalog
+    scorer = FactorizedScorer(model)
+    candidates = np.array([[3, 7, -1], [0, 299, 5]] * 2 + [[1, -1, -1]])
+    out = scorer.score_many(S, J, candidates=candidates)
+    for i, s in enumerate(S):
+        full = scorer.score(s, J)
+        for c, row in enumerate(candidates[i]):
+            if row < 0:
+                assert out[i, c] == -np.inf
+            else:
+                assert out[i, c] == pytest.approx(full[row], abs=1e-6)
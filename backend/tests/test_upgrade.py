@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.db.upgrade import upgrade_schema
+from app.services.recommendation_store import upsert_recommendations
+import app.models.models  # noqa: F401  (registers the tables)
+
+
+def test_fresh_schema_needs_no_upgrade():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    assert upgrade_schema(engine) == []
+
+
+def test_adds_jobs_updated_at():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE jobs (id INTEGER PRIMARY KEY, created_at TIMESTAMP)"))
+        conn.execute(text("INSERT INTO jobs (id, created_at) VALUES (1, '2024-01-01 00:00:00'), (2, NULL)"))
+
+    assert "jobs.updated_at" in upgrade_schema(engine)
+    assert "jobs.updated_at" not in upgrade_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, updated_at FROM jobs ORDER BY id")).all()
+    assert rows[0][1].startswith("2024-01-01")
+    assert rows[1][1] is not None
+    assert "ix_jobs_updated_at" in {ix["name"] for ix in inspect(engine).get_indexes("jobs")}
+
+
+def test_adds_students_updated_at():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE students (id INTEGER PRIMARY KEY, created_at TIMESTAMP)"))
+        conn.execute(text("INSERT INTO students (id, created_at) VALUES (1, '2024-02-01 00:00:00')"))
+
+    assert upgrade_schema(engine) == ["students.updated_at"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT updated_at FROM students")).scalar().startswith("2024-02-01")
+
+
+def test_dedupes_recommendations_and_adds_unique_key():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE recommendations "
+                "(id INTEGER PRIMARY KEY, student_id INT, job_id INT, score NUMERIC, created_at TIMESTAMP)"
+            )
+        )
+        conn.execute(text("CREATE TABLE feedback (id INTEGER PRIMARY KEY, recommendation_id INT)"))
+        conn.execute(
+            text(
+                "INSERT INTO recommendations (id, student_id, job_id, score) "
+                "VALUES (1, 1, 10, 0.1), (2, 1, 10, 0.2), (3, 1, 11, 0.3), (4, 1, 10, 0.4)"
+            )
+        )
+        conn.execute(text("INSERT INTO feedback VALUES (1, 1), (2, 3), (3, NULL)"))
+
+    assert upgrade_schema(engine) == ["recommendations.student_job_unique"]
+    assert upgrade_schema(engine) == []
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM recommendations ORDER BY id")).scalars().all() == [3, 4]
+        assert conn.execute(text("SELECT recommendation_id FROM feedback ORDER BY id")).scalars().all() == [4, 3, None]
+
+    with Session(engine) as db:
+        written = upsert_recommendations(db, {1: [(SimpleNamespace(id=10), 0.9)]})
+        db.commit()
+    assert [r.id for r in written] == [4]